@@ -1,3 +1,4 @@
+import importlib
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
@@ -9,23 +10,126 @@ db = SQLAlchemy()
 jwt = JWTManager()
 ma = Marshmallow()
 
+# Blueprints served by each SERVICE_ROLE. Only the listed route modules are imported.
+# Roles without predictions never load the model stack: create_app turns off
+# PREDICTION_MAINTENANCE for them and the admin API refuses model activation there,
+# so that work goes to an inference (or all) process.
+SERVICE_ROLES = {
+    'all': ('auth', 'health', 'predictions', 'admin', 'datasets', 'dashboard'),
+    'api': ('auth', 'health', 'admin', 'datasets', 'dashboard'),
+    'auth': ('auth',),
+    'inference': ('predictions', 'admin'),
+}
+
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    _apply_pool_options(app)
 
     db.init_app(app)
     jwt.init_app(app)
     ma.init_app(app)
-    CORS(app)
+    CORS(app, expose_headers=['ETag', 'X-Next-Cursor'])
+
+    role = app.config.get('SERVICE_ROLE', 'all')
+    if role not in SERVICE_ROLES:
+        raise ValueError(f"Unknown SERVICE_ROLE '{role}', expected one of: {', '.join(SERVICE_ROLES)}")
+    blueprints = SERVICE_ROLES[role]
+    if 'predictions' not in blueprints and app.config.get('PREDICTION_MAINTENANCE') != 'off':
+        # Re-scoring after a record write would load the model in this process
+        print(f"SERVICE_ROLE '{role}' does not serve predictions, so PREDICTION_MAINTENANCE is off")
+        app.config['PREDICTION_MAINTENANCE'] = 'off'
 
     with app.app_context():
-        from .routes import auth, health, predictions, admin, datasets
-        app.register_blueprint(auth.bp, url_prefix='/api/auth')
-        app.register_blueprint(health.bp, url_prefix='/api/health')
-        app.register_blueprint(predictions.bp, url_prefix='/api/predictions')
-        app.register_blueprint(admin.bp, url_prefix='/api/admin')
-        app.register_blueprint(datasets.bp, url_prefix='/api/datasets')
-        
+        for name in blueprints:
+            module = importlib.import_module(f'.routes.{name}', __name__)
+            app.register_blueprint(module.bp, url_prefix=f'/api/{name}')
+
         db.create_all()
+        _ensure_columns()
+        _ensure_indexes()
+
+        # Registered before compression so request timings include it
+        from .utils import metrics
+        metrics.init_app(app)
+
+        from .utils.compression import compress_response
+        app.after_request(compress_response)
+
+        if 'health' in blueprints:
+            from .utils.sample_data import sample_payload
+            sample_payload(app.config['SAMPLE_DATA_PATH'])
+
+        if 'predictions' in blueprints and app.config.get('ML_WARM_ON_STARTUP'):
+            from .services.ml_service import MLService
+            try:
+                MLService.warm_up()
+            except Exception as e:
+                print(f"Model warm-up failed: {e}")
 
     return app
+
+def _apply_pool_options(app):
+    # SQLite uses file/static pools that take none of these options
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        "pool_size": app.config['DB_POOL_SIZE'],
+        "max_overflow": app.config['DB_MAX_OVERFLOW'],
+        "pool_timeout": app.config['DB_POOL_TIMEOUT'],
+        "pool_recycle": app.config['DB_POOL_RECYCLE'],
+        "pool_pre_ping": app.config['DB_POOL_PRE_PING'],
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+
+def _ensure_columns():
+    # create_all() does not alter existing tables, so add any new (nullable) columns
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            col_type = column.type.compile(dialect=db.engine.dialect)
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+            except Exception as e:
+                print(f"Could not add column {table.name}.{column.name}: {e}")
+
+def _ensure_indexes():
+    # create_all() skips indexes on tables that already exist, so add any missing ones
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {i['name'] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if not index.unique:
+                try:
+                    index.create(bind=db.engine)
+                except Exception as e:
+                    print(f"Could not create index {index.name}: {e}")
+                continue
+            # Upserts rely on ON CONFLICT over unique indexes, so the app must not run without them
+            try:
+                _dedupe(table, list(index.columns))
+                index.create(bind=db.engine)
+            except Exception as e:
+                raise RuntimeError(f"Could not create unique index {index.name}: {e}") from e
+
+def _dedupe(table, columns):
+    # Keeps the newest row (highest id) of each duplicate group; references to the others move to it
+    groups = db.select(*columns, db.func.max(table.c.id)).group_by(*columns).having(db.func.count(table.c.id) > 1)
+    referencing = [fk.parent for other in db.metadata.sorted_tables for fk in other.foreign_keys
+                   if fk.column is table.c.id]
+    with db.engine.begin() as conn:
+        for *key, keep in conn.execute(groups).all():
+            match = [column == value for column, value in zip(columns, key)]
+            dropped = db.select(table.c.id).where(*match, table.c.id != keep)
+            for column in referencing:
+                conn.execute(db.update(column.table).where(column.in_(dropped)).values({column.name: keep}))
+            removed = conn.execute(db.delete(table).where(*match, table.c.id != keep)).rowcount
+            print(f"Removed {removed} duplicate {table.name} rows for {dict(zip([c.name for c in columns], key))}")
@@ -11,8 +11,64 @@ class Config:
         SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI.replace("postgres://", "postgresql://", 1)
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool per worker process (applied by create_app to server databases, not SQLite)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+
+    # Which blueprints this process serves (see SERVICE_ROLES in app/__init__.py): all, api, auth or inference
+    SERVICE_ROLE = os.environ.get('SERVICE_ROLE', 'all')
+
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key-456')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=1)
+
+    # Password hashes: any werkzeug method string. Older hashes are upgraded on the next login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # At most WORKERS hashes run at once per process; past MAX_PENDING running or waiting, auth requests get a 429
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16))
     
+    # Example records for users without data come from the head of this file
+    SAMPLE_DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+                                    'data', 'processed', 'final_dataset.csv')
+
     # ML Models Path
     ML_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ml_models')
+
+    # Inference engine: 'xgboost' (reference predict_proba) or 'compiled' (NumPy tree evaluator)
+    ML_INFERENCE_ENGINE = os.environ.get('ML_INFERENCE_ENGINE', 'xgboost')
+    # The compiled engine wins on small batches; larger ones go through xgboost
+    ML_COMPILED_MAX_BATCH = int(os.environ.get('ML_COMPILED_MAX_BATCH', 32))
+    # Load the active model bundle in create_app instead of on the first request
+    ML_WARM_ON_STARTUP = os.environ.get('ML_WARM_ON_STARTUP', '1') == '1'
+    # How often each process checks the registry manifest for a newly activated version
+    ML_REGISTRY_POLL_SECONDS = float(os.environ.get('ML_REGISTRY_POLL_SECONDS', 5))
+
+    # Re-score stored predictions when a record they depend on is written: 'existing', 'all' or 'off'
+    PREDICTION_MAINTENANCE = os.environ.get('PREDICTION_MAINTENANCE', 'existing')
+
+    # Async prediction jobs (POST /api/predictions/jobs): worker threads, batch size and backpressure
+    PREDICTION_JOBS_ENABLED = os.environ.get('PREDICTION_JOBS_ENABLED', '1') == '1'
+    PREDICTION_JOB_WORKERS = int(os.environ.get('PREDICTION_JOB_WORKERS', 2))
+    PREDICTION_JOB_BATCH = int(os.environ.get('PREDICTION_JOB_BATCH', 32))
+    PREDICTION_QUEUE_DEPTH = int(os.environ.get('PREDICTION_QUEUE_DEPTH', 256))
+    PREDICTION_USER_MAX_PENDING = int(os.environ.get('PREDICTION_USER_MAX_PENDING', 50))
+    PREDICTION_USER_RATE_PER_MINUTE = float(os.environ.get('PREDICTION_USER_RATE_PER_MINUTE', 60))
+    PREDICTION_USER_BURST = int(os.environ.get('PREDICTION_USER_BURST', 20))
+    PREDICTION_JOB_TTL_SECONDS = float(os.environ.get('PREDICTION_JOB_TTL_SECONDS', 600))
+
+    # Admin statistics older than this are refreshed incrementally in the background
+    STATS_REFRESH_SECONDS = float(os.environ.get('STATS_REFRESH_SECONDS', 30))
+    # Rows are counted once they are this old, so transactions still open when they were stamped have committed
+    STATS_WATERMARK_LAG_SECONDS = float(os.environ.get('STATS_WATERMARK_LAG_SECONDS', 60))
+    # Predictions are re-scored in place, so their phase mix is recounted (GROUP BY) this often
+    STATS_PHASE_RECOUNT_SECONDS = float(os.environ.get('STATS_PHASE_RECOUNT_SECONDS', 300))
+
+    # SQL statements at least this slow are logged with their text (see /metrics for histograms)
+    SLOW_QUERY_SECONDS = float(os.environ.get('SLOW_QUERY_SECONDS', 0.25))
+
+    # JSON/CSV responses at least this large are gzip/brotli compressed
+    COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
@@ -1,5 +1,6 @@
 from . import db
 from datetime import datetime
+from flask import current_app
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(db.Model):
@@ -8,19 +9,22 @@ class User(db.Model):
     username = db.Column(db.String(64), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     health_records = db.relationship('HealthRecord', backref='user', lazy='dynamic')
     predictions = db.relationship('Prediction', backref='user', lazy='dynamic')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, current_app.config['PASSWORD_HASH_METHOD'])
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
 class HealthRecord(db.Model):
     __tablename__ = 'health_records'
+    __table_args__ = (
+        db.Index('ix_health_records_user_date', 'user_id', 'date', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     date = db.Column(db.Date, nullable=False)
@@ -46,14 +50,65 @@ class HealthRecord(db.Model):
     daily_steps = db.Column(db.Float)
     last_period_date = db.Column(db.Date) # Added this field
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Prediction(db.Model):
     __tablename__ = 'predictions'
+    __table_args__ = (
+        db.Index('ix_predictions_user_date', 'user_id', 'date', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     record_id = db.Column(db.Integer, db.ForeignKey('health_records.id'), nullable=True)
     date = db.Column(db.Date, nullable=False)
     predicted_phase = db.Column(db.String(64), nullable=False)
     confidence = db.Column(db.Float)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class UserRollup(db.Model):
+    __tablename__ = 'user_rollups'
+    # Per-user analytics state, updated on every record write (see RollupService)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    as_of = db.Column(db.Date)  # Latest record date; the window ends here
+    window = db.Column(db.JSON, nullable=False)  # Field -> daily values of the last ROLLUP_DAYS days
+    period_starts = db.Column(db.JSON, nullable=False)  # Distinct last_period_date values (YYYY-MM-DD)
+    stats = db.Column(db.JSON, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class StatCounter(db.Model):
+    __tablename__ = 'stat_counters'
+    # Running totals ('users', 'predictions', 'predicted_phase:<name>', ...) and refresh bookkeeping ('watermark:<metric>')
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+class StatBucket(db.Model):
+    __tablename__ = 'stat_buckets'
+    # Rows created per hour/day bucket, per metric
+    granularity = db.Column(db.String(8), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    metric = db.Column(db.String(64), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class PredictionJob(db.Model):
+    __tablename__ = 'prediction_jobs'
+    # Async prediction jobs (see PredictionJobs), shared by every worker process
+    __table_args__ = (
+        db.Index('ix_prediction_jobs_user_status', 'user_id', 'status'),
+    )
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued, running, done or failed
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    finished_at = db.Column(db.DateTime, index=True)
+
+class RateLimit(db.Model):
+    __tablename__ = 'rate_limits'
+    # Per-key token bucket state, stored as its theoretical arrival time (epoch seconds)
+    key = db.Column(db.String(64), primary_key=True)
+    tat = db.Column(db.Float, nullable=False)
@@ -1,40 +1,136 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models import User, Prediction, HealthRecord, db
+from ..models import Prediction, db
+from ..services.stats_service import StatsService
 
 bp = Blueprint('admin', __name__)
 
+# Upper bounds for synthetic seeding over HTTP (the CLI has none)
+MAX_SEED_USERS = 10000
+MAX_SEED_DAYS = 730
+# Longest time series served per granularity
+MAX_STATS_PERIODS = {'hour': 24 * 14, 'day': 730}
+
 @bp.route('/stats', methods=['GET'])
 @jwt_required()
 def get_stats():
     # Simple check: only user with ID 1 is admin for this demo
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     if user_id != 1:
         return jsonify({"msg": "Admin access required"}), 403
-        
-    user_count = User.query.count()
-    prediction_count = Prediction.query.count()
-    record_count = HealthRecord.query.count()
-    
-    recent_predictions = Prediction.query.order_by(Prediction.created_at.desc()).limit(10).all()
+
+    # Totals come from the materialized counters, not COUNT(*) over the tables
+    counters, freshness = StatsService.snapshot()
+    last_day = StatsService.timeseries('hour', 24)
+
+    # The primary key orders predictions by creation, so no created_at index is needed
+    recent_predictions = Prediction.query.order_by(Prediction.id.desc()).limit(10).all()
     
     return jsonify({
-        "users": user_count,
-        "predictions": prediction_count,
-        "records": record_count,
+        "users": counters.get('users', 0),
+        "predictions": counters.get('predictions', 0),
+        "records": counters.get('records', 0),
+        "phase_mix": {name.split(':', 1)[1]: value for name, value in counters.items()
+                      if name.startswith('predicted_phase:')},
+        "last_24h": {metric: sum(b[metric] for b in last_day) for metric in ('users', 'records', 'predictions')},
         "recent_logs": [{
             "id": p.id,
             "user_id": p.user_id,
             "phase": p.predicted_phase,
             "confidence": p.confidence,
             "date": p.created_at.strftime('%Y-%m-%d %H:%M')
-        } for p in recent_predictions]
+        } for p in recent_predictions],
+        "freshness": freshness
+    })
+
+@bp.route('/stats/timeseries', methods=['GET'])
+@jwt_required()
+def get_stats_timeseries():
+    """?granularity=hour|day&periods=N: users, records and predictions created per bucket, with the phase mix."""
+    if int(get_jwt_identity()) != 1:
+        return jsonify({"msg": "Admin access required"}), 403
+
+    granularity = request.args.get('granularity', 'hour')
+    if granularity not in MAX_STATS_PERIODS:
+        return jsonify({"msg": "granularity must be hour or day"}), 400
+    try:
+        periods = int(request.args.get('periods', 48 if granularity == 'hour' else 30))
+    except ValueError:
+        return jsonify({"msg": "periods must be an integer"}), 400
+    if not 1 <= periods <= MAX_STATS_PERIODS[granularity]:
+        return jsonify({"msg": f"periods must be between 1 and {MAX_STATS_PERIODS[granularity]}"}), 400
+
+    _, freshness = StatsService.snapshot()
+    return jsonify({
+        "granularity": granularity,
+        "buckets": StatsService.timeseries(granularity, periods),
+        "freshness": freshness
     })
 
 @bp.route('/seed', methods=['POST'])
 @jwt_required()
 def trigger_seed():
-    user_id = get_jwt_identity()
-    from ..utils.seeder import seed_data
-    seed_data(user_id)
-    return jsonify({"msg": "Data seeded successfully"}), 200
+    """
+    Without a body, seeds 30 days for the calling user. With {"users": N, "days": D}
+    (admin only) creates N synthetic load-test users instead.
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+
+    if 'users' not in data:
+        from ..utils.seeder import seed_data
+        seed_data(user_id)
+        return jsonify({"msg": "Data seeded successfully"}), 200
+
+    if user_id != 1:
+        return jsonify({"msg": "Admin access required"}), 403
+    try:
+        n_users = int(data['users'])
+        days = int(data.get('days', 90))
+    except (TypeError, ValueError):
+        return jsonify({"msg": "users and days must be integers"}), 400
+    if not (1 <= n_users <= MAX_SEED_USERS and 1 <= days <= MAX_SEED_DAYS):
+        return jsonify({"msg": f"users must be 1-{MAX_SEED_USERS} and days 1-{MAX_SEED_DAYS}"}), 400
+
+    from ..utils.seeder import seed_users
+    try:
+        summary = seed_users(n_users, days=days, seed=int(data.get('seed', 0)))
+    except Exception as e:
+        db.session.rollback()
+        print(f"DEBUG: Seed Error: {str(e)}")
+        return jsonify({"msg": "Seeding failed", "error": str(e)}), 500
+    return jsonify(dict(summary, msg="Load-test users seeded")), 201
+
+@bp.route('/models', methods=['GET'])
+@jwt_required()
+def list_models():
+    if int(get_jwt_identity()) != 1:
+        return jsonify({"msg": "Admin access required"}), 403
+
+    from ..services.ml_service import MLService
+    manifest = MLService.registry().read_manifest()
+    return jsonify({
+        "active": manifest.get('active'),
+        "loaded": MLService.loaded_version(),
+        "versions": manifest.get('versions', {})
+    })
+
+@bp.route('/models/<version>/activate', methods=['POST'])
+@jwt_required()
+def activate_model(version):
+    if int(get_jwt_identity()) != 1:
+        return jsonify({"msg": "Admin access required"}), 403
+    if 'predictions' not in current_app.blueprints:
+        # Activation loads the bundle, which only processes serving predictions do
+        role = current_app.config.get('SERVICE_ROLE')
+        return jsonify({"msg": f"Model activation is not served by the '{role}' role; use an inference process"}), 409
+
+    from ..services.ml_service import MLService
+    try:
+        bundle = MLService.swap(version)
+    except KeyError as e:
+        return jsonify({"msg": e.args[0]}), 404
+    except Exception as e:
+        print(f"DEBUG: Model Activation Error: {str(e)}")
+        return jsonify({"msg": "Model activation failed", "error": str(e)}), 500
+    return jsonify({"msg": "Model activated", "version": bundle.version}), 200
@@ -1,38 +1,65 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from sqlalchemy.exc import IntegrityError
 from ..models import User, db
+from ..services.auth_service import PasswordHasher
+from ..utils.backpressure import Backpressure, too_busy_response
 
 bp = Blueprint('auth', __name__)
 
 @bp.route('/register', methods=['POST'])
 def register():
-    data = request.get_json()
-    
-    if User.query.filter_by(username=data.get('username')).first():
-        return jsonify({"msg": "Username already exists"}), 400
-        
-    if User.query.filter_by(email=data.get('email')).first():
+    data = request.get_json() or {}
+    username, email, password = data.get('username'), data.get('email'), data.get('password')
+    if not username or not email or not password:
+        return jsonify({"msg": "Username, email and password are required"}), 400
+
+    try:
+        password_hash = PasswordHasher.hash(password)
+    except Backpressure as e:
+        return too_busy_response(e)
+
+    # The unique constraints reject duplicates, so a new user costs a single INSERT
+    db.session.add(User(username=username, email=email, password_hash=password_hash))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        taken = User.query.filter(db.or_(User.username == username, User.email == email)).first()
+        if taken is None or taken.username == username:
+            return jsonify({"msg": "Username already exists"}), 400
         return jsonify({"msg": "Email already exists"}), 400
-        
-    user = User(username=data.get('username'), email=data.get('email'))
-    user.set_password(data.get('password'))
-    
-    db.session.add(user)
-    db.session.commit()
-    
+
     return jsonify({"msg": "User created successfully"}), 201
 
 @bp.route('/login', methods=['POST'])
 def login():
-    data = request.get_json()
+    data = request.get_json() or {}
     user = User.query.filter_by(username=data.get('username')).first()
-    
-    if user and user.check_password(data.get('password')):
-        # Ensure identity is a string to avoid "subject must be string" errors
-        access_token = create_access_token(identity=str(user.id))
-        return jsonify(access_token=access_token, user={"id": user.id, "username": user.username}), 200
-        
-    return jsonify({"msg": "Bad username or password"}), 401
+    if not user or not data.get('password'):
+        return jsonify({"msg": "Bad username or password"}), 401
+
+    try:
+        matches, new_hash = PasswordHasher.verify(user.password_hash, data.get('password'))
+    except Backpressure as e:
+        return too_busy_response(e)
+    if not matches:
+        return jsonify({"msg": "Bad username or password"}), 401
+
+    if new_hash:
+        # Hash parameters changed since this password was stored; skipped if it changed meanwhile
+        try:
+            db.session.execute(db.update(User)
+                               .where(User.id == user.id, User.password_hash == user.password_hash)
+                               .values(password_hash=new_hash))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"DEBUG: Password Rehash Error: {str(e)}")
+
+    # Ensure identity is a string to avoid "subject must be string" errors
+    access_token = create_access_token(identity=str(user.id))
+    return jsonify(access_token=access_token, user={"id": user.id, "username": user.username}), 200
 
 @bp.route('/me', methods=['GET'])
 @jwt_required()
@@ -0,0 +1,36 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..services.dashboard_service import DashboardService, DEFAULT_RECORDS, MAX_RECORDS
+from ..utils.fast_json import raw_json_response
+from ..utils.pagination import not_modified
+
+bp = Blueprint('dashboard', __name__)
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+def get_dashboard():
+    """
+    Profile, the latest ?limit= records (default 30, oldest first, each with its prediction),
+    the latest and recent predictions and summary stats, in one response.
+    Supports If-None-Match; the ETag changes with any record or prediction write.
+    """
+    user_id = int(get_jwt_identity())
+    try:
+        limit = int(request.args.get('limit', DEFAULT_RECORDS))
+    except ValueError:
+        return jsonify({"msg": "limit must be an integer"}), 400
+    if not 1 <= limit <= MAX_RECORDS:
+        return jsonify({"msg": f"limit must be between 1 and {MAX_RECORDS}"}), 400
+
+    state = DashboardService.state(user_id)
+    if state is None:
+        return jsonify({"msg": "User not found"}), 404
+
+    etag = DashboardService.etag(state, limit)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    response = raw_json_response(DashboardService.payload(state, limit, etag))
+    response.set_etag(etag, weak=True)
+    return response
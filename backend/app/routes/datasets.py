@@ -1,13 +1,17 @@
 import os
-import pandas as pd
-from flask import Blueprint, jsonify, current_app
+import time
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required
-from ..services.analysis_service import DataAnalysisService
 
 bp = Blueprint('datasets', __name__)
 
+# Largest page served by /preview
+MAX_PREVIEW_ROWS = 1000
+
 @bp.route('/summary', methods=['GET'])
 def get_global_summary():
+    # pandas-backed services load on first use so the API boots without them
+    from ..services.analysis_service import DataAnalysisService
     stats = DataAnalysisService.get_global_summary()
     if stats:
         return jsonify(stats)
@@ -48,33 +52,107 @@ def list_datasets():
                 
     return jsonify(files)
 
+def _dataset_path(filename):
+    # Search in both raw and processed
+    for kind in ('raw', 'processed'):
+        path = os.path.join(current_app.root_path, '../../data', kind, filename)
+        if filename.endswith('.csv') and os.path.isfile(path):
+            return path
+    return None
+
+def _records(df):
+    # NaN is not valid JSON
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
 @bp.route('/stats/<filename>', methods=['GET'])
 @jwt_required()
 def get_dataset_stats(filename):
-    # Search in both raw and processed
-    raw_path = os.path.join(current_app.root_path, '../../data/raw', filename)
-    processed_path = os.path.join(current_app.root_path, '../../data/processed', filename)
-    
-    target_path = raw_path if os.path.exists(raw_path) else processed_path
-    
-    if not os.path.exists(target_path):
+    target_path = _dataset_path(filename)
+    if not target_path:
         return jsonify({"msg": "File not found"}), 404
         
-    # Read a sample to get columns and summary (don't read huge files entirely)
+    # Columns, row count and sample come from the row-offset index; the file is never loaded whole
+    from ..utils.row_index import RowIndex
     try:
-        if filename == 'steps.csv':
-             # Huge file, just get header
-             df = pd.read_csv(target_path, nrows=100)
-             total_rows = "2,000,000+" # Estimated or calculated via stat
+        index = RowIndex.for_file(target_path)
+        return jsonify({
+            "name": filename,
+            "columns": index.columns,
+            "rows": index.total_rows,
+            "sample": _records(index.read_rows(0, 5))
+        })
+    except Exception as e:
+        return jsonify({"msg": str(e)}), 500
+
+@bp.route('/preview/<filename>', methods=['GET'])
+@jwt_required()
+def preview_dataset(filename):
+    target_path = _dataset_path(filename)
+    if not target_path:
+        return jsonify({"msg": "File not found"}), 404
+
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({"msg": "offset and limit must be integers"}), 400
+    if offset < 0 or not 1 <= limit <= MAX_PREVIEW_ROWS:
+        return jsonify({"msg": f"offset must be >= 0 and limit between 1 and {MAX_PREVIEW_ROWS}"}), 400
+
+    from ..utils.row_index import RowIndex
+    try:
+        index = RowIndex.for_file(target_path)
+        columns = [c for c in request.args.get('columns', '').split(',') if c] or None
+        if columns:
+            unknown = [c for c in columns if c not in index.columns]
+            if unknown:
+                return jsonify({"msg": f"Unknown columns: {', '.join(unknown)}"}), 400
+            # Keep the requested order; read_csv returns usecols in file order
+            df = index.read_rows(offset, limit, columns)[columns]
         else:
-             df = pd.read_csv(target_path)
-             total_rows = len(df)
-             
+            df = index.read_rows(offset, limit)
+
         return jsonify({
             "name": filename,
-            "columns": list(df.columns),
-            "rows": total_rows,
-            "sample": df.head(5).to_dict(orient='records')
+            "columns": columns or index.columns,
+            "offset": offset,
+            "limit": limit,
+            "total_rows": index.total_rows,
+            "rows": _records(df)
         })
     except Exception as e:
         return jsonify({"msg": str(e)}), 500
+
+@bp.route('/query', methods=['POST'])
+@jwt_required()
+def query_dataset():
+    """
+    Ad-hoc query over a dataset's columnar copy. Body:
+        {"dataset": "final_dataset.csv", "columns": [...],
+         "filters": [{"column": "id", "op": "eq", "value": 2}, ...],
+         "group_by": ["phase"], "aggregates": [{"fn": "mean", "column": "daily_steps"}],
+         "offset": 0, "limit": 100}
+    Ops: eq, ne, lt, lte, gt, gte, in, between, is_null, not_null.
+    Aggregates: count, sum, mean, min, max (missing values are skipped).
+    """
+    from ..utils.column_store import ColumnStore, QueryError
+    from ..utils.metrics import stage_timer
+
+    data = request.get_json(silent=True) or {}
+    filename = data.get('dataset')
+    # Names only; the body could otherwise carry a path out of the data directories
+    target_path = _dataset_path(filename) if isinstance(filename, str) and os.path.basename(filename) == filename else None
+    if not target_path:
+        return jsonify({"msg": "File not found"}), 404
+
+    started = time.perf_counter()
+    try:
+        with stage_timer('datasets', 'query'):
+            result = ColumnStore.for_file(target_path).query(data)
+    except QueryError as e:
+        return jsonify({"msg": str(e)}), 400
+    except Exception as e:
+        print(f"DEBUG: Dataset Query Error: {str(e)}")
+        return jsonify({"msg": str(e)}), 500
+
+    return jsonify({"name": filename, **result, "took_ms": round((time.perf_counter() - started) * 1000, 2)})
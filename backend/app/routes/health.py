@@ -1,12 +1,23 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import os
-import pandas as pd
 from ..models import HealthRecord, db
+from ..services.record_service import RecordService, NUMERIC_FIELDS, INTEGER_FIELDS
+from ..services.maintenance_service import PredictionMaintenance
+from ..services.rollup_service import RollupService
+from ..services.export_service import ExportService, EXPORT_FORMATS
+from ..utils.pagination import page_args, date_args, date_filters, keyset_page, collection_etag, not_modified, paged_response
+from ..utils.fast_json import json_response, raw_json_response
+from ..utils.sample_data import sample_payload
+from ..utils.compression import gzip_stream
 from datetime import datetime
 
 bp = Blueprint('health', __name__)
 
+# Fields of a record in GET /records responses
+RECORD_FIELDS = ['id', 'date', 'lh', 'estrogen', 'pdg'] + INTEGER_FIELDS + [
+    'overall_score', 'deep_sleep_in_minutes', 'avg_resting_heart_rate', 'stress_score', 'daily_steps',
+    'last_period_date']
+
 @bp.route('/record', methods=['POST'])
 @jwt_required()
 def add_record():
@@ -18,18 +29,15 @@ def add_record():
     
     # Clean data for HealthRecord model
     cleaned_data = {}
-    numeric_fields = ['lh', 'estrogen', 'pdg', 'overall_score', 'deep_sleep_in_minutes', 
-                      'avg_resting_heart_rate', 'stress_score', 'daily_steps']
-    integer_fields = ['cramps', 'fatigue', 'moodswing', 'stress', 'bloating', 'sleepissue']
     
-    for field in numeric_fields:
+    for field in NUMERIC_FIELDS:
         if field in data and data[field] is not None and data[field] != '':
             try:
                 cleaned_data[field] = float(data[field])
             except:
                 pass
                 
-    for field in integer_fields:
+    for field in INTEGER_FIELDS:
         if field in data and data[field] is not None and data[field] != '':
             try:
                 cleaned_data[field] = int(data[field])
@@ -42,63 +50,148 @@ def add_record():
         except:
             pass
             
-    # Check if record for this date already exists
-    record = HealthRecord.query.filter_by(user_id=user_id, date=record_date).first()
-    if record:
-        # Update existing
-        for key, value in cleaned_data.items():
-            setattr(record, key, value)
-    else:
-        # Create new
-        record = HealthRecord(user_id=user_id, date=record_date, **cleaned_data)
-        db.session.add(record)
-        
+    # Insert or update the record for this date in one statement
     try:
+        record_id = RecordService.upsert_record(user_id, record_date, cleaned_data)
         db.session.commit()
-        return jsonify({"msg": "Record saved", "id": record.id}), 201
     except Exception as e:
         db.session.rollback()
         print(f"DEBUG: Health Record Error: {str(e)}")
         return jsonify({"msg": "Database error", "error": str(e)}), 500
 
+    # Keep the predictions that read this day (same day and the lag days after it) current
+    refreshed = PredictionMaintenance.refresh_after_write(user_id, [record_date])
+    RollupService.update_after_write(user_id, [record_date])
+    return jsonify({
+        "msg": "Record saved",
+        "id": record_id,
+        "refreshed_predictions": [d.strftime('%Y-%m-%d') for d in refreshed]
+    }), 201
+
+@bp.route('/records/bulk', methods=['POST'])
+@jwt_required()
+def add_records_bulk():
+    """
+    Streams many days at once. Body is NDJSON (one record object per line) or CSV with a
+    header row; the format comes from ?format= or the Content-Type. Each row needs a date.
+    """
+    user_id = int(get_jwt_identity())
+
+    fmt = request.args.get('format')
+    if not fmt:
+        fmt = 'csv' if 'csv' in (request.content_type or '') else 'ndjson'
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"msg": "format must be ndjson or csv"}), 400
+
+    from ..services.ingest_service import IngestService
+    report = IngestService.ingest(user_id, request.stream, fmt)
+    status = 200 if report["written"] or not report["received"] else 422
+    return jsonify(report), status
+
+@bp.route('/analytics', methods=['GET'])
+@jwt_required()
+def get_analytics():
+    """
+    Rolling 7/28-day means, hormone trends, symptom load and the cycle-length estimate,
+    as of the user's latest record. Served from the user's rollup, kept current on write.
+    """
+    user_id = int(get_jwt_identity())
+    try:
+        rollup = RollupService.get(user_id)
+    except Exception as e:
+        db.session.rollback()
+        print(f"DEBUG: Analytics Error: {str(e)}")
+        return jsonify({"msg": "Could not compute analytics", "error": str(e)}), 500
+
+    etag = f"rollup-{user_id}-{rollup.version}-{rollup.updated_at.timestamp():.6f}"
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    response = json_response(rollup.stats)
+    response.set_etag(etag, weak=True)
+    return response
+
+@bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_records():
+    """
+    Streams every record (oldest first) with its prediction as ?format=csv (default) or ndjson.
+    Optional ?start_date=&end_date= filters. Gzip-encoded on the fly when the client accepts it.
+    """
+    user_id = int(get_jwt_identity())
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"msg": "format must be csv or ndjson"}), 400
+    try:
+        # Exports are never paged, so only the date range is read
+        args = date_args(request.args)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    chunks = ExportService.stream(user_id, fmt, date_filters(HealthRecord, args['start_date'], args['end_date']))
+    headers = {"Content-Disposition": f"attachment; filename=neohealth-export-{datetime.utcnow():%Y%m%d}.{fmt}"}
+    if request.accept_encodings['gzip']:
+        chunks = gzip_stream(chunks)
+        headers["Content-Encoding"] = "gzip"
+    # The request context (and its database session) stays open until the last chunk is sent
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt], headers=headers)
+    response.vary.add('Accept-Encoding')
+    return response
+
 @bp.route('/records', methods=['GET'])
 @jwt_required()
 def get_records():
+    """
+    Oldest first. Optional ?start_date=&end_date= filters and keyset pagination with
+    ?limit= (the next page's ?cursor= comes back in X-Next-Cursor). Supports If-None-Match.
+    ?format=columnar returns {"count", "is_example", "columns": {field: [values]}} instead of a list.
+    """
     user_id = int(get_jwt_identity())
-    records = HealthRecord.query.filter_by(user_id=user_id).order_by(HealthRecord.date.asc()).all()
+    try:
+        args = page_args(request.args)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    fmt = request.args.get('format', 'list')
+    if fmt not in ('list', 'columnar'):
+        return jsonify({"msg": "format must be list or columnar"}), 400
+
+    filters = date_filters(HealthRecord, args['start_date'], args['end_date'])
+    etag = collection_etag(HealthRecord, user_id, filters, request.query_string.decode())
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    if fmt == 'columnar':
+        return _columnar_records(user_id, filters, args, etag)
+
+    query = HealthRecord.query.filter(HealthRecord.user_id == user_id, *filters)
+    records, next_cursor = keyset_page(query, HealthRecord, args['limit'], args['cursor'])
     
-    if not records:
-        # If no personal data, return sample data from processed dataset
-        try:
-            processed_path = os.path.join(current_app.root_path, '../../data/processed/final_dataset.csv')
-            if os.path.exists(processed_path):
-                df = pd.read_csv(processed_path).fillna(0).head(15) # Take 15 rows for sample and fill NaNs
-                sample_data = []
-                for i, row in df.iterrows():
-                    sample_data.append({
-                        "id": f"sample-{i}",
-                        "date": row.get('date', f"2023-01-{i+1:02d}"),
-                        "lh": float(row.get('lh', 0)),
-                        "estrogen": float(row.get('estrogen', 0)),
-                        "pdg": float(row.get('pdg', 0)),
-                        "cramps": int(row.get('cramps', 0)),
-                        "fatigue": int(row.get('fatigue', 0)),
-                        "moodswing": int(row.get('moodswing', 0)),
-                        "stress": int(row.get('stress', 0)),
-                        "bloating": int(row.get('bloating', 0)),
-                        "sleepissue": int(row.get('sleepissue', 0)),
-                        "overall_score": float(row.get('overall_score', 0)),
-                        "deep_sleep_in_minutes": float(row.get('deep_sleep_in_minutes', 0)),
-                        "avg_resting_heart_rate": float(row.get('avg_resting_heart_rate', 0)),
-                        "stress_score": float(row.get('stress_score', 0)),
-                        "daily_steps": float(row.get('daily_steps', 0)),
-                        "is_example": True
-                    })
-                return jsonify(sample_data)
-        except Exception as e:
-            print(f"Error loading sample data: {e}")
-
-    return jsonify([{
+    if not records and not request.args:
+        # If no personal data, return the sample records prepared at startup
+        sample = sample_payload(current_app.config['SAMPLE_DATA_PATH'])
+        if sample:
+            return raw_json_response(sample)
+
+    return paged_response(jsonify([_record_json(r) for r in records]), etag, next_cursor)
+
+def _columnar_records(user_id, filters, args, etag):
+    # Plain Core rows, transposed into one array per field
+    stmt = db.select(*[HealthRecord.__table__.c[f] for f in RECORD_FIELDS]).where(
+        HealthRecord.user_id == user_id, *filters)
+    rows, next_cursor = keyset_page(stmt, HealthRecord, args['limit'], args['cursor'])
+
+    if not rows and not request.args.keys() - {'format'}:
+        sample = sample_payload(current_app.config['SAMPLE_DATA_PATH'], 'columnar')
+        if sample:
+            return raw_json_response(sample)
+
+    columns = dict(zip(RECORD_FIELDS, map(list, zip(*rows)))) if rows else {f: [] for f in RECORD_FIELDS}
+    payload = {"count": len(rows), "is_example": False, "columns": columns}
+    return paged_response(json_response(payload), etag, next_cursor)
+
+def _record_json(r):
+    return {
         "id": r.id,
         "date": r.date.strftime('%Y-%m-%d'),
         "lh": r.lh,
@@ -117,4 +210,4 @@ def get_records():
         "daily_steps": r.daily_steps,
         "last_period_date": r.last_period_date.strftime('%Y-%m-%d') if r.last_period_date else None,
         "is_example": False
-    } for r in records])
+    }
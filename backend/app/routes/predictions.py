@@ -1,11 +1,18 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import HealthRecord, Prediction, db
 from ..services.ml_service import MLService
+from ..services.record_service import RecordService, record_to_dict
+from ..services.job_service import PredictionJobs
+from ..utils.backpressure import Backpressure, too_busy_response
+from ..utils.pagination import page_args, date_filters, keyset_page, collection_etag, not_modified, paged_response
 from datetime import datetime, timedelta
 
 bp = Blueprint('predictions', __name__)
 
+# Upper bound on the number of days a single batch request may cover
+MAX_BATCH_DAYS = 366
+
 @bp.route('/predict', methods=['POST'])
 @jwt_required()
 def predict():
@@ -15,37 +22,11 @@ def predict():
     date_str = data.get('date', datetime.utcnow().strftime('%Y-%m-%d'))
     target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
     
-    # Get current record for this date
-    record = HealthRecord.query.filter_by(user_id=user_id, date=target_date).first()
+    # Current day and previous 2 days for historical features, in one query
+    record, (prev1, prev2) = RecordService.fetch_window(user_id, target_date)
     if not record:
         return jsonify({"msg": "No health record found for this date. Please submit health data first."}), 400
-        
-    # Get previous 2 days records for historical features
-    prev1_date = target_date - timedelta(days=1)
-    prev2_date = target_date - timedelta(days=2)
-    
-    prev1 = HealthRecord.query.filter_by(user_id=user_id, date=prev1_date).first()
-    prev2 = HealthRecord.query.filter_by(user_id=user_id, date=prev2_date).first()
     
-    def record_to_dict(r):
-        if not r: return {}
-        return {
-            "lh": r.lh or 0,
-            "estrogen": r.estrogen or 0,
-            "pdg": r.pdg or 0,
-            "cramps": r.cramps or 0,
-            "fatigue": r.fatigue or 0,
-            "moodswing": r.moodswing or 0,
-            "stress": r.stress or 0,
-            "bloating": r.bloating or 0,
-            "sleepissue": r.sleepissue or 0,
-            "overall_score": r.overall_score or 0,
-            "deep_sleep_in_minutes": r.deep_sleep_in_minutes or 0,
-            "avg_resting_heart_rate": r.avg_resting_heart_rate or 0,
-            "stress_score": r.stress_score or 0,
-            "daily_steps": r.daily_steps or 0
-        }
-        
     current_data = record_to_dict(record)
     historical_data = [record_to_dict(prev1), record_to_dict(prev2)]
     
@@ -57,32 +38,136 @@ def predict():
         return jsonify({"msg": "AI Prediction failed", "error": str(e)}), 500
     
     # Store Prediction
-    prediction = Prediction.query.filter_by(user_id=user_id, date=target_date).first()
-    if prediction:
-        prediction.predicted_phase = result['phase']
-        prediction.confidence = result['confidence']
-    else:
-        prediction = Prediction(
-            user_id=user_id,
-            record_id=record.id,
-            date=target_date,
-            predicted_phase=result['phase'],
-            confidence=result['confidence']
-        )
-        db.session.add(prediction)
-        
+    RecordService.upsert_predictions(user_id, [{
+        "record_id": record.id,
+        "date": target_date,
+        "predicted_phase": result['phase'],
+        "confidence": result['confidence']
+    }])
     db.session.commit()
     
     return jsonify(result), 200
 
+@bp.route('/jobs', methods=['POST'])
+@jwt_required()
+def submit_prediction_job():
+    """
+    Async form of /predict: queues the prediction and returns 202 with a job id to poll
+    at GET /jobs/<id>. Returns 429 with Retry-After when the queue or the user is over limit.
+    """
+    if not current_app.config.get('PREDICTION_JOBS_ENABLED', True):
+        return jsonify({"msg": "Async predictions are disabled"}), 503
+
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    try:
+        date_str = data.get('date', datetime.utcnow().strftime('%Y-%m-%d'))
+        target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return jsonify({"msg": "date must be YYYY-MM-DD"}), 400
+
+    try:
+        job = PredictionJobs.submit(current_app._get_current_object(), user_id, target_date)
+    except Backpressure as e:
+        return too_busy_response(e)
+    except Exception as e:
+        db.session.rollback()
+        print(f"DEBUG: Prediction Job Error: {str(e)}")
+        return jsonify({"msg": "Could not queue the prediction", "error": str(e)}), 500
+
+    response = jsonify(PredictionJobs.to_dict(job, current_app.config.get('PREDICTION_JOB_TTL_SECONDS', 600)))
+    response.headers['Location'] = url_for('predictions.get_prediction_job', job_id=job.id)
+    return response, 202
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_prediction_job(job_id):
+    # Jobs are stored in the database, so any worker process can answer
+    job = PredictionJobs.get(job_id)
+    if job is None or job.user_id != int(get_jwt_identity()):
+        return jsonify({"msg": "Job not found"}), 404
+    return jsonify(PredictionJobs.to_dict(job, current_app.config.get('PREDICTION_JOB_TTL_SECONDS', 600))), 200
+
+@bp.route('/predict-batch', methods=['POST'])
+@jwt_required()
+def predict_batch():
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+
+    try:
+        start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(data.get('end_date', data['start_date']), '%Y-%m-%d').date()
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"msg": "start_date and end_date are required (YYYY-MM-DD)"}), 400
+
+    if end_date < start_date:
+        return jsonify({"msg": "end_date must not be before start_date"}), 400
+    if (end_date - start_date).days + 1 > MAX_BATCH_DAYS:
+        return jsonify({"msg": f"Date range too large (max {MAX_BATCH_DAYS} days)"}), 400
+
+    # One ranged query covers every target day plus the two lag days before the range
+    by_date = RecordService.fetch_range(user_id, start_date - timedelta(days=2), end_date)
+
+    targets = sorted(d for d in by_date if start_date <= d <= end_date)
+    if not targets:
+        return jsonify({"msg": "No health records found in this date range."}), 400
+
+    windows = [(
+        record_to_dict(by_date[d]),
+        record_to_dict(by_date.get(d - timedelta(days=1))),
+        record_to_dict(by_date.get(d - timedelta(days=2)))
+    ) for d in targets]
+
+    try:
+        results = MLService.predict_many(windows)
+    except Exception as e:
+        print(f"DEBUG: ML Batch Prediction Error: {str(e)}")
+        return jsonify({"msg": "AI Prediction failed", "error": str(e)}), 500
+
+    # Upsert every prediction in the range within a single transaction
+    RecordService.upsert_predictions(user_id, [{
+        "record_id": by_date[d].id,
+        "date": d,
+        "predicted_phase": result['phase'],
+        "confidence": result['confidence']
+    } for d, result in zip(targets, results)])
+
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"DEBUG: Batch Prediction Error: {str(e)}")
+        return jsonify({"msg": "Database error", "error": str(e)}), 500
+
+    return jsonify([{
+        "date": d.strftime('%Y-%m-%d'),
+        **result
+    } for d, result in zip(targets, results)]), 200
+
 @bp.route('/history', methods=['GET'])
 @jwt_required()
 def get_prediction_history():
+    """
+    Newest first. Optional ?start_date=&end_date= filters and keyset pagination with
+    ?limit= (the next page's ?cursor= comes back in X-Next-Cursor). Supports If-None-Match.
+    """
     user_id = int(get_jwt_identity())
-    history = Prediction.query.filter_by(user_id=user_id).order_by(Prediction.date.desc()).all()
+    try:
+        args = page_args(request.args)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    filters = date_filters(Prediction, args['start_date'], args['end_date'])
+    etag = collection_etag(Prediction, user_id, filters, request.query_string.decode())
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    query = Prediction.query.filter(Prediction.user_id == user_id, *filters)
+    history, next_cursor = keyset_page(query, Prediction, args['limit'], args['cursor'], descending=True)
     
-    return jsonify([{
+    return paged_response(jsonify([{
         "date": p.date.strftime('%Y-%m-%d'),
         "phase": p.predicted_phase,
         "confidence": p.confidence
-    } for p in history])
+    } for p in history]), etag, next_cursor)
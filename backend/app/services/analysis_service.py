@@ -1,13 +1,193 @@
 import pandas as pd
 import os
+import io
+import hashlib
+import threading
+from collections import Counter
+from datetime import datetime
 from flask import current_app
+from ..utils.metrics import stage_timer
+
+SUMMARY_SYMPTOMS = ["cramps", "fatigue", "moodswing", "stress"]
+
+# Sources behind the global summary: (data dir, file name, columns summed, columns value-counted)
+SUMMARY_SOURCES = {
+    "final": ("processed", "final_dataset.csv", ["daily_steps"] + SUMMARY_SYMPTOMS, ["phase"]),
+    "heart": ("raw", "resting_heart_rate.csv", ["value"], []),
+}
+
+# Bytes before the previously consumed offset that must be unchanged for an append-only update
+_TAIL_CHECK_BYTES = 4096
+
+class _SourceState:
+    """Running aggregates for one CSV plus what is needed to detect a pure append."""
+
+    def __init__(self, path, sum_cols, count_cols):
+        self.path = path
+        self.sum_cols = sum_cols
+        self.count_cols = count_cols
+        self.signature = None
+        self.offset = 0
+        self.header = b""
+        self.tail_digest = None
+        self.reset()
+
+    def reset(self):
+        self.rows = 0
+        self.sums = {c: 0.0 for c in self.sum_cols}
+        self.non_null = {c: 0 for c in self.sum_cols}
+        self.value_counts = {c: Counter() for c in self.count_cols}
+
+    def fold(self, df):
+        self.rows += len(df)
+        for c in self.sum_cols:
+            if c in df.columns:
+                self.sums[c] += float(df[c].sum())
+                self.non_null[c] += int(df[c].count())
+        for c in self.count_cols:
+            if c in df.columns:
+                self.value_counts[c].update(df[c].dropna().value_counts().to_dict())
+
+    def mean(self, col):
+        return self.sums[col] / self.non_null[col] if self.non_null.get(col) else float("nan")
+
+    def _digest(self, f, end):
+        f.seek(max(0, end - _TAIL_CHECK_BYTES))
+        return hashlib.sha1(f.read(end - max(0, end - _TAIL_CHECK_BYTES))).hexdigest()
+
+    def refresh(self):
+        """Brings the aggregates up to date with the file; reads only appended rows when possible."""
+        signature = _signature(self.path)
+        if signature == self.signature:
+            return False
+
+        with open(self.path, "rb") as f:
+            appended = (
+                self.signature is not None
+                and self.tail_digest is not None
+                and signature[1] > self.offset
+                and f.read(len(self.header)) == self.header
+                and self._digest(f, self.offset) == self.tail_digest
+            )
+            if appended:
+                f.seek(self.offset)
+                chunk = f.read(signature[1] - self.offset)
+            else:
+                self.reset()
+                self.header = f.readline()
+                self.offset = len(self.header)
+                chunk = f.read()
+
+            # Only complete lines are consumed; a partial last line is picked up next time
+            end = chunk.rfind(b"\n") + 1
+            if end:
+                self.fold(pd.read_csv(io.BytesIO(self.header + chunk[:end])))
+                self.offset += end
+            self.tail_digest = self._digest(f, self.offset)
+
+        self.signature = signature
+        return True
+
+def _signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
 
 class DataAnalysisService:
+    _summary = None
+    _summary_at = None
+    _sources = None
+    _lock = threading.Lock()
+    _refreshing = False
+    _last_error = None
+
     @staticmethod
     def get_global_summary():
+        """
+        Serves the last good summary snapshot. When a source file's mtime or size
+        changes, a background refresh is started and the current snapshot is served
+        (marked stale) until it completes.
+        """
+        cls = DataAnalysisService
         raw_dir = os.path.join(current_app.root_path, '../../data/raw')
         processed_dir = os.path.join(current_app.root_path, '../../data/processed')
-        
+        paths = {name: os.path.join(raw_dir if kind == "raw" else processed_dir, filename)
+                 for name, (kind, filename, _, _) in SUMMARY_SOURCES.items()}
+
+        try:
+            if cls._summary is None:
+                # Nothing to serve yet: compute synchronously
+                cls._refresh_summary(paths)
+            elif cls._is_stale(paths):
+                cls._start_background_refresh(paths)
+        except Exception as e:
+            print(f"Analysis Error: {e}")
+            cls._last_error = str(e)
+
+        if cls._summary is None:
+            return None
+
+        return {
+            **cls._summary,
+            "freshness": {
+                "computed_at": cls._summary_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                "age_seconds": round((datetime.utcnow() - cls._summary_at).total_seconds(), 1),
+                "refreshing": cls._refreshing,
+                "stale": cls._refreshing or cls._is_stale(paths),
+                "last_error": cls._last_error
+            }
+        }
+
+    @classmethod
+    def _is_stale(cls, paths):
+        try:
+            return any(_signature(paths[name]) != state.signature for name, state in cls._sources.items())
+        except OSError:
+            return True
+
+    @classmethod
+    def _start_background_refresh(cls, paths):
+        with cls._lock:
+            if cls._refreshing:
+                return
+            cls._refreshing = True
+
+        def run():
+            try:
+                cls._refresh_summary(paths)
+            except Exception as e:
+                print(f"Analysis Error: {e}")
+                cls._last_error = str(e)
+            finally:
+                cls._refreshing = False
+
+        threading.Thread(target=run, name="summary-refresh", daemon=True).start()
+
+    @classmethod
+    def _refresh_summary(cls, paths):
+        # Works on a copy of the source states so a failed refresh keeps the last good snapshot
+        with cls._lock:
+            sources = cls._sources
+            if sources is None or any(sources[name].path != path for name, path in paths.items()):
+                sources = {name: _SourceState(paths[name], sum_cols, count_cols)
+                           for name, (_, _, sum_cols, count_cols) in SUMMARY_SOURCES.items()}
+            else:
+                sources = {name: _copy_state(state) for name, state in sources.items()}
+
+        for name, state in sources.items():
+            with stage_timer('analysis', f'refresh_{name}'):
+                state.refresh()
+
+        with stage_timer('analysis', 'build_summary'):
+            summary = cls._build_summary(sources)
+        with cls._lock:
+            cls._sources = sources
+            cls._summary = summary
+            cls._summary_at = datetime.utcnow()
+            cls._last_error = None
+
+    @staticmethod
+    def _build_summary(sources):
+        final, heart = sources["final"], sources["heart"]
         summary = {
             "total_records": 0,
             "avg_heart_rate": 0,
@@ -15,31 +195,33 @@ class DataAnalysisService:
             "phase_distribution": {},
             "symptom_averages": {}
         }
-        
-        try:
-            # 1. Prediction Phase Distribution (from processed dataset)
-            df_final = pd.read_csv(os.path.join(processed_dir, 'final_dataset.csv'))
-            summary["total_records"] = len(df_final)
-            summary["phase_distribution"] = df_final['phase'].value_counts().to_dict()
-            
-            # 2. Avg Heart Rate
-            df_heart = pd.read_csv(os.path.join(raw_dir, 'resting_heart_rate.csv'))
-            summary["avg_heart_rate"] = float(df_heart['value'].mean())
-            
-            # 3. Steps (Summarized from large file)
-            # Instead of reading the whole 227MB steps.csv, we take a sample or use the processed daily_steps
-            summary["total_steps"] = float(df_final['daily_steps'].sum())
-            summary["avg_steps"] = float(df_final['daily_steps'].mean())
-
-            # 4. Symptoms
-            symptoms = ["cramps", "fatigue", "moodswing", "stress"]
-            # Map the Likert strings to numbers for averaging if they aren't already
-            # Our processed data already has them as numeric (0-4)
-            for s in symptoms:
-                if s in df_final.columns:
-                    summary["symptom_averages"][s] = float(df_final[s].mean())
-
-            return summary
-        except Exception as e:
-            print(f"Analysis Error: {e}")
-            return None
+
+        # 1. Prediction Phase Distribution (from processed dataset)
+        summary["total_records"] = final.rows
+        summary["phase_distribution"] = dict(final.value_counts["phase"].most_common())
+
+        # 2. Avg Heart Rate
+        summary["avg_heart_rate"] = float(heart.mean("value"))
+
+        # 3. Steps (from the processed daily_steps rather than the 227MB steps.csv)
+        summary["total_steps"] = float(final.sums["daily_steps"])
+        summary["avg_steps"] = float(final.mean("daily_steps"))
+
+        # 4. Symptoms (already numeric 0-4 in the processed data)
+        for s in SUMMARY_SYMPTOMS:
+            if final.non_null.get(s):
+                summary["symptom_averages"][s] = float(final.mean(s))
+
+        return summary
+
+def _copy_state(state):
+    copy = _SourceState(state.path, state.sum_cols, state.count_cols)
+    copy.signature = state.signature
+    copy.offset = state.offset
+    copy.header = state.header
+    copy.tail_digest = state.tail_digest
+    copy.rows = state.rows
+    copy.sums = dict(state.sums)
+    copy.non_null = dict(state.non_null)
+    copy.value_counts = {c: Counter(v) for c, v in state.value_counts.items()}
+    return copy
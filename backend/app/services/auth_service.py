@@ -0,0 +1,66 @@
+"""
+Bounded password hashing.
+
+Hashing is CPU-bound, so at most PASSWORD_HASH_WORKERS hashes run at once per
+process (hashlib releases the GIL while it works) and other requests keep
+getting CPU. The hash runs on the request thread once it holds a slot; no
+handoff to another thread is involved. When PASSWORD_HASH_MAX_PENDING hashes
+are already running or waiting for a slot, new ones are refused right away
+with Backpressure instead of piling up behind them.
+
+Stored hashes made with other parameters than PASSWORD_HASH_METHOD still
+verify, and verify() hands back an upgraded hash for the caller to store.
+"""
+import threading
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+from ..utils.backpressure import Backpressure
+
+class PasswordHasher:
+    _slots = None
+    _pending = 0
+    _lock = threading.Lock()
+    # method -> the prefix werkzeug stores for it ('pbkdf2' -> 'pbkdf2:sha256:1000000')
+    _prefixes = {}
+
+    @classmethod
+    def hash(cls, password):
+        return cls._run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+    @classmethod
+    def verify(cls, password_hash, password):
+        """Returns (matches, new_hash). new_hash is None unless the stored hash uses outdated parameters."""
+        return cls._run(cls._verify, password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+    @classmethod
+    def _run(cls, fn, *args):
+        config = current_app.config
+        with cls._lock:
+            if cls._slots is None:
+                cls._slots = threading.BoundedSemaphore(config['PASSWORD_HASH_WORKERS'])
+            # Admission is decided before any waiting, so an overloaded process answers 429 at once
+            if cls._pending >= config['PASSWORD_HASH_MAX_PENDING']:
+                raise Backpressure("Too many sign-in requests, please retry shortly", retry_after=1)
+            cls._pending += 1
+        try:
+            with cls._slots:
+                return fn(*args)
+        finally:
+            with cls._lock:
+                cls._pending -= 1
+
+    @classmethod
+    def _verify(cls, password_hash, password, method):
+        if not check_password_hash(password_hash, password):
+            return False, None
+        if password_hash.split('$', 1)[0] == cls._prefix(method):
+            return True, None
+        return True, generate_password_hash(password, method)
+
+    @classmethod
+    def _prefix(cls, method):
+        # werkzeug fills in default parameters, so hash once to learn the stored form
+        prefix = cls._prefixes.get(method)
+        if prefix is None:
+            prefix = cls._prefixes[method] = generate_password_hash('', method).split('$', 1)[0]
+        return prefix
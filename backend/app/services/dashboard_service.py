@@ -0,0 +1,129 @@
+"""
+Everything the dashboard shows, in one response (GET /api/dashboard).
+
+One query reads the user's profile together with the counts and change markers
+of their records and predictions (correlated scalar subqueries, so a single
+round trip). Those values form the ETag, so a revalidation or a cache hit costs
+just that query. On a miss, one query reads the recent records joined with
+their predictions and one the most recent predictions; the summary is computed
+from those rows. The serialized payload is kept per user until the ETag moves,
+which any record or prediction write does.
+"""
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import current_app
+from ..models import User, HealthRecord, Prediction, db
+from ..utils.fast_json import dumps
+from ..utils.sample_data import sample_payload
+from .record_service import INTEGER_FIELDS
+
+DEFAULT_RECORDS = 30
+MAX_RECORDS = 366
+RECENT_PREDICTIONS = 10
+# Users whose last dashboard payload is kept in memory (per process)
+CACHE_USERS = 1024
+RECORD_FIELDS = ['id', 'date', 'lh', 'estrogen', 'pdg'] + INTEGER_FIELDS + [
+    'overall_score', 'deep_sleep_in_minutes', 'avg_resting_heart_rate', 'stress_score', 'daily_steps',
+    'last_period_date']
+SUMMARY_FIELDS = ['avg_resting_heart_rate', 'daily_steps', 'stress_score', 'overall_score', 'deep_sleep_in_minutes']
+
+class DashboardService:
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def state(user_id):
+        """Profile plus record/prediction counts and change markers in one query; None for an unknown user."""
+        def aggregate(model, *columns):
+            return db.select(*columns).where(model.user_id == User.id).scalar_subquery()
+
+        changed = lambda model: db.func.max(db.func.coalesce(model.updated_at, model.created_at))
+        stmt = db.select(
+            User.id, User.username, User.email, User.created_at,
+            aggregate(HealthRecord, db.func.count(HealthRecord.id)).label('records'),
+            aggregate(HealthRecord, db.func.max(HealthRecord.id)).label('records_max_id'),
+            aggregate(HealthRecord, changed(HealthRecord)).label('records_changed'),
+            aggregate(HealthRecord, db.func.min(HealthRecord.date)).label('first_date'),
+            aggregate(HealthRecord, db.func.max(HealthRecord.date)).label('last_date'),
+            aggregate(Prediction, db.func.count(Prediction.id)).label('predictions'),
+            aggregate(Prediction, db.func.max(Prediction.id)).label('predictions_max_id'),
+            aggregate(Prediction, changed(Prediction)).label('predictions_changed'),
+        ).where(User.id == user_id)
+        return db.session.execute(stmt).first()
+
+    @staticmethod
+    def etag(state, limit):
+        raw = '|'.join(str(v) for v in (*state, limit))
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    @classmethod
+    def payload(cls, state, limit, etag):
+        """Serialized dashboard JSON for state, from the per-user cache when etag still matches."""
+        with cls._lock:
+            cached = cls._cache.get(state.id)
+            if cached and cached[0] == etag:
+                cls._cache.move_to_end(state.id)
+                return cached[1]
+
+        payload = dumps(cls.build(state, limit))
+        with cls._lock:
+            cls._cache[state.id] = (etag, payload)
+            cls._cache.move_to_end(state.id)
+            while len(cls._cache) > CACHE_USERS:
+                cls._cache.popitem(last=False)
+        return payload
+
+    @staticmethod
+    def build(state, limit):
+        record = HealthRecord.__table__.c
+        prediction = Prediction.__table__.c
+
+        # Latest `limit` records with the prediction for each day
+        rows = db.session.execute(
+            db.select(*[record[f] for f in RECORD_FIELDS], prediction.predicted_phase, prediction.confidence)
+            .select_from(HealthRecord.__table__.outerjoin(
+                Prediction.__table__, db.and_(prediction.user_id == record.user_id, prediction.date == record.date)))
+            .where(record.user_id == state.id)
+            .order_by(record.date.desc())
+            .limit(limit)
+        ).all()[::-1]
+
+        recent = db.session.execute(
+            db.select(prediction.date, prediction.predicted_phase, prediction.confidence)
+            .where(prediction.user_id == state.id)
+            .order_by(prediction.date.desc())
+            .limit(RECENT_PREDICTIONS)
+        ).all()
+        predictions = [{"date": p.date, "phase": p.predicted_phase, "confidence": p.confidence} for p in recent]
+
+        records = [dict(zip(RECORD_FIELDS, row[:len(RECORD_FIELDS)]), is_example=False,
+                        predicted_phase=row.predicted_phase, confidence=row.confidence) for row in rows]
+        is_example = False
+        if not records:
+            sample = sample_payload(current_app.config['SAMPLE_DATA_PATH'])
+            if sample:
+                records, is_example = json.loads(sample), True
+
+        return {
+            "user": {"id": state.id, "username": state.username, "email": state.email,
+                     "created_at": state.created_at},
+            "records": records,
+            "is_example": is_example,
+            "latest_prediction": predictions[0] if predictions else None,
+            "recent_predictions": predictions,
+            "summary": {
+                "total_records": state.records,
+                "total_predictions": state.predictions,
+                "first_date": state.first_date,
+                "last_date": state.last_date,
+                "window_days": len(rows),
+                "latest": {f: getattr(rows[-1], f) for f in SUMMARY_FIELDS} if rows else None,
+                "window_means": {f: _mean([getattr(r, f) for r in rows]) for f in SUMMARY_FIELDS}
+            }
+        }
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return round(sum(values) / len(values), 2) if values else None
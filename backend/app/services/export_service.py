@@ -0,0 +1,69 @@
+"""
+Streaming export of a user's health records with their predictions.
+
+Rows come from one ordered LEFT JOIN read with yield_per (a server-side cursor
+on PostgreSQL), are encoded as CSV or NDJSON and handed out in chunks of about
+EXPORT_CHUNK_BYTES. Memory use depends on the chunk size, not on the length of
+the history.
+"""
+import io
+import csv
+from ..models import HealthRecord, Prediction, db
+from ..utils.fast_json import dumps
+from .record_service import INTEGER_FIELDS
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+EXPORT_FIELDS = ['date', 'lh', 'estrogen', 'pdg'] + INTEGER_FIELDS + [
+    'overall_score', 'deep_sleep_in_minutes', 'avg_resting_heart_rate', 'stress_score', 'daily_steps',
+    'last_period_date', 'predicted_phase', 'confidence']
+# Rows fetched from the cursor at a time
+EXPORT_YIELD_ROWS = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+class ExportService:
+    @staticmethod
+    def query(user_id, filters=()):
+        record = HealthRecord.__table__.c
+        prediction = Prediction.__table__.c
+        columns = [record[f] for f in EXPORT_FIELDS[:-2]] + [prediction.predicted_phase, prediction.confidence]
+        return (
+            db.select(*columns)
+            .select_from(HealthRecord.__table__.outerjoin(
+                Prediction.__table__, db.and_(prediction.user_id == record.user_id, prediction.date == record.date)))
+            .where(record.user_id == user_id, *filters)
+            .order_by(record.date)
+            .execution_options(yield_per=EXPORT_YIELD_ROWS)
+        )
+
+    @staticmethod
+    def stream(user_id, fmt, filters=()):
+        """
+        Yields the export as byte chunks. The first piece (the CSV header, or the first
+        batch of NDJSON rows) is sent on its own so the download starts right away.
+        """
+        encode = _csv_rows if fmt == 'csv' else _ndjson_rows
+        buffer = bytearray()
+        sent = False
+        for data in encode(ExportService.query(user_id, filters)):
+            buffer += data
+            if not sent or len(buffer) >= EXPORT_CHUNK_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+                sent = True
+        if buffer or not sent:
+            yield bytes(buffer)
+
+def _csv_rows(stmt):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(EXPORT_FIELDS)
+    yield out.getvalue().encode()
+    for partition in db.session.execute(stmt).partitions():
+        out.seek(0)
+        out.truncate()
+        writer.writerows(partition)
+        yield out.getvalue().encode()
+
+def _ndjson_rows(stmt):
+    for partition in db.session.execute(stmt).partitions():
+        yield b''.join(dumps(dict(zip(EXPORT_FIELDS, row))) + b'\n' for row in partition)
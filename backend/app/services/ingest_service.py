@@ -0,0 +1,172 @@
+import csv
+import json
+import numpy as np
+import pandas as pd
+from ..models import db
+from .record_service import RecordService, NUMERIC_FIELDS, INTEGER_FIELDS
+from .maintenance_service import PredictionMaintenance
+from .rollup_service import RollupService
+
+# Rows validated and written per batch (one commit per batch)
+BULK_BATCH_ROWS = 1000
+# Error entries returned in a bulk response; the rest are only counted
+MAX_REPORTED_ERRORS = 500
+# Symptoms use a 0-4 Likert scale
+LIKERT_MIN, LIKERT_MAX = 0, 4
+
+DATE_FIELDS = ['date', 'last_period_date']
+BULK_FIELDS = DATE_FIELDS + NUMERIC_FIELDS + INTEGER_FIELDS
+
+class IngestService:
+    """Streaming bulk ingestion of HealthRecord rows from NDJSON or CSV request bodies."""
+
+    @staticmethod
+    def ingest(user_id, lines, fmt, batch_rows=BULK_BATCH_ROWS):
+        """
+        lines: iterable of raw body lines (bytes or str), consumed incrementally
+        fmt: 'ndjson' or 'csv'
+        Returns a report with counts and per-line errors. Valid rows are upserted in batches;
+        rows with errors are skipped without aborting the upload.
+        """
+        report = {"received": 0, "written": 0, "rejected": 0, "batches": 0, "refreshed_predictions": 0, "errors": []}
+        parse = IngestService._ndjson_rows if fmt == 'ndjson' else IngestService._csv_rows
+
+        batch = []
+        for line_no, row, error in parse(lines):
+            report["received"] += 1
+            if error:
+                IngestService._reject(report, line_no, {"row": error})
+                continue
+            batch.append((line_no, row))
+            if len(batch) >= batch_rows:
+                IngestService._write_batch(user_id, batch, report)
+                batch = []
+        if batch:
+            IngestService._write_batch(user_id, batch, report)
+
+        report["errors_truncated"] = report["rejected"] > len(report["errors"])
+        return report
+
+    @staticmethod
+    def _decode(lines):
+        for line_no, line in enumerate(lines, start=1):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8-sig' if line_no == 1 else 'utf-8', errors='replace')
+            line = line.rstrip('\r\n')
+            if line.strip():
+                yield line_no, line
+
+    @staticmethod
+    def _ndjson_rows(lines):
+        for line_no, line in IngestService._decode(lines):
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line_no, None, "Each line must be a JSON object"
+                continue
+            yield line_no, row, None
+
+    @staticmethod
+    def _csv_rows(lines):
+        header = None
+        for line_no, line in IngestService._decode(lines):
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [h.strip() for h in values]
+                continue
+            if len(values) != len(header):
+                yield line_no, None, f"Expected {len(header)} columns, got {len(values)}"
+                continue
+            yield line_no, dict(zip(header, values)), None
+
+    @staticmethod
+    def coerce(raw_rows):
+        """
+        Vectorized validation of a batch of raw dicts.
+        Returns (rows, errors): cleaned dicts (None for rejected rows) and a per-row
+        {field: message} dict. Empty or null values mean "not provided".
+        """
+        df = pd.DataFrame.from_records(raw_rows, columns=BULK_FIELDS).astype(object)
+        provided = df.notna() & (df.astype(str).apply(lambda col: col.str.strip()) != '')
+        errors = [dict() for _ in range(len(df))]
+        cleaned = {}
+
+        def flag(mask, field, message):
+            for i in np.flatnonzero(mask):
+                errors[i][field] = message
+
+        for field in DATE_FIELDS:
+            parsed = pd.to_datetime(df[field].where(provided[field]), format='%Y-%m-%d', errors='coerce')
+            flag(provided[field] & parsed.isna(), field, "Expected a YYYY-MM-DD date")
+            cleaned[field] = parsed
+        flag(~provided['date'], 'date', "Date is required")
+
+        for field in NUMERIC_FIELDS:
+            values = pd.to_numeric(df[field].where(provided[field]), errors='coerce')
+            flag(provided[field] & (values.isna() | np.isinf(values)), field, "Expected a number")
+            cleaned[field] = values
+
+        for field in INTEGER_FIELDS:
+            values = pd.to_numeric(df[field].where(provided[field]), errors='coerce')
+            valid = values.notna() & (values == np.floor(values)) & values.between(LIKERT_MIN, LIKERT_MAX)
+            flag(provided[field] & ~valid, field, f"Expected an integer between {LIKERT_MIN} and {LIKERT_MAX}")
+            cleaned[field] = values
+
+        rows = []
+        for i in range(len(df)):
+            if errors[i]:
+                rows.append(None)
+                continue
+            row = {}
+            for field in BULK_FIELDS:
+                if not provided[field].iat[i]:
+                    continue
+                value = cleaned[field].iat[i]
+                if field in DATE_FIELDS:
+                    row[field] = value.date()
+                elif field in INTEGER_FIELDS:
+                    row[field] = int(value)
+                else:
+                    row[field] = float(value)
+            rows.append(row)
+        return rows, errors
+
+    @staticmethod
+    def _reject(report, line_no, errors):
+        report["rejected"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line_no, "errors": errors})
+
+    @staticmethod
+    def _write_batch(user_id, batch, report):
+        rows, errors = IngestService.coerce([row for _, row in batch])
+        valid = []
+        for (line_no, _), row, row_errors in zip(batch, rows, errors):
+            if row is None:
+                IngestService._reject(report, line_no, row_errors)
+            else:
+                valid.append(row)
+
+        if valid:
+            try:
+                RecordService.upsert_records(user_id, valid)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"DEBUG: Bulk Ingest Error: {str(e)}")
+                for (line_no, _), row in zip(batch, rows):
+                    if row is not None:
+                        IngestService._reject(report, line_no, {"row": f"Database error: {e}"})
+            else:
+                # Repeated dates collapse into one stored row (later rows win)
+                written_dates = {row['date'] for row in valid}
+                report["written"] += len(written_dates)
+                # The rows are committed; each hook runs in its own transaction and logs its own failures
+                # Re-score the batch's dependent predictions in one inference call
+                refreshed = PredictionMaintenance.refresh_after_write(user_id, written_dates)
+                report["refreshed_predictions"] += len(refreshed)
+                RollupService.update_after_write(user_id, written_dates)
+        report["batches"] += 1
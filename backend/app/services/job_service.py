@@ -0,0 +1,222 @@
+"""
+Asynchronous prediction jobs.
+
+POST /api/predictions/jobs records a job in the prediction_jobs table, puts it
+on a bounded in-process queue and returns immediately. A small pool of worker
+threads drains the queue in batches, so a burst of requests costs one
+predict_many call per batch instead of one model pass (and one commit) per
+request. Overload is rejected up front instead of piling up: a full queue, too
+many pending jobs for one user or a user over their rate limit all raise
+Backpressure, which the route turns into a 429.
+
+Job state, the pending counts and the per-user token buckets live in the
+database, so GET /jobs/<id> can be served by any worker process and the limits
+hold across all of them; only the queue itself is per process. Finished jobs
+are deleted PREDICTION_JOB_TTL_SECONDS after they finish. A job still queued or
+running after that long was lost with the process that accepted it (e.g. a
+recycled worker) and is reported as failed.
+"""
+import time
+import uuid
+import queue
+import threading
+from datetime import datetime, timedelta
+from .ml_service import MLService
+from .record_service import RecordService, record_to_dict, _UPSERT_INSERTS
+from ..models import PredictionJob, RateLimit, db
+from ..utils.metrics import Gauge, stage_timer
+from ..utils.backpressure import Backpressure
+
+PENDING_STATUSES = ('queued', 'running')
+# How often each process deletes expired jobs
+EVICT_INTERVAL_SECONDS = 60
+
+def take_token(key, rate_per_minute, burst, attempts=5):
+    """
+    Consumes a token from the shared bucket for key (GCRA: the row keeps the time at which
+    the bucket is full again). Returns 0 on success, else the seconds until a token is
+    available. Commits.
+    """
+    if rate_per_minute <= 0:
+        return 60
+    interval = 60.0 / rate_per_minute
+    tolerance = interval * (max(burst, 1) - 1)
+    for _ in range(attempts):
+        now = time.time()
+        stored = db.session.execute(db.select(RateLimit.tat).where(RateLimit.key == key)).scalar()
+        tat = max(stored or now, now)
+        if tat - now > tolerance:
+            db.session.rollback()
+            return tat - now - tolerance
+        if stored is None:
+            insert = _UPSERT_INSERTS.get(db.engine.dialect.name)
+            if insert is None:
+                db.session.add(RateLimit(key=key, tat=tat + interval))
+                db.session.flush()
+                taken = True
+            else:
+                stmt = insert(RateLimit).values(key=key, tat=tat + interval).on_conflict_do_nothing(index_elements=['key'])
+                taken = db.session.execute(stmt).rowcount == 1
+        else:
+            # Compare-and-set against the value read, so concurrent takers never share a token
+            taken = db.session.execute(db.update(RateLimit).where(
+                RateLimit.key == key, RateLimit.tat == stored).values(tat=tat + interval)).rowcount == 1
+        if taken:
+            db.session.commit()
+            return 0
+        db.session.rollback()
+    return interval
+
+class PredictionJobs:
+    _app = None
+    _queue = None
+    _workers = []
+    _evicted_at = 0.0
+    _lock = threading.Lock()
+
+    @classmethod
+    def submit(cls, app, user_id, target_date):
+        """Queues a prediction for (user_id, target_date). Returns the PredictionJob. Raises Backpressure when overloaded."""
+        config = app.config
+        with cls._lock:
+            cls._start(app)
+        cls._evict(config.get('PREDICTION_JOB_TTL_SECONDS', 600))
+
+        wait = take_token(f'jobs:{user_id}', config.get('PREDICTION_USER_RATE_PER_MINUTE', 60),
+                          config.get('PREDICTION_USER_BURST', 20))
+        if wait:
+            raise Backpressure("Rate limit exceeded", retry_after=wait)
+        pending = db.session.query(db.func.count(PredictionJob.id)).filter(
+            PredictionJob.user_id == user_id, PredictionJob.status.in_(PENDING_STATUSES)).scalar()
+        if pending >= config.get('PREDICTION_USER_MAX_PENDING', 50):
+            raise Backpressure("Too many pending jobs", retry_after=1)
+        if cls._queue.full():
+            raise Backpressure("Prediction queue is full", retry_after=1)
+
+        job = PredictionJob(id=uuid.uuid4().hex, user_id=user_id, date=target_date, status='queued')
+        db.session.add(job)
+        db.session.commit()
+        try:
+            cls._queue.put_nowait((job.id, user_id, target_date))
+        except queue.Full:
+            db.session.delete(job)
+            db.session.commit()
+            raise Backpressure("Prediction queue is full", retry_after=1)
+        return job
+
+    @staticmethod
+    def get(job_id):
+        return db.session.get(PredictionJob, job_id)
+
+    @staticmethod
+    def to_dict(job, ttl):
+        lost = job.status in PENDING_STATUSES and job.created_at < datetime.utcnow() - timedelta(seconds=ttl)
+        return {
+            "id": job.id,
+            "status": 'failed' if lost else job.status,
+            "date": job.date.strftime('%Y-%m-%d'),
+            "result": job.result,
+            "error": "Job was lost before it finished; please resubmit" if lost else job.error
+        }
+
+    @classmethod
+    def depth(cls):
+        return cls._queue.qsize() if cls._queue is not None else 0
+
+    @classmethod
+    def _start(cls, app):
+        # Workers start with the first job so scripts that build the app never spawn threads
+        if cls._queue is not None:
+            return
+        cls._app = app
+        cls._queue = queue.Queue(maxsize=app.config.get('PREDICTION_QUEUE_DEPTH', 256))
+        for i in range(app.config.get('PREDICTION_JOB_WORKERS', 2)):
+            worker = threading.Thread(target=cls._work, name=f"prediction-worker-{i}", daemon=True)
+            worker.start()
+            cls._workers.append(worker)
+
+    @classmethod
+    def _evict(cls, ttl):
+        # Finished jobs expire ttl after finishing; lost ones (never finished) after twice that
+        now = time.time()
+        if now - cls._evicted_at < EVICT_INTERVAL_SECONDS:
+            return
+        cls._evicted_at = now
+        cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+        db.session.execute(db.delete(PredictionJob).where(db.or_(
+            PredictionJob.finished_at < cutoff,
+            PredictionJob.created_at < cutoff - timedelta(seconds=ttl))))
+        db.session.commit()
+
+    @classmethod
+    def _work(cls):
+        batch_size = cls._app.config.get('PREDICTION_JOB_BATCH', 32)
+        while True:
+            batch = [cls._queue.get()]
+            while len(batch) < batch_size:
+                try:
+                    batch.append(cls._queue.get_nowait())
+                except queue.Empty:
+                    break
+            with cls._app.app_context():
+                try:
+                    with stage_timer('jobs', 'batch'):
+                        cls._run_batch(batch)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"DEBUG: Prediction Job Error: {str(e)}")
+                    try:
+                        _finish([{"id": job_id, "error": str(e)} for job_id, _, _ in batch])
+                        db.session.commit()
+                    except Exception as e:
+                        db.session.rollback()
+                        print(f"DEBUG: Prediction Job Error: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    @staticmethod
+    def _run_batch(batch):
+        db.session.execute(db.update(PredictionJob).where(
+            PredictionJob.id.in_([job_id for job_id, _, _ in batch])).values(status='running'))
+        db.session.commit()
+
+        ready, failed = [], []
+        for job_id, user_id, target_date in batch:
+            # Current day and previous 2 days, in one ranged query per job
+            by_date = RecordService.fetch_range(user_id, target_date - timedelta(days=2), target_date)
+            record = by_date.get(target_date)
+            if not record:
+                failed.append({"id": job_id,
+                               "error": "No health record found for this date. Please submit health data first."})
+                continue
+            window = tuple(record_to_dict(by_date.get(target_date - timedelta(days=i))) for i in range(3))
+            ready.append((job_id, user_id, target_date, record, window))
+
+        results = MLService.predict_many([job[-1] for job in ready]) if ready else []
+
+        # One upsert per user; a repeated (user, date) in the batch keeps the latest result
+        rows = {}
+        for (_, user_id, target_date, record, _), result in zip(ready, results):
+            rows.setdefault(user_id, {})[target_date] = {
+                "record_id": record.id,
+                "date": target_date,
+                "predicted_phase": result['phase'],
+                "confidence": result['confidence']
+            }
+        for user_id, by_date in rows.items():
+            RecordService.upsert_predictions(user_id, list(by_date.values()))
+
+        # Results are stored in the same transaction as the predictions
+        _finish(failed + [{"id": job[0], "result": result} for job, result in zip(ready, results)])
+        db.session.commit()
+
+def _finish(jobs):
+    """jobs: list of {"id", and "result" or "error"}. Marks still-pending jobs done or failed. Does not commit."""
+    now = datetime.utcnow()
+    for job in jobs:
+        db.session.execute(db.update(PredictionJob).where(
+            PredictionJob.id == job['id'], PredictionJob.status.in_(PENDING_STATUSES)).values(
+            status='failed' if job.get('error') else 'done',
+            result=job.get('result'), error=job.get('error'), finished_at=now))
+
+Gauge('prediction_queue_depth', 'Async prediction jobs waiting for a worker in this process', PredictionJobs.depth)
@@ -0,0 +1,73 @@
+from datetime import timedelta
+from flask import current_app
+from .ml_service import MLService, LAG_FEATURES
+from .record_service import RecordService, record_to_dict
+from ..models import Prediction, db
+
+# A record feeds the predictions of its own day and of the next LAG_DAYS days
+LAG_DAYS = max(lag for _, lag in LAG_FEATURES) + 1
+MAINTENANCE_MODES = ('off', 'existing', 'all')
+
+class PredictionMaintenance:
+    @staticmethod
+    def affected_dates(written_dates):
+        return {d + timedelta(days=i) for d in written_dates for i in range(LAG_DAYS + 1)}
+
+    @staticmethod
+    def refresh(user_id, written_dates, mode=None):
+        """
+        Re-scores the predictions that depend on the written record dates with one
+        predict_many call and upserts them. Mode (PREDICTION_MAINTENANCE by default):
+        'existing' updates only stored predictions, 'all' also predicts every affected
+        day that has a record, 'off' does nothing. Returns the re-scored dates. Does not commit.
+        """
+        mode = mode or current_app.config.get('PREDICTION_MAINTENANCE', 'existing')
+        if mode not in MAINTENANCE_MODES:
+            raise ValueError(f"Unknown prediction maintenance mode: {mode}")
+        if mode == 'off' or not written_dates:
+            return []
+
+        targets = PredictionMaintenance.affected_dates(written_dates)
+        first, last = min(targets), max(targets)
+        if mode == 'existing':
+            stored = db.session.query(Prediction.date).filter(
+                Prediction.user_id == user_id,
+                Prediction.date >= first,
+                Prediction.date <= last
+            ).all()
+            targets &= {d for (d,) in stored}
+            if not targets:
+                return []
+
+        # One ranged query covers every target day plus its lag days
+        by_date = RecordService.fetch_range(user_id, first - timedelta(days=LAG_DAYS), last)
+        targets = sorted(d for d in targets if d in by_date)
+        if not targets:
+            return []
+
+        windows = [tuple(record_to_dict(by_date.get(d - timedelta(days=i))) for i in range(LAG_DAYS + 1))
+                   for d in targets]
+        results = MLService.predict_many(windows)
+
+        RecordService.upsert_predictions(user_id, [{
+            "record_id": by_date[d].id,
+            "date": d,
+            "predicted_phase": result['phase'],
+            "confidence": result['confidence']
+        } for d, result in zip(targets, results)])
+        return targets
+
+    @staticmethod
+    def refresh_after_write(user_id, written_dates):
+        """
+        Runs refresh in its own transaction after the record write has been committed,
+        so a failed re-score never loses the write. Returns the re-scored dates.
+        """
+        try:
+            dates = PredictionMaintenance.refresh(user_id, written_dates)
+            db.session.commit()
+            return dates
+        except Exception as e:
+            db.session.rollback()
+            print(f"DEBUG: Prediction Maintenance Error: {str(e)}")
+            return []
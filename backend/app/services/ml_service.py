@@ -1,21 +1,110 @@
-import os
-import joblib
-import pandas as pd
-import numpy as np
+import time
+import threading
 from flask import current_app
+from .model_registry import ModelRegistry
+from ..utils.metrics import stage_timer
+
+# Feature order used at training time (see train_and_save_model.py)
+CURRENT_FEATURES = ["lh","estrogen","pdg","cramps","fatigue","moodswing","stress","bloating","sleepissue",
+                    "overall_score","deep_sleep_in_minutes","avg_resting_heart_rate","stress_score","daily_steps"]
+# (source column, which previous day) for the lag features
+LAG_FEATURES = [("lh", 0), ("lh", 1), ("estrogen", 0), ("pdg", 0), ("stress", 0)]
+FEATURES = CURRENT_FEATURES + ["lh_prev1","lh_prev2","estrogen_prev1","pdg_prev1","stress_prev1"]
 
 class MLService:
-    _model = None
-    _scaler = None
-    _le = None
+    _bundle = None
+    _lock = threading.Lock()
+    _manifest_mtime = None
+    _checked_at = 0.0
+
+    @classmethod
+    def registry(cls):
+        return ModelRegistry(current_app.config['ML_MODEL_PATH'])
 
     @classmethod
     def load_resources(cls):
-        if cls._model is None:
-            model_dir = current_app.config['ML_MODEL_PATH']
-            cls._model = joblib.load(os.path.join(model_dir, 'model.joblib'))
-            cls._scaler = joblib.load(os.path.join(model_dir, 'scaler.joblib'))
-            cls._le = joblib.load(os.path.join(model_dir, 'label_encoder.joblib'))
+        """
+        Returns the active ModelBundle, loading it on first use. Callers keep the returned
+        bundle for the whole request, so a concurrent swap never mixes two versions.
+        """
+        bundle = cls._bundle
+        if bundle is None:
+            with cls._lock:
+                if cls._bundle is None:
+                    cls._load_active()
+                return cls._bundle
+
+        # Pick up versions activated by other processes (e.g. the admin API in another worker)
+        now = time.monotonic()
+        if now - cls._checked_at >= current_app.config.get('ML_REGISTRY_POLL_SECONDS', 5):
+            cls._checked_at = now
+            if cls.registry().manifest_mtime() != cls._manifest_mtime:
+                with cls._lock:
+                    if cls.registry().manifest_mtime() != cls._manifest_mtime:
+                        cls._load_active()
+        return cls._bundle
+
+    @classmethod
+    def _load_active(cls):
+        # Must be called with cls._lock held
+        registry = cls.registry()
+        mtime = registry.manifest_mtime()
+        version = registry.active_version()
+        if cls._bundle is None or cls._bundle.version != version:
+            cls._bundle = registry.load(version, engine=cls._wants_engine())
+        cls._manifest_mtime = mtime
+        cls._checked_at = time.monotonic()
+
+    @staticmethod
+    def _wants_engine():
+        return current_app.config.get('ML_INFERENCE_ENGINE') == 'compiled'
+
+    @classmethod
+    def swap(cls, version):
+        """
+        Activates a registry version and hot-swaps it in. The new bundle is fully loaded
+        before the reference is replaced, so in-flight requests finish on the old one.
+        """
+        registry = cls.registry()
+        if version not in registry.read_manifest()['versions']:
+            raise KeyError(f"Unknown model version {version}")
+        bundle = registry.load(version, engine=cls._wants_engine())
+        with cls._lock:
+            registry.activate(version)
+            cls._bundle = bundle
+            cls._manifest_mtime = registry.manifest_mtime()
+            cls._checked_at = time.monotonic()
+        return bundle
+
+    @classmethod
+    def loaded_version(cls):
+        bundle = cls._bundle
+        return bundle.version if bundle else None
+
+    @classmethod
+    def warm_up(cls):
+        """Loads the active bundle and runs one prediction so the first request pays no load cost."""
+        cls.load_resources()
+        return cls.predict_many([({}, {}, {})])
+
+    @staticmethod
+    def build_features(windows):
+        """
+        windows: list of (current, prev1, prev2) metric dicts; missing days may be None or {}
+        Returns an (N, 19) float matrix in training feature order.
+        """
+        import numpy as np
+        X = np.zeros((len(windows), len(FEATURES)), dtype=np.float64)
+        n_current = len(CURRENT_FEATURES)
+        for i, (current, prev1, prev2) in enumerate(windows):
+            current = current or {}
+            prevs = (prev1 or {}, prev2 or {})
+            row = X[i]
+            for j, col in enumerate(CURRENT_FEATURES):
+                row[j] = current.get(col, 0) or 0
+            for j, (col, lag) in enumerate(LAG_FEATURES):
+                row[n_current + j] = prevs[lag].get(col, 0) or 0
+        return X
 
     @classmethod
     def predict(cls, data_dict, historical_records=None):
@@ -23,46 +112,41 @@ class MLService:
         data_dict: current day's health metrics
         historical_records: list of previous 2 days' records (if available)
         """
-        cls.load_resources()
+        historical_records = historical_records or []
+        prev1 = historical_records[0] if len(historical_records) > 0 else {}
+        prev2 = historical_records[1] if len(historical_records) > 1 else {}
+        return cls.predict_many([(data_dict, prev1, prev2)])[0]
+
+    @classmethod
+    def predict_many(cls, windows):
+        """
+        Vectorized prediction for N (current, prev1, prev2) windows.
+        Phase and confidence both come from a single predict_proba pass.
+        """
+        if not windows:
+            return []
+        with stage_timer('ml', 'load'):
+            bundle = cls.load_resources()
+
+        with stage_timer('ml', 'features'):
+            X = cls.build_features(windows)
+        if bundle.engine is not None and len(windows) <= current_app.config.get('ML_COMPILED_MAX_BATCH', 32):
+            # Scaler is folded into the compiled thresholds, so raw rows go straight in
+            with stage_timer('ml', 'compiled_model'):
+                probs = bundle.engine.predict_proba(X)
+        else:
+            with stage_timer('ml', 'scaler'):
+                X_scaled = bundle.scaler.transform(X)
+            with stage_timer('ml', 'model'):
+                probs = bundle.model.predict_proba(X_scaled)
+
+        with stage_timer('ml', 'decode'):
+            import numpy as np
+            encoded = np.argmax(probs, axis=1)
+            labels = bundle.le.inverse_transform(encoded)
+            confidences = probs[np.arange(len(encoded)), encoded]
 
-        # Prepare features array (matching training features)
-        # ["lh","estrogen","pdg","cramps","fatigue","moodswing","stress","bloating","sleepissue",
-        #  "overall_score","deep_sleep_in_minutes","avg_resting_heart_rate","stress_score","daily_steps",
-        #  "lh_prev1","lh_prev2","estrogen_prev1","pdg_prev1","stress_prev1"]
-        
-        features = []
-        # Current day features
-        current_cols = ["lh","estrogen","pdg","cramps","fatigue","moodswing","stress","bloating","sleepissue",
-                        "overall_score","deep_sleep_in_minutes","avg_resting_heart_rate","stress_score","daily_steps"]
-        
-        for col in current_cols:
-            features.append(data_dict.get(col, 0))
-            
-        # Historical features (defaults to 0 if not available)
-        prev1 = historical_records[0] if historical_records and len(historical_records) > 0 else {}
-        prev2 = historical_records[1] if historical_records and len(historical_records) > 1 else {}
-        
-        features.append(prev1.get('lh', 0))
-        features.append(prev2.get('lh', 0))
-        features.append(prev1.get('estrogen', 0))
-        features.append(prev1.get('pdg', 0))
-        features.append(prev1.get('stress', 0))
-        
-        # Convert to numpy and reshape for prediction
-        X = np.array(features).reshape(1, -1)
-        
-        # Scale
-        X_scaled = cls._scaler.transform(X)
-        
-        # Predict
-        prediction_encoded = cls._model.predict(X_scaled)[0]
-        prediction_label = cls._le.inverse_transform([prediction_encoded])[0]
-        
-        # Get probability/confidence
-        probs = cls._model.predict_proba(X_scaled)[0]
-        confidence = float(np.max(probs))
-        
-        return {
-            "phase": prediction_label,
-            "confidence": confidence
-        }
+        return [{
+            "phase": str(label),
+            "confidence": float(conf)
+        } for label, conf in zip(labels, confidences)]
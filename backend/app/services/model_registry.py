@@ -0,0 +1,154 @@
+import os
+import json
+import shutil
+import tempfile
+from datetime import datetime
+from ..utils.file_lock import file_lock
+
+MODEL_FILE = 'model.joblib'
+SCALER_FILE = 'scaler.joblib'
+ENCODER_FILE = 'label_encoder.joblib'
+ENGINE_DIR = 'engine'
+
+# Version name used for the flat model/scaler/encoder files of a directory without a manifest
+LEGACY_VERSION = 'legacy'
+
+class ModelBundle:
+    """An immutable, fully loaded model version: model, scaler, label encoder and optional compiled engine."""
+
+    def __init__(self, version, model, scaler, le, engine=None):
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.le = le
+        self.engine = engine
+
+class ModelRegistry:
+    """
+    Versioned model bundles stored under one directory (Config.ML_MODEL_PATH):
+
+        manifest.json                 {"active": "v2", "versions": {"v1": {...}, "v2": {...}}}
+        versions/<version>/model.joblib, scaler.joblib, label_encoder.joblib
+        versions/<version>/engine/*.npy   precompiled CompiledEnsemble tables
+
+    Bundles are written uncompressed so NumPy arrays are memory-mapped on load and
+    their pages shared by every worker process. The manifest is replaced atomically,
+    and every read-modify-write of it holds .manifest.lock, so concurrent publishers
+    and activations in other processes never lose each other's update.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        self.versions_dir = os.path.join(root, 'versions')
+        self.lock_path = os.path.join(root, '.manifest.lock')
+
+    def read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {"active": None, "versions": {}}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def manifest_mtime(self):
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.manifest-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def active_version(self):
+        return self.read_manifest().get('active') or LEGACY_VERSION
+
+    def version_dir(self, version):
+        if version == LEGACY_VERSION:
+            return self.root
+        return os.path.join(self.versions_dir, version)
+
+    def publish(self, model, scaler, le, version=None, activate=True, metadata=None):
+        """Stores a new bundle (with its compiled engine when the model supports it) and optionally activates it."""
+        if version == LEGACY_VERSION or version in self.read_manifest()['versions']:
+            raise ValueError(f"Model version {version} already exists")
+
+        # Write into a staging directory first so a half-written bundle is never visible
+        os.makedirs(self.versions_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.versions_dir, prefix='.staging-')
+        # joblib (and the model libraries it unpickles) load on first use, not at app import
+        import joblib
+        joblib.dump(model, os.path.join(staging, MODEL_FILE))
+        joblib.dump(scaler, os.path.join(staging, SCALER_FILE))
+        joblib.dump(le, os.path.join(staging, ENCODER_FILE))
+
+        has_engine = False
+        try:
+            from .tree_engine import CompiledEnsemble
+            CompiledEnsemble.from_model(model, scaler).save(os.path.join(staging, ENGINE_DIR))
+            has_engine = True
+        except Exception as e:
+            print(f"Compiled engine not stored for {version or 'the new version'}: {e}")
+
+        # The version name is taken from the manifest, so naming and registering happen under one lock
+        with file_lock(self.lock_path):
+            manifest = self.read_manifest()
+            if version is None:
+                version = f"v{len(manifest['versions']) + 1}"
+                while version in manifest['versions']:
+                    version = f"v{int(version[1:]) + 1}"
+            elif version in manifest['versions']:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise ValueError(f"Model version {version} already exists")
+
+            os.replace(staging, self.version_dir(version))
+            manifest['versions'][version] = {
+                "created_at": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+                "classes": [str(c) for c in le.classes_],
+                "engine": has_engine,
+                **(metadata or {})
+            }
+            if activate or not manifest.get('active'):
+                manifest['active'] = version
+            self._write_manifest(manifest)
+        return version
+
+    def activate(self, version):
+        with file_lock(self.lock_path):
+            manifest = self.read_manifest()
+            if version not in manifest['versions']:
+                raise KeyError(f"Unknown model version {version}")
+            manifest['active'] = version
+            self._write_manifest(manifest)
+
+    def delete(self, version):
+        with file_lock(self.lock_path):
+            manifest = self.read_manifest()
+            if version == manifest.get('active'):
+                raise ValueError("Cannot delete the active model version")
+            if manifest['versions'].pop(version, None) is None:
+                raise KeyError(f"Unknown model version {version}")
+            self._write_manifest(manifest)
+        shutil.rmtree(self.version_dir(version), ignore_errors=True)
+
+    def load(self, version=None, engine=False, mmap_mode='r'):
+        """Loads a bundle (the active one by default). engine=True also provides the compiled evaluator."""
+        version = version or self.active_version()
+        path = self.version_dir(version)
+        import joblib
+        model = joblib.load(os.path.join(path, MODEL_FILE), mmap_mode=mmap_mode)
+        scaler = joblib.load(os.path.join(path, SCALER_FILE), mmap_mode=mmap_mode)
+        le = joblib.load(os.path.join(path, ENCODER_FILE), mmap_mode=mmap_mode)
+
+        compiled = None
+        if engine:
+            from .tree_engine import CompiledEnsemble
+            engine_dir = os.path.join(path, ENGINE_DIR)
+            if os.path.isdir(engine_dir):
+                compiled = CompiledEnsemble.load(engine_dir, mmap_mode=mmap_mode)
+            else:
+                compiled = CompiledEnsemble.from_model(model, scaler)
+
+        return ModelBundle(version, model, scaler, le, compiled)
@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+from sqlalchemy.dialects import postgresql, sqlite
+from ..models import HealthRecord, Prediction, db
+
+# Dialects with a native INSERT ... ON CONFLICT DO UPDATE
+_UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+# Writable HealthRecord metrics, by type
+NUMERIC_FIELDS = ['lh', 'estrogen', 'pdg', 'overall_score', 'deep_sleep_in_minutes',
+                  'avg_resting_heart_rate', 'stress_score', 'daily_steps']
+INTEGER_FIELDS = ['cramps', 'fatigue', 'moodswing', 'stress', 'bloating', 'sleepissue']
+
+# Rows per multi-row INSERT statement
+UPSERT_CHUNK_ROWS = 500
+
+def record_to_dict(r):
+    """Model input metrics of a HealthRecord (missing values as 0); {} for a missing day."""
+    if not r: return {}
+    return {
+        "lh": r.lh or 0,
+        "estrogen": r.estrogen or 0,
+        "pdg": r.pdg or 0,
+        "cramps": r.cramps or 0,
+        "fatigue": r.fatigue or 0,
+        "moodswing": r.moodswing or 0,
+        "stress": r.stress or 0,
+        "bloating": r.bloating or 0,
+        "sleepissue": r.sleepissue or 0,
+        "overall_score": r.overall_score or 0,
+        "deep_sleep_in_minutes": r.deep_sleep_in_minutes or 0,
+        "avg_resting_heart_rate": r.avg_resting_heart_rate or 0,
+        "stress_score": r.stress_score or 0,
+        "daily_steps": r.daily_steps or 0
+    }
+
+class RecordService:
+    @staticmethod
+    def fetch_range(user_id, start_date, end_date):
+        """
+        Loads every HealthRecord of a user between start_date and end_date (inclusive)
+        with a single ranged query. Returns {date: HealthRecord}.
+        """
+        records = HealthRecord.query.filter(
+            HealthRecord.user_id == user_id,
+            HealthRecord.date >= start_date,
+            HealthRecord.date <= end_date
+        ).all()
+        return {r.date: r for r in records}
+
+    @staticmethod
+    def fetch_window(user_id, target_date, days=3):
+        """
+        Loads the prediction window (target day plus the previous days-1 days) in one query.
+        Returns (current, [prev1, prev2, ...]); missing days are None.
+        """
+        by_date = RecordService.fetch_range(user_id, target_date - timedelta(days=days - 1), target_date)
+        previous = [by_date.get(target_date - timedelta(days=i)) for i in range(1, days)]
+        return by_date.get(target_date), previous
+
+    @staticmethod
+    def _upsert(model, rows, update_columns, returning=None):
+        """
+        INSERT ... ON CONFLICT (user_id, date) DO UPDATE for the given rows.
+        Uses the dialect-native statement where available and falls back to
+        select-then-write otherwise. Does not commit.
+        """
+        if not rows:
+            return []
+
+        insert = _UPSERT_INSERTS.get(db.engine.dialect.name)
+        if insert is None:
+            return RecordService._upsert_fallback(model, rows, update_columns, returning)
+
+        # Core statements skip the ORM onupdate hook, so stamp updated_at explicitly
+        now = datetime.utcnow()
+        stmt = insert(model).values([dict(row, updated_at=now) for row in rows])
+        set_ = {col: stmt.excluded[col] for col in update_columns}
+        set_['updated_at'] = stmt.excluded.updated_at
+        stmt = stmt.on_conflict_do_update(index_elements=['user_id', 'date'], set_=set_)
+        if returning is not None:
+            stmt = stmt.returning(returning)
+            return list(db.session.execute(stmt).scalars())
+        db.session.execute(stmt)
+        return []
+
+    @staticmethod
+    def _upsert_fallback(model, rows, update_columns, returning):
+        results = []
+        for row in rows:
+            obj = model.query.filter_by(user_id=row['user_id'], date=row['date']).first()
+            if obj:
+                for col in update_columns:
+                    setattr(obj, col, row[col])
+            else:
+                obj = model(**row)
+                db.session.add(obj)
+            if returning is not None:
+                db.session.flush()
+                results.append(getattr(obj, returning.key))
+        return results
+
+    @staticmethod
+    def upsert_record(user_id, record_date, values):
+        """
+        Creates or updates the record for (user_id, record_date). Only the given
+        fields are overwritten on update. Returns the record id. Does not commit.
+        """
+        row = dict(values, user_id=user_id, date=record_date)
+        ids = RecordService._upsert(HealthRecord, [row], list(values), returning=HealthRecord.id)
+        return ids[0]
+
+    @staticmethod
+    def upsert_records(user_id, rows, chunk_rows=UPSERT_CHUNK_ROWS):
+        """
+        rows: list of dicts with a date plus any writable fields. Rows are grouped by the set of
+        fields they carry (so absent fields are never overwritten) and written with chunked
+        multi-row upserts. Later rows for the same date win. Does not commit.
+        """
+        latest = {}
+        for row in rows:
+            latest[row['date']] = dict(latest.get(row['date'], {}), **row)
+
+        groups = {}
+        for row in latest.values():
+            fields = tuple(sorted(k for k in row if k != 'date'))
+            groups.setdefault(fields, []).append(dict(row, user_id=user_id))
+
+        for fields, group in groups.items():
+            for i in range(0, len(group), chunk_rows):
+                RecordService._upsert(HealthRecord, group[i:i + chunk_rows], list(fields))
+
+    @staticmethod
+    def upsert_predictions(user_id, rows):
+        """
+        rows: list of dicts with date, record_id, predicted_phase and confidence.
+        Writes them all with one multi-row upsert. Does not commit.
+        """
+        rows = [dict(r, user_id=user_id) for r in rows]
+        RecordService._upsert(Prediction, rows, ['record_id', 'predicted_phase', 'confidence'])
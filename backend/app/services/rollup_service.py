@@ -0,0 +1,247 @@
+"""
+Per-user cycle analytics served by GET /api/health/analytics.
+
+Each user has one user_rollups row holding the last ROLLUP_DAYS days of metrics
+(ending at their latest record), the period start dates seen in their records
+and the statistics computed from those. A record write only reads back the
+written rows: the window is moved to the new latest date, the written days are
+patched in and the statistics are recomputed from the fixed-size window with
+NumPy, so the cost does not grow with the user's history. The row is rebuilt
+from the records on a user's first read, and when two writes race on it.
+
+Period starts are only ever added, so a corrected last_period_date keeps its
+old value in the cycle estimate until the row is rebuilt.
+"""
+import statistics
+from datetime import datetime, timedelta
+from ..models import HealthRecord, UserRollup, db
+from .record_service import NUMERIC_FIELDS, INTEGER_FIELDS, _UPSERT_INSERTS
+
+# Two 28-day windows, so the longest mean can be compared with the one before it
+ROLLUP_DAYS = 56
+WINDOWS = (7, 28)
+TRACKED_FIELDS = NUMERIC_FIELDS + INTEGER_FIELDS
+HORMONES = ['lh', 'estrogen', 'pdg']
+# Each symptom is 0-4, so a day's symptom load is 0-24
+SYMPTOMS = INTEGER_FIELDS
+SERIES_FIELDS = HORMONES + ['overall_score', 'stress_score']
+SERIES_DAYS = 28
+# Gaps between period starts outside this range are treated as missed or duplicate logs
+MIN_CYCLE_DAYS, MAX_CYCLE_DAYS = 15, 60
+# Cycles the length estimate is based on
+CYCLES_USED = 6
+
+class RollupConflict(Exception):
+    pass
+
+class RollupService:
+    @staticmethod
+    def get(user_id):
+        """The user's UserRollup, built from their records if it does not exist yet."""
+        rollup = db.session.get(UserRollup, user_id)
+        if rollup is None:
+            RollupService.rebuild(user_id)
+            db.session.commit()
+            rollup = db.session.get(UserRollup, user_id)
+        return rollup
+
+    @staticmethod
+    def rebuild(user_id):
+        """Recomputes the user's rollup from all of their records. Does not commit."""
+        as_of = db.session.query(db.func.max(HealthRecord.date)).filter(HealthRecord.user_id == user_id).scalar()
+        window = _empty_window()
+        if as_of:
+            _patch(window, as_of, _read_rows(user_id, HealthRecord.date >= as_of - timedelta(days=ROLLUP_DAYS - 1)))
+
+        periods = db.session.query(HealthRecord.last_period_date).filter(
+            HealthRecord.user_id == user_id,
+            HealthRecord.last_period_date.isnot(None)
+        ).distinct().all()
+        period_starts = sorted(d.isoformat() for (d,) in periods)
+
+        values = {
+            "user_id": user_id,
+            "as_of": as_of,
+            "window": window,
+            "period_starts": period_starts,
+            "stats": compute_stats(as_of, window, period_starts),
+            "version": 0,
+            "updated_at": datetime.utcnow()
+        }
+        insert = _UPSERT_INSERTS.get(db.engine.dialect.name)
+        if insert is None:
+            rollup = db.session.get(UserRollup, user_id)
+            if rollup is None:
+                db.session.add(UserRollup(**values))
+            else:
+                values["version"] = rollup.version + 1
+                for key, value in values.items():
+                    setattr(rollup, key, value)
+            return
+        stmt = insert(UserRollup).values(**values)
+        db.session.execute(stmt.on_conflict_do_update(index_elements=['user_id'], set_={
+            **{key: stmt.excluded[key] for key in ('as_of', 'window', 'period_starts', 'stats', 'updated_at')},
+            'version': UserRollup.version + 1
+        }))
+
+    @staticmethod
+    def apply_writes(user_id, written_dates):
+        """
+        Folds the current contents of the written record dates into the user's rollup.
+        Raises RollupConflict if another write updated the rollup first. Does not commit.
+        """
+        rollup = db.session.get(UserRollup, user_id)
+        if rollup is None:
+            # Nobody has read analytics yet; the first read builds the row
+            return
+        rows = _read_rows(user_id, HealthRecord.date.in_(sorted(written_dates)))
+        if not rows:
+            return
+
+        as_of = rollup.as_of
+        window = {key: list(values) for key, values in rollup.window.items()}
+        latest = max(r.date for r in rows)
+        if as_of is None or latest > as_of:
+            shift = min((latest - as_of).days, ROLLUP_DAYS) if as_of else ROLLUP_DAYS
+            for key, values in window.items():
+                window[key] = values[shift:] + [None] * shift
+            as_of = latest
+        _patch(window, as_of, rows)
+
+        period_starts = sorted(set(rollup.period_starts) |
+                               {r.last_period_date.isoformat() for r in rows if r.last_period_date})
+
+        result = db.session.execute(
+            db.update(UserRollup)
+            .where(UserRollup.user_id == user_id, UserRollup.version == rollup.version)
+            .values(as_of=as_of, window=window, period_starts=period_starts,
+                    stats=compute_stats(as_of, window, period_starts),
+                    version=rollup.version + 1, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            raise RollupConflict(f"Rollup for user {user_id} changed concurrently")
+
+    @staticmethod
+    def update_after_write(user_id, written_dates):
+        """
+        Runs apply_writes in its own transaction after the record write has been committed,
+        falling back to a rebuild if a concurrent write got there first.
+        """
+        try:
+            try:
+                RollupService.apply_writes(user_id, written_dates)
+            except RollupConflict:
+                db.session.rollback()
+                RollupService.rebuild(user_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"DEBUG: Analytics Rollup Error: {str(e)}")
+
+def _empty_window():
+    return {key: [None] * ROLLUP_DAYS for key in ['logged'] + TRACKED_FIELDS}
+
+def _read_rows(user_id, *filters):
+    columns = [HealthRecord.date, HealthRecord.last_period_date] + [getattr(HealthRecord, f) for f in TRACKED_FIELDS]
+    return db.session.query(*columns).filter(HealthRecord.user_id == user_id, *filters).all()
+
+def _patch(window, as_of, rows):
+    start = as_of - timedelta(days=ROLLUP_DAYS - 1)
+    for row in rows:
+        if not start <= row.date <= as_of:
+            continue
+        i = (row.date - start).days
+        window['logged'][i] = 1
+        for field in TRACKED_FIELDS:
+            window[field][i] = getattr(row, field)
+
+def compute_stats(as_of, window, period_starts):
+    """Statistics for the window ending at as_of. Missing values are skipped, not counted as 0."""
+    import numpy as np
+
+    values = np.array([window[f] for f in TRACKED_FIELDS], dtype=np.float64)  # None -> NaN
+    row = {f: i for i, f in enumerate(TRACKED_FIELDS)}
+    logged = np.array([v is not None for v in window['logged']])
+
+    symptoms = values[[row[f] for f in SYMPTOMS]]
+    reported = ~np.isnan(symptoms)
+    load = np.where(reported.any(axis=0), np.nansum(symptoms, axis=0), np.nan)
+
+    hormones = values[[row[f] for f in HORMONES]]
+    last_week, previous_week = _nanmean(hormones[:, -7:]), _nanmean(hormones[:, -14:-7])
+    slopes = _slopes(hormones[:, -7:])
+
+    series_values = np.vstack([values[[row[f] for f in SERIES_FIELDS]], load])
+    rolling = _rolling_mean(series_values, 7)[:, -SERIES_DAYS:]
+    series_dates = [(as_of - timedelta(days=SERIES_DAYS - 1 - i)).isoformat() for i in range(SERIES_DAYS)] if as_of else []
+
+    return {
+        "as_of": as_of.isoformat() if as_of else None,
+        "days_logged": {f"{w}d": int(logged[-w:].sum()) for w in WINDOWS},
+        "means": {f"{w}d": dict(zip(TRACKED_FIELDS, _clean(_nanmean(values[:, -w:])))) for w in WINDOWS},
+        "hormone_trends": {
+            h: {"slope_per_day_7d": slope, "change_vs_previous_7d": change}
+            for h, slope, change in zip(HORMONES, _clean(slopes), _clean(last_week - previous_week))
+        },
+        "symptom_load": {f"{w}d": _clean(_nanmean(load[None, -w:]))[0] for w in WINDOWS},
+        "rolling_7d": {
+            "dates": series_dates,
+            **{name: _clean(r) if as_of else [] for name, r in zip(SERIES_FIELDS + ['symptom_load'], rolling)}
+        },
+        "cycle": _cycle_stats(as_of, period_starts)
+    }
+
+def _nanmean(block):
+    # Row means over the non-missing values; NaN for rows with none
+    import numpy as np
+    counts = (~np.isnan(block)).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.nansum(block, axis=1) / counts
+
+def _slopes(block):
+    # Least-squares slope per row against the day index, skipping missing days
+    import numpy as np
+    x = np.arange(block.shape[1], dtype=np.float64)
+    mask = ~np.isnan(block)
+    n = mask.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = (x * mask).sum(axis=1) / n
+        y_mean = np.nansum(block, axis=1) / n
+        dx = np.where(mask, x - x_mean[:, None], 0.0)
+        dy = np.where(mask, block - y_mean[:, None], 0.0)
+        variance = (dx * dx).sum(axis=1)
+        return np.where((n >= 2) & (variance > 0), (dx * dy).sum(axis=1) / variance, np.nan)
+
+def _rolling_mean(block, days):
+    # Trailing `days`-day mean per column, over the non-missing values in each span
+    import numpy as np
+    mask = ~np.isnan(block)
+    sums = np.cumsum(np.where(mask, block, 0.0), axis=1)
+    counts = np.cumsum(mask, axis=1)
+    pad = np.zeros((block.shape[0], 1))
+    sums, counts = np.hstack([pad, sums]), np.hstack([pad, counts])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (sums[:, days:] - sums[:, :-days]) / (counts[:, days:] - counts[:, :-days])
+
+def _clean(array):
+    # JSON-ready list: NaN -> None, values rounded for display
+    return [None if v != v else round(float(v), 4) for v in array]
+
+def _cycle_stats(as_of, period_starts):
+    starts = [datetime.strptime(d, '%Y-%m-%d').date() for d in period_starts]
+    lengths = [(b - a).days for a, b in zip(starts, starts[1:])]
+    plausible = [l for l in lengths if MIN_CYCLE_DAYS <= l <= MAX_CYCLE_DAYS][-CYCLES_USED:]
+
+    estimate = statistics.median(plausible) if plausible else None
+
+    last_start = starts[-1] if starts else None
+    in_cycle = last_start is not None and as_of is not None and as_of >= last_start
+    return {
+        "period_starts": [d.isoformat() for d in starts[-(CYCLES_USED + 1):]],
+        "cycle_lengths": lengths[-CYCLES_USED:],
+        "estimated_length_days": estimate,
+        "cycle_day": (as_of - last_start).days + 1 if in_cycle else None,
+        "next_period_estimate": (last_start + timedelta(days=round(estimate))).isoformat()
+        if last_start and estimate else None
+    }
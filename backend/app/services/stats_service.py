@@ -0,0 +1,255 @@
+"""
+Materialized admin statistics.
+
+Totals live in stat_counters and per-hour/per-day activity in stat_buckets.
+Rows are counted by created_at: a refresh folds in the rows created after the
+watermark stored for each metric ('watermark:<metric>', epoch microseconds)
+and up to STATS_WATERMARK_LAG_SECONDS ago. The lag lets transactions that
+were still open when a row got its timestamp commit before that time range
+is read, so rows are neither skipped nor counted twice; a refresh only costs
+the rows created since the last one. The watermark is advanced with a
+compare-and-set, so concurrent refreshes from several processes never count
+a time range twice.
+
+Predictions are re-scored in place, so their phase mix ('predicted_phase:<name>')
+is not accumulated: it is recounted with a GROUP BY at most every
+STATS_PHASE_RECOUNT_SECONDS. The phases in the buckets are the ones the
+predictions had when their bucket was counted.
+"""
+import time
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from ..models import User, HealthRecord, Prediction, StatCounter, StatBucket, db
+from .record_service import _UPSERT_INSERTS
+
+# metric -> (model, column whose values are also bucketed as '<column>:<value>')
+TRACKED = {
+    'users': (User, None),
+    'records': (HealthRecord, None),
+    'predictions': (Prediction, 'predicted_phase'),
+}
+PHASE_PREFIX = 'predicted_phase:'
+GRANULARITIES = {
+    'hour': lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+    'day': lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+BUCKET_STEPS = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+# New rows read per refresh step (one transaction each)
+REFRESH_BATCH_ROWS = 50000
+EPOCH = datetime(1970, 1, 1)
+
+class StatsService:
+    _lock = threading.Lock()
+    _refreshing = False
+    _last_error = None
+
+    @staticmethod
+    def counters():
+        return {c.name: c.value for c in StatCounter.query.all()}
+
+    @classmethod
+    def snapshot(cls):
+        """
+        Current counters plus freshness info. Computed synchronously the first time;
+        afterwards a stale snapshot is served while a background refresh catches up.
+        """
+        counters = cls.counters()
+        refreshed_at = counters.get('refreshed_at')
+        max_age = current_app.config.get('STATS_REFRESH_SECONDS', 30)
+        try:
+            if refreshed_at is None:
+                cls.refresh()
+                counters = cls.counters()
+                refreshed_at = counters.get('refreshed_at')
+            elif time.time() - refreshed_at > max_age:
+                cls._start_background_refresh(current_app._get_current_object())
+        except Exception as e:
+            db.session.rollback()
+            print(f"Stats Error: {e}")
+            cls._last_error = str(e)
+
+        age = round(time.time() - refreshed_at, 1) if refreshed_at is not None else None
+        return counters, {
+            "refreshed_at": datetime.fromtimestamp(refreshed_at, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ') if age is not None else None,
+            "age_seconds": age,
+            "refreshing": cls._refreshing,
+            "last_error": cls._last_error
+        }
+
+    @classmethod
+    def _start_background_refresh(cls, app):
+        with cls._lock:
+            if cls._refreshing:
+                return
+            cls._refreshing = True
+
+        def run():
+            with app.app_context():
+                try:
+                    cls.refresh()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Stats Error: {e}")
+                    cls._last_error = str(e)
+                finally:
+                    cls._refreshing = False
+                    db.session.remove()
+
+        threading.Thread(target=run, name="stats-refresh", daemon=True).start()
+
+    @classmethod
+    def refresh(cls):
+        """Folds every row created since the last refresh (up to the lag window) into the counters and buckets."""
+        config = current_app.config
+        cutoff = datetime.utcnow() - timedelta(seconds=config.get('STATS_WATERMARK_LAG_SECONDS', 60))
+        for metric, (model, breakdown) in TRACKED.items():
+            while cls._refresh_batch(metric, model, breakdown, cutoff):
+                pass
+
+        counted_at = db.session.get(StatCounter, 'phases_counted_at')
+        if counted_at is None or time.time() - counted_at.value >= config.get('STATS_PHASE_RECOUNT_SECONDS', 300):
+            cls.recount_phases()
+        _upsert_counters({'refreshed_at': int(time.time())}, add=False)
+        db.session.commit()
+        cls._last_error = None
+
+    @staticmethod
+    def _refresh_batch(metric, model, breakdown, cutoff):
+        # Returns True when more rows may be waiting before cutoff
+        name = f'watermark:{metric}'
+        mark = db.session.get(StatCounter, name)
+        since = EPOCH + timedelta(microseconds=mark.value) if mark else None
+        if since is not None and since >= cutoff:
+            db.session.rollback()
+            return False
+
+        def created(upper):
+            window = [model.created_at <= upper]
+            return window + [model.created_at > since] if since is not None else window
+
+        # A step ends at the REFRESH_BATCH_ROWS-th row; rows sharing its timestamp go in the same step
+        upper = db.session.query(model.created_at).filter(*created(cutoff)).order_by(model.created_at) \
+            .offset(REFRESH_BATCH_ROWS - 1).limit(1).scalar()
+        more = upper is not None
+        upper = upper or cutoff
+
+        columns = [model.created_at] + ([getattr(model, breakdown)] if breakdown else [])
+        rows = db.session.query(*columns).filter(*created(upper)).all()
+        if not _advance(name, mark.value if mark else None, _micros(upper), exists=mark is not None):
+            # Another process already counted this time range
+            db.session.rollback()
+            return False
+
+        buckets = Counter()
+        for row in rows:
+            keys = [metric]
+            if breakdown and row[1] is not None:
+                keys.append(f'{breakdown}:{row[1]}')
+            for granularity, truncate in GRANULARITIES.items():
+                start = truncate(row.created_at)
+                for key in keys:
+                    buckets[(granularity, start, key)] += 1
+
+        _upsert_counters({metric: len(rows)})
+        _add_buckets(buckets)
+        db.session.commit()
+        return more
+
+    @staticmethod
+    def recount_phases():
+        """Replaces the predicted_phase:<name> counters with a GROUP BY over the stored predictions. Does not commit."""
+        counts = {f'{PHASE_PREFIX}{phase}': n for phase, n in db.session.query(
+            Prediction.predicted_phase, db.func.count(Prediction.id)).group_by(Prediction.predicted_phase)}
+        db.session.execute(db.delete(StatCounter).where(
+            StatCounter.name.startswith(PHASE_PREFIX), StatCounter.name.notin_(list(counts) or [''])))
+        _upsert_counters(dict(counts, phases_counted_at=int(time.time())), add=False)
+
+    @staticmethod
+    def timeseries(granularity, periods, now=None):
+        """
+        Zero-filled activity for the last `periods` buckets, oldest first:
+        [{"start", "users", "records", "predictions", "phases": {...}}, ...]
+        """
+        step = BUCKET_STEPS[granularity]
+        end = GRANULARITIES[granularity](now or datetime.utcnow())
+        since = end - step * (periods - 1)
+
+        series = {}
+        start = since
+        while start <= end:
+            series[start] = {"start": start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                             **{metric: 0 for metric in TRACKED}, "phases": {}}
+            start += step
+
+        buckets = StatBucket.query.filter(
+            StatBucket.granularity == granularity,
+            StatBucket.bucket_start >= since,
+            StatBucket.bucket_start <= end
+        ).all()
+        for b in buckets:
+            entry = series.get(b.bucket_start)
+            if entry is None:
+                continue
+            if b.metric.startswith(PHASE_PREFIX):
+                entry["phases"][b.metric.split(':', 1)[1]] = b.count
+            else:
+                entry[b.metric] = b.count
+        return list(series.values())
+
+def _micros(ts):
+    return (ts - EPOCH) // timedelta(microseconds=1)
+
+def _advance(name, old, new, exists):
+    # Compare-and-set of a watermark
+    if not exists:
+        insert = _UPSERT_INSERTS.get(db.engine.dialect.name)
+        if insert is None:
+            db.session.add(StatCounter(name=name, value=new))
+            db.session.flush()
+            return True
+        stmt = insert(StatCounter).values(name=name, value=new).on_conflict_do_nothing(index_elements=['name'])
+        return db.session.execute(stmt).rowcount == 1
+    result = db.session.execute(
+        db.update(StatCounter).where(StatCounter.name == name, StatCounter.value == old).values(value=new)
+    )
+    return result.rowcount == 1
+
+def _upsert_counters(values, add=True):
+    """Adds to (or with add=False, overwrites) the named counters."""
+    if not values:
+        return
+    insert = _UPSERT_INSERTS.get(db.engine.dialect.name)
+    if insert is None:
+        for name, value in values.items():
+            counter = db.session.get(StatCounter, name)
+            if counter is None:
+                db.session.add(StatCounter(name=name, value=value))
+            else:
+                counter.value = counter.value + value if add else value
+        return
+    stmt = insert(StatCounter).values([{"name": k, "value": v} for k, v in values.items()])
+    new_value = StatCounter.value + stmt.excluded.value if add else stmt.excluded.value
+    db.session.execute(stmt.on_conflict_do_update(index_elements=['name'], set_={'value': new_value}))
+
+def _add_buckets(buckets):
+    if not buckets:
+        return
+    rows = [{"granularity": g, "bucket_start": start, "metric": metric, "count": n}
+            for (g, start, metric), n in buckets.items()]
+    insert = _UPSERT_INSERTS.get(db.engine.dialect.name)
+    if insert is None:
+        for row in rows:
+            bucket = db.session.get(StatBucket, (row['granularity'], row['bucket_start'], row['metric']))
+            if bucket is None:
+                db.session.add(StatBucket(**row))
+            else:
+                bucket.count += row['count']
+        return
+    for i in range(0, len(rows), 500):
+        stmt = insert(StatBucket).values(rows[i:i + 500])
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['granularity', 'bucket_start', 'metric'],
+            set_={'count': StatBucket.count + stmt.excluded.count}
+        ))
@@ -0,0 +1,17 @@
+"""
+Load shedding shared by the services that refuse work when they are overloaded
+(password hashing, async prediction jobs). A service raises Backpressure and
+the route answers 429 with a Retry-After header.
+"""
+import math
+from flask import jsonify
+
+class Backpressure(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def too_busy_response(e):
+    response = jsonify({"msg": str(e)})
+    response.headers['Retry-After'] = str(max(1, math.ceil(e.retry_after)))
+    return response, 429
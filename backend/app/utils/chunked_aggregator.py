@@ -0,0 +1,146 @@
+"""
+Bounded-memory aggregation of large minute-level CSVs (e.g. steps.csv) into
+per-(id, day_in_study) totals.
+
+The file is split into newline-aligned byte ranges. Each range is parsed in
+fixed-size blocks and reduced to partial (sum, count) aggregates per key, so
+peak memory depends on the block size and the number of distinct days, never
+on the file size. Ranges are processed in a process pool when workers > 1.
+
+    python -m app.utils.chunked_aggregator ../data/raw/steps.csv --value steps --out steps_daily.csv
+"""
+import io
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+DEFAULT_KEYS = ("id", "day_in_study")
+DEFAULT_BLOCK_BYTES = 32 * 1024 * 1024
+# Below this size a single process is faster than paying the pool start-up
+MIN_PARALLEL_BYTES = 64 * 1024 * 1024
+
+def count_rows(path, block_bytes=DEFAULT_BLOCK_BYTES):
+    """Exact number of data rows (excluding the header) read in constant memory."""
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_bytes)
+            if not block:
+                break
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+def split_ranges(path, parts):
+    """Splits the data section of a CSV into up to `parts` newline-aligned byte ranges."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.readline()
+        start = len(header)
+        bounds = [start]
+        for i in range(1, parts):
+            f.seek(max(start + (size - start) * i // parts, bounds[-1]))
+            f.readline()
+            pos = min(f.tell(), size)
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(size)
+    ranges = [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+    return header, ranges
+
+def _iter_blocks(f, start, end, block_bytes):
+    # Yields blocks of complete lines between start and end
+    f.seek(start)
+    carry = b""
+    remaining = end - start
+    while remaining > 0:
+        data = f.read(min(block_bytes, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        data = carry + data
+        cut = data.rfind(b"\n") + 1
+        if cut == 0:
+            carry = data
+            continue
+        carry = data[cut:]
+        yield data[:cut]
+    if carry:
+        yield carry
+
+def _reduce(frames, keys):
+    merged = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    return merged.groupby(list(keys), sort=False, as_index=False)[["sum", "count"]].sum()
+
+def _aggregate_range(path, header, start, end, keys, value, block_bytes):
+    """Partial (sum, count) per key and the number of rows parsed for one byte range."""
+    rows = 0
+    partial = None
+    usecols = list(keys) + [value]
+    with open(path, "rb") as f:
+        for block in _iter_blocks(f, start, end, block_bytes):
+            df = pd.read_csv(io.BytesIO(header + block), usecols=usecols)
+            rows += len(df)
+            grouped = df.groupby(list(keys), sort=False)[value].agg(["sum", "count"]).reset_index()
+            partial = grouped if partial is None else _reduce([partial, grouped], keys)
+    return rows, partial
+
+def aggregate_daily(path, value, how="sum", keys=DEFAULT_KEYS, workers=None, block_bytes=DEFAULT_BLOCK_BYTES):
+    """
+    Streams `path` and aggregates `value` per key.
+
+    how: 'sum', 'mean' or 'count' (non-null values)
+    workers: number of processes; defaults to the CPU count for files above MIN_PARALLEL_BYTES
+    Returns (total_rows, DataFrame[keys + [value]]) sorted by keys.
+    """
+    if how not in ("sum", "mean", "count"):
+        raise ValueError(f"Unsupported aggregation: {how}")
+
+    if workers is None:
+        workers = (os.cpu_count() or 1) if os.path.getsize(path) >= MIN_PARALLEL_BYTES else 1
+    header, ranges = split_ranges(path, max(workers, 1))
+
+    args = [(path, header, start, end, tuple(keys), value, block_bytes) for start, end in ranges]
+    if workers > 1 and len(ranges) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_aggregate_range, *zip(*args)))
+    else:
+        results = [_aggregate_range(*a) for a in args]
+
+    total_rows = sum(rows for rows, _ in results)
+    partials = [p for _, p in results if p is not None]
+    if not partials:
+        return total_rows, pd.DataFrame(columns=list(keys) + [value])
+
+    merged = _reduce(partials, keys)
+    if how == "sum":
+        merged[value] = merged["sum"]
+    elif how == "mean":
+        merged[value] = merged["sum"] / merged["count"]
+    else:
+        merged[value] = merged["count"]
+    daily = merged[list(keys) + [value]].sort_values(list(keys)).reset_index(drop=True)
+    return total_rows, daily
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate a large CSV per (id, day_in_study) in bounded memory")
+    parser.add_argument("path")
+    parser.add_argument("--value", default="steps")
+    parser.add_argument("--how", default="sum", choices=["sum", "mean", "count"])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--block-mb", type=int, default=DEFAULT_BLOCK_BYTES // (1024 * 1024))
+    parser.add_argument("--out", help="Write the daily aggregates to this CSV")
+    args = parser.parse_args()
+
+    rows, daily = aggregate_daily(args.path, args.value, how=args.how, workers=args.workers,
+                                  block_bytes=args.block_mb * 1024 * 1024)
+    print(f"{rows} rows -> {len(daily)} daily groups")
+    if args.out:
+        daily.to_csv(args.out, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Columnar, memory-mapped copies of the CSV datasets for ad-hoc queries.
+
+For data/raw/foo.csv the columns live in data/raw/.columns/foo.csv/ as one .npy
+file per column plus meta.json (source mtime/size, row count and each column's
+kind). The copy is rebuilt whenever the source file changes. Numbers are stored
+as int64/float64 (booleans as uint8), text as int32 codes into a sorted
+dictionary kept in meta.json (-1 for missing). A query maps only the columns it
+touches and runs its filters, projection and group-by as vectorized scans, so
+it never parses the CSV.
+
+A build reads the CSV in BUILD_CHUNK_ROWS chunks (one pass to settle each
+column's kind, one to write the columns), so its memory use does not grow with
+the file. Each file has its own lock: a build only holds up queries on that
+file, and a lock file next to the store keeps worker processes from building
+the same copy at once. Convert large files ahead of time so no request pays
+for the build:
+
+    python -m app.utils.column_store    # convert every dataset up front
+"""
+import os
+import json
+import shutil
+import tempfile
+import threading
+import numpy as np
+from .file_lock import file_lock
+
+COLUMNS_DIRNAME = '.columns'
+FILTER_OPS = ('eq', 'ne', 'lt', 'lte', 'gt', 'gte', 'in', 'between', 'is_null', 'not_null')
+AGGREGATES = ('count', 'sum', 'mean', 'min', 'max')
+DEFAULT_RESULT_ROWS = 100
+MAX_RESULT_ROWS = 1000
+# CSV rows parsed at a time while building
+BUILD_CHUNK_ROWS = 200000
+
+_COMPARISONS = {
+    'eq': np.equal, 'ne': np.not_equal,
+    'lt': np.less, 'lte': np.less_equal, 'gt': np.greater, 'gte': np.greater_equal,
+}
+
+_cache = {}
+_cache_lock = threading.Lock()
+# path -> lock held while that file's store is loaded or built
+_path_locks = {}
+
+class QueryError(ValueError):
+    pass
+
+def _signature(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+class ColumnStore:
+    def __init__(self, path, directory, meta):
+        self.path = path
+        self.directory = directory
+        self.signature = meta['signature']
+        self.rows = meta['rows']
+        self.kinds = {c['name']: c['kind'] for c in meta['columns']}
+        self.dictionaries = {c['name']: c['dictionary'] for c in meta['columns'] if c['kind'] == 'text'}
+        self.columns = [c['name'] for c in meta['columns']]
+        self._files = {c['name']: c['file'] for c in meta['columns']}
+        self._arrays = {}
+        self._codes = {name: {v: i for i, v in enumerate(d)} for name, d in self.dictionaries.items()}
+
+    @classmethod
+    def for_file(cls, path):
+        """Returns an up-to-date store for the CSV at path, converting it if needed."""
+        path = os.path.abspath(path)
+        signature = _signature(path)
+        with _cache_lock:
+            store = _cache.get(path)
+            if store is not None and store.signature == signature:
+                return store
+            lock = _path_locks.setdefault(path, threading.Lock())
+
+        # Only queries on this file wait for its build
+        with lock:
+            store = _cache.get(path)
+            if store is None or store.signature != signature:
+                store = cls._load(path, signature)
+                if store is None:
+                    with file_lock(cls._directory(path) + '.lock'):
+                        # Another process may have finished the build while this one waited
+                        store = cls._load(path, signature) or cls._build(path, signature)
+                with _cache_lock:
+                    _cache[path] = store
+            return store
+
+    @staticmethod
+    def _directory(path):
+        return os.path.join(os.path.dirname(path), COLUMNS_DIRNAME, os.path.basename(path))
+
+    @classmethod
+    def _load(cls, path, signature):
+        directory = cls._directory(path)
+        try:
+            with open(os.path.join(directory, 'meta.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('signature') != signature:
+            return None
+        return cls(path, directory, meta)
+
+    @classmethod
+    def _build(cls, path, signature, chunk_rows=BUILD_CHUNK_ROWS):
+        import pandas as pd
+
+        # Pass 1: each column's kind over the whole file, as a single read_csv would infer it
+        rows, seen = 0, {}
+        for chunk in pd.read_csv(path, chunksize=chunk_rows, low_memory=False):
+            rows += len(chunk)
+            for name in chunk.columns:
+                seen.setdefault(name, set()).add(_kind(pd, chunk[name]))
+        if not seen:
+            seen = {name: {'text'} for name in pd.read_csv(path, nrows=0).columns}
+        kinds = {name: _merge_kinds(found) for name, found in seen.items()}
+
+        directory = cls._directory(path)
+        os.makedirs(os.path.dirname(directory), exist_ok=True)
+        staging = tempfile.mkdtemp(dir=os.path.dirname(directory), prefix=f'.{os.path.basename(path)}-')
+
+        # Pass 2: convert chunk by chunk straight into the memory-mapped .npy files
+        columns, outputs, dictionaries = [], {}, {}
+        for i, (name, kind) in enumerate(kinds.items()):
+            entry = {"name": name, "kind": kind, "file": f"c{i}.npy", "dictionary": None}
+            outputs[name] = np.lib.format.open_memmap(os.path.join(staging, entry["file"]), mode='w+',
+                                                      dtype=_STORAGE[kind], shape=(rows,))
+            if kind == 'text':
+                dictionaries[name] = {}
+            columns.append(entry)
+
+        dtypes = {name: {'text': str, 'float': 'float64'}.get(kind) for name, kind in kinds.items()}
+        offset = 0
+        for chunk in pd.read_csv(path, chunksize=chunk_rows, low_memory=False,
+                                 dtype={name: dtype for name, dtype in dtypes.items() if dtype}):
+            end = offset + len(chunk)
+            for name, kind in kinds.items():
+                series = chunk[name]
+                if kind == 'text':
+                    # Codes in first-seen order for now; remapped to the sorted dictionary below
+                    codes = dictionaries[name]
+                    values, inverse = np.unique(series.dropna().to_numpy(str), return_inverse=True)
+                    local = np.array([codes.setdefault(v, len(codes)) for v in values.tolist()], dtype=np.int32)
+                    out = np.full(len(series), -1, dtype=np.int32)
+                    out[series.notna().to_numpy()] = local[inverse.ravel()] if len(values) else []
+                    outputs[name][offset:end] = out
+                else:
+                    outputs[name][offset:end] = series.to_numpy(_STORAGE[kind])
+            offset = end
+
+        for entry in columns:
+            name = entry["name"]
+            if entry["kind"] == 'text':
+                codes = dictionaries[name]
+                dictionary = sorted(codes)
+                remap = np.empty(len(codes) + 1, dtype=np.int32)
+                remap[-1] = -1
+                remap[[codes[v] for v in dictionary]] = np.arange(len(dictionary), dtype=np.int32)
+                data = outputs[name]
+                for start in range(0, rows, chunk_rows):
+                    data[start:start + chunk_rows] = remap[data[start:start + chunk_rows]]
+                entry["dictionary"] = dictionary
+            outputs[name].flush()
+        del outputs
+
+        meta = {"signature": signature, "rows": rows, "columns": columns}
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        # Swap the finished copy in; readers of the old one keep their mappings
+        if os.path.exists(directory):
+            retired = tempfile.mkdtemp(dir=os.path.dirname(directory), prefix='.retired-')
+            os.replace(directory, os.path.join(retired, 'old'))
+            shutil.rmtree(retired, ignore_errors=True)
+        os.replace(staging, directory)
+        return cls(path, directory, meta)
+
+    def column(self, name):
+        """(kind, memory-mapped array) for a column. Raises QueryError for unknown columns."""
+        if not isinstance(name, str):
+            raise QueryError(f"Column names must be strings, got {json.dumps(name)}")
+        if name not in self.kinds:
+            raise QueryError(f"Unknown column: {name}")
+        array = self._arrays.get(name)
+        if array is None:
+            array = self._arrays[name] = np.load(os.path.join(self.directory, self._files[name]), mmap_mode='r')
+        return self.kinds[name], array
+
+    # -----------------------------------------------------------------------
+    # Query execution
+    # -----------------------------------------------------------------------
+
+    def query(self, spec):
+        """
+        Runs a query spec:
+            {"columns": [...], "filters": [{"column", "op", "value"}, ...],
+             "group_by": [...], "aggregates": [{"fn", "column"}, ...], "offset": 0, "limit": 100}
+        Without aggregates, returns the matching rows projected to columns (all by default).
+        With aggregates, returns one row per group_by key (a single row without group_by).
+        Raises QueryError for invalid specs.
+        """
+        if not isinstance(spec, dict):
+            raise QueryError("Query must be a JSON object")
+        mask = np.ones(self.rows, dtype=bool)
+        for f in _list(spec, 'filters'):
+            if not isinstance(f, dict):
+                raise QueryError("Each filter must be an object with column, op and value")
+            mask &= self._filter(f.get('column'), f.get('op', 'eq'), f.get('value'))
+        matched = np.flatnonzero(mask)
+
+        limit = _bounded_int(spec.get('limit', DEFAULT_RESULT_ROWS), 'limit', 1, MAX_RESULT_ROWS)
+        result = {"rows_scanned": self.rows, "rows_matched": int(len(matched))}
+        if spec.get('aggregates') or spec.get('group_by'):
+            result.update(self._aggregate(matched, _list(spec, 'group_by'), _list(spec, 'aggregates'), limit))
+        else:
+            offset = _bounded_int(spec.get('offset', 0), 'offset', 0, None)
+            columns = _list(spec, 'columns') or self.columns
+            selected = matched[offset:offset + limit]
+            values = [self._decode(name, self.column(name)[1][selected]) for name in columns]
+            result.update({
+                "columns": columns,
+                "offset": offset,
+                "rows": [dict(zip(columns, row)) for row in zip(*values)] if values else []
+            })
+        return result
+
+    def _filter(self, name, op, value):
+        if op not in FILTER_OPS:
+            raise QueryError(f"Unknown operator: {op}. Expected one of: {', '.join(FILTER_OPS)}")
+        kind, data = self.column(name)
+        missing = data < 0 if kind == 'text' else np.isnan(data) if kind == 'float' else np.zeros(len(data), dtype=bool)
+        if op == 'is_null':
+            return missing
+        if op == 'not_null':
+            return ~missing
+
+        if op == 'between':
+            if not isinstance(value, list) or len(value) != 2:
+                raise QueryError(f"between on {name} needs a [low, high] value")
+            low, high = (self._operand(name, kind, v) for v in value)
+            return (data >= low) & (data <= high) & ~missing
+        if op == 'in':
+            if not isinstance(value, list):
+                raise QueryError(f"in on {name} needs a list value")
+            return np.isin(data, [self._operand(name, kind, v, strict=False) for v in value]) & ~missing
+        if kind == 'text' and op not in ('eq', 'ne'):
+            raise QueryError(f"Operator {op} is not supported on text column {name}")
+        # Missing values never match, as in SQL
+        return _COMPARISONS[op](data, self._operand(name, kind, value, strict=False)) & ~missing
+
+    def _operand(self, name, kind, value, strict=True):
+        if kind == 'text':
+            if not isinstance(value, str):
+                raise QueryError(f"Column {name} holds text; expected a string value")
+            if strict:
+                raise QueryError(f"Range comparisons are not supported on text column {name}")
+            # A value that never occurs matches nothing
+            return self._codes[name].get(value, -2)
+        if kind == 'bool' and isinstance(value, bool):
+            return int(value)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise QueryError(f"Column {name} is numeric; expected a number")
+        return value
+
+    def _aggregate(self, matched, group_by, aggregates, limit):
+        specs = []
+        for agg in aggregates:
+            if not isinstance(agg, dict) or agg.get('fn') not in AGGREGATES:
+                raise QueryError(f"Each aggregate needs fn (one of: {', '.join(AGGREGATES)}) and usually a column")
+            fn, name = agg['fn'], agg.get('column')
+            if name is None and fn != 'count':
+                raise QueryError(f"{fn} needs a column")
+            if name is not None and self.column(name)[0] == 'text' and fn != 'count':
+                raise QueryError(f"{fn} is not supported on text column {name}")
+            label = agg.get('as') or (f"{fn}_{name}" if name else fn)
+            if not isinstance(label, str):
+                raise QueryError(f"Aggregate labels (as) must be strings, got {json.dumps(label)}")
+            specs.append((fn, name, label))
+        if not specs:
+            specs.append(('count', None, 'count'))
+
+        # Group ids: each group_by column is factorized, then the per-column codes are combined
+        columns = {}
+        group_ids, n_groups = np.zeros(len(matched), dtype=np.int64), 1
+        if group_by:
+            codes, uniques = [], []
+            for name in group_by:
+                values, inverse = np.unique(np.asarray(self.column(name)[1][matched]), return_inverse=True)
+                uniques.append(values)
+                codes.append(inverse.ravel())
+            sizes = [max(len(values), 1) for values in uniques]
+            keys, group_ids = np.unique(np.ravel_multi_index(codes, sizes), return_inverse=True)
+            group_ids, n_groups = group_ids.ravel(), len(keys)
+            for name, values, part in zip(group_by, uniques, np.unravel_index(keys, sizes)):
+                columns[name] = self._decode(name, values[part])
+        for fn, name, label in specs:
+            columns[label] = _reduce(fn, group_ids, n_groups, self.column(name) if name else None, matched)
+
+        labels = list(columns)
+        rows = [dict(zip(labels, row)) for row in zip(*columns.values())]
+        return {"columns": labels, "groups": n_groups, "truncated": n_groups > limit, "rows": rows[:limit]}
+
+    def _decode(self, name, values):
+        kind = self.kinds[name]
+        if kind == 'text':
+            dictionary = self.dictionaries[name]
+            return [dictionary[c] if c >= 0 else None for c in values.tolist()]
+        if kind == 'bool':
+            return [bool(v) for v in values.tolist()]
+        if kind == 'float':
+            return [None if v != v else v for v in values.tolist()]
+        return values.tolist()
+
+_STORAGE = {'bool': np.uint8, 'int': np.int64, 'float': np.float64, 'text': np.int32}
+
+def _kind(pd, series):
+    if pd.api.types.is_bool_dtype(series):
+        return 'bool'
+    if pd.api.types.is_integer_dtype(series):
+        return 'int'
+    if pd.api.types.is_float_dtype(series):
+        return 'float'
+    return 'text'
+
+def _merge_kinds(kinds):
+    # Chunks of one column may parse differently; combine them the way a whole-file read would
+    if len(kinds) == 1:
+        return next(iter(kinds))
+    if kinds <= {'int', 'float'}:
+        return 'float'
+    return 'text'
+
+def _reduce(fn, group_ids, n_groups, column, matched):
+    if column is None:
+        return np.bincount(group_ids, minlength=n_groups).tolist()
+    kind, data = column
+    values = np.asarray(data[matched])
+    present = values >= 0 if kind == 'text' else ~np.isnan(values) if kind == 'float' else np.ones(len(values), dtype=bool)
+    ids = group_ids[present]
+    counts = np.bincount(ids, minlength=n_groups)
+    if fn == 'count':
+        return counts.tolist()
+
+    values = values[present].astype(np.float64)
+    if fn in ('sum', 'mean'):
+        sums = np.bincount(ids, weights=values, minlength=n_groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = sums / counts if fn == 'mean' else sums
+    else:
+        out = np.full(n_groups, np.inf if fn == 'min' else -np.inf)
+        (np.minimum if fn == 'min' else np.maximum).at(out, ids, values)
+    # Groups without a value for the column get null
+    return [None if n == 0 else float(v) for v, n in zip(out.tolist(), counts.tolist())]
+
+def _list(spec, key):
+    value = spec.get(key) or []
+    if not isinstance(value, list):
+        raise QueryError(f"{key} must be a list")
+    return value
+
+def _bounded_int(value, name, low, high):
+    if isinstance(value, bool) or not isinstance(value, int) or value < low or (high is not None and value > high):
+        bound = f"between {low} and {high}" if high is not None else f">= {low}"
+        raise QueryError(f"{name} must be an integer {bound}")
+    return value
+
+def main():
+    data_dir = os.path.join(os.path.dirname(__file__), '../../../data')
+    for kind in ('raw', 'processed'):
+        folder = os.path.abspath(os.path.join(data_dir, kind))
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.endswith('.csv'):
+                store = ColumnStore.for_file(os.path.join(folder, name))
+                print(f"{kind}/{name}: {store.rows} rows, {len(store.columns)} columns")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Response compression (after_request hook).
+
+Textual responses of at least COMPRESS_MIN_BYTES are encoded with brotli when
+the client accepts it and the optional `brotli` package is installed, with gzip
+otherwise. Streamed and already-encoded responses are left alone; a streaming
+endpoint can wrap its body in gzip_stream() instead.
+"""
+import gzip
+import zlib
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/plain', 'text/html'}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def compress_response(response):
+    if (response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if not 200 <= response.status_code < 300 or request.method == 'HEAD':
+        return response
+    data = response.get_data()
+    if len(data) < current_app.config.get('COMPRESS_MIN_BYTES', 1024):
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        data, encoding = brotli.compress(data, quality=BROTLI_QUALITY), 'br'
+    elif accepted['gzip']:
+        data, encoding = gzip.compress(data, compresslevel=GZIP_LEVEL), 'gzip'
+    else:
+        return response
+
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def gzip_stream(chunks):
+    """Gzip-encodes an iterable of byte chunks as it is consumed, flushing after each chunk."""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        # A sync flush per chunk hands each chunk to the client instead of buffering it
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
@@ -0,0 +1,33 @@
+"""
+Exclusive locks that hold across processes (e.g. gunicorn workers and CLI
+scripts on one host), taken with flock on a lock file. Where flock is not
+available (Windows) only the threads of one process are serialized.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_thread_locks = {}
+_guard = threading.Lock()
+
+@contextmanager
+def file_lock(path):
+    """Holds an exclusive lock on path (created if missing) for the duration of the block."""
+    with _guard:
+        lock = _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,160 @@
+"""
+In-process metrics in the Prometheus text format, served at GET /metrics.
+
+    http_request_duration_seconds{method,endpoint,status}   request middleware
+    db_queries_per_request{endpoint}, db_time_per_request_seconds{endpoint}
+    db_query_duration_seconds                                SQLAlchemy cursor events
+    stage_duration_seconds{component,stage}                  stage_timer() blocks
+    prediction_queue_depth                                   async prediction jobs
+
+Queries slower than SLOW_QUERY_SECONDS are printed with their SQL. Metrics are
+kept per process; with several workers each one reports its own.
+"""
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from flask import Response, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+_registry = []
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = [(key, list(counts), total, n) for key, (counts, total, n) in self._series.items()]
+        for key, counts, total, n in sorted(snapshot):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, ("le", le))} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {n}')
+        return lines
+
+class Gauge:
+    """A value read from a callback at scrape time."""
+    def __init__(self, name, help_text, callback):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        _registry.append(self)
+
+    def render(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge', f'{self.name} {self.callback()}']
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Request latency',
+                             ('method', 'endpoint', 'status'))
+QUERIES_PER_REQUEST = Histogram('db_queries_per_request', 'SQL statements executed per request',
+                                ('endpoint',), COUNT_BUCKETS)
+DB_TIME_PER_REQUEST = Histogram('db_time_per_request_seconds', 'Time spent in SQL per request', ('endpoint',))
+QUERY_DURATION = Histogram('db_query_duration_seconds', 'SQL statement latency')
+STAGE_DURATION = Histogram('stage_duration_seconds', 'Latency of named service stages', ('component', 'stage'))
+
+@contextmanager
+def stage_timer(component, stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - started, component=component, stage=stage)
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with serialization time recorded as the http/serialize stage."""
+    def dumps(self, obj, **kwargs):
+        with stage_timer('http', 'serialize'):
+            return super().dumps(obj, **kwargs)
+
+# ---------------------------------------------------------------------------
+# SQLAlchemy query events (registered once for every engine)
+# ---------------------------------------------------------------------------
+
+_slow_query_seconds = None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    QUERY_DURATION.observe(elapsed)
+    if has_request_context() and 'db_queries' in g:
+        g.db_queries += 1
+        g.db_time += elapsed
+    if _slow_query_seconds is not None and elapsed >= _slow_query_seconds:
+        print(f"SLOW QUERY ({elapsed * 1000:.1f}ms): {' '.join(statement.split())[:500]}")
+
+# ---------------------------------------------------------------------------
+# App wiring
+# ---------------------------------------------------------------------------
+
+def init_app(app):
+    global _slow_query_seconds
+    _slow_query_seconds = app.config.get('SLOW_QUERY_SECONDS')
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_started = time.perf_counter()
+        g.db_queries = 0
+        g.db_time = 0.0
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_DURATION.observe(time.perf_counter() - started, method=request.method,
+                                     endpoint=endpoint, status=str(response.status_code))
+            QUERIES_PER_REQUEST.observe(g.get('db_queries', 0), endpoint=endpoint)
+            DB_TIME_PER_REQUEST.observe(g.get('db_time', 0.0), endpoint=endpoint)
+        return response
+
+    def metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
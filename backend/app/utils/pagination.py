@@ -0,0 +1,119 @@
+"""
+Keyset pagination and conditional GET for per-user, date-keyed collections
+(HealthRecord, Prediction).
+
+Pages are ordered on (date, id) and continue from an opaque cursor holding
+the last row's key, so page N costs the same as page 1. ETags are derived
+from the filtered collection's row count, highest id and latest change, so
+they can be checked with one aggregate query before any row is loaded.
+"""
+import base64
+import hashlib
+from datetime import datetime
+from flask import Response, request
+from sqlalchemy import func
+from sqlalchemy.orm import Query
+from ..models import db
+
+# Largest page a client may request with ?limit=
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(row):
+    raw = f"{row.date.isoformat()}|{row.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        date_str, row_id = raw.split('|')
+        return datetime.strptime(date_str, '%Y-%m-%d').date(), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+def date_args(args):
+    """Parses ?start_date=&end_date= into a dict (None when absent). Raises ValueError."""
+    parsed = {}
+    for key in ('start_date', 'end_date'):
+        value = args.get(key)
+        try:
+            parsed[key] = datetime.strptime(value, '%Y-%m-%d').date() if value else None
+        except ValueError:
+            raise ValueError(f"{key} must be YYYY-MM-DD")
+    return parsed
+
+def page_args(args):
+    """
+    Parses ?start_date=&end_date=&limit=&cursor= into a dict.
+    limit is None when absent (the whole filtered collection). Raises ValueError.
+    """
+    parsed = date_args(args)
+
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    parsed['limit'] = limit
+
+    cursor = args.get('cursor')
+    parsed['cursor'] = decode_cursor(cursor) if cursor else None
+    return parsed
+
+def date_filters(model, start_date=None, end_date=None):
+    filters = []
+    if start_date:
+        filters.append(model.date >= start_date)
+    if end_date:
+        filters.append(model.date <= end_date)
+    return filters
+
+def keyset_page(query, model, limit=None, cursor=None, descending=False):
+    """
+    Applies (date, id) keyset ordering to query (an ORM query or a Core select that
+    includes the date and id columns). Returns (rows, next_cursor); next_cursor is None
+    on the last page.
+    """
+    key = db.tuple_(model.date, model.id)
+    if cursor:
+        query = query.filter(key < cursor if descending else key > cursor)
+    if descending:
+        query = query.order_by(model.date.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.date.asc(), model.id.asc())
+
+    if limit is None:
+        return _fetch(query), None
+    rows = _fetch(query.limit(limit + 1))
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+def _fetch(query):
+    return query.all() if isinstance(query, Query) else db.session.execute(query).all()
+
+def collection_etag(model, user_id, filters=(), variant=''):
+    """Weak ETag for a user's (filtered) rows of model, plus the request variant (query string)."""
+    count, max_id, changed = db.session.query(
+        func.count(model.id),
+        func.max(model.id),
+        func.max(func.coalesce(model.updated_at, model.created_at))
+    ).filter(model.user_id == user_id, *filters).one()
+    raw = f"{model.__tablename__}|{user_id}|{count}|{max_id}|{changed}|{variant}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def not_modified(etag):
+    """A 304 response if the request's If-None-Match matches etag, else None."""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
+def paged_response(response, etag, next_cursor):
+    response.set_etag(etag, weak=True)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
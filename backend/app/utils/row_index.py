@@ -0,0 +1,129 @@
+"""
+Sidecar byte-offset index for CSV datasets.
+
+For data/raw/foo.csv the index lives in data/raw/.index/ as foo.csv.offsets
+(uint64 start offset of every data row, followed by the end of the last row)
+and foo.csv.meta.json (source mtime/size and header). It is built once in a
+single streaming pass and rebuilt whenever the source file changes. Pages are
+then read by slicing a memory-mapped view of the CSV, so the cost of a page
+depends on its size, not on the size of the file.
+"""
+import io
+import os
+import csv
+import json
+import mmap
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+
+INDEX_DIRNAME = '.index'
+SCAN_BLOCK_BYTES = 16 * 1024 * 1024
+
+_cache = {}
+_cache_lock = threading.Lock()
+# path -> lock held while that file's index is loaded or built
+_path_locks = {}
+
+def _signature(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+class RowIndex:
+    def __init__(self, path, offsets, header, signature):
+        self.path = path
+        self.offsets = offsets
+        self.header = header
+        self.signature = signature
+        self.columns = next(csv.reader([header.decode('utf-8-sig')]))
+
+    @property
+    def total_rows(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def for_file(cls, path):
+        """Returns an up-to-date index for path, building or rebuilding the sidecar if needed."""
+        path = os.path.abspath(path)
+        signature = _signature(path)
+        with _cache_lock:
+            index = _cache.get(path)
+            if index is not None and index.signature == signature:
+                return index
+            lock = _path_locks.setdefault(path, threading.Lock())
+
+        # Only requests on this file wait for its build
+        with lock:
+            index = _cache.get(path)
+            if index is None or index.signature != signature:
+                index = cls._load(path, signature) or cls._build(path, signature)
+                with _cache_lock:
+                    _cache[path] = index
+            return index
+
+    @staticmethod
+    def _sidecar_paths(path):
+        index_dir = os.path.join(os.path.dirname(path), INDEX_DIRNAME)
+        name = os.path.basename(path)
+        return index_dir, os.path.join(index_dir, f'{name}.offsets'), os.path.join(index_dir, f'{name}.meta.json')
+
+    @classmethod
+    def _load(cls, path, signature):
+        _, offsets_path, meta_path = cls._sidecar_paths(path)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('signature') != signature:
+            return None
+        offsets = np.memmap(offsets_path, dtype=np.uint64, mode='r')
+        return cls(path, offsets, meta['header'].encode('utf-8'), signature)
+
+    @classmethod
+    def _build(cls, path, signature):
+        index_dir, offsets_path, meta_path = cls._sidecar_paths(path)
+        os.makedirs(index_dir, exist_ok=True)
+
+        # Stream the file once, writing row start offsets block by block
+        fd, tmp_offsets = tempfile.mkstemp(dir=index_dir, prefix='.offsets-')
+        with os.fdopen(fd, 'wb') as out, open(path, 'rb') as f:
+            header = f.readline()
+            pos = len(header)
+            row_start = pos
+            while True:
+                block = f.read(SCAN_BLOCK_BYTES)
+                if not block:
+                    break
+                newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 10).astype(np.uint64)
+                if len(newlines):
+                    starts = np.concatenate(([row_start], newlines[:-1] + np.uint64(pos + 1)))
+                    out.write(starts.astype(np.uint64).tobytes())
+                    row_start = int(newlines[-1]) + pos + 1
+                pos += len(block)
+            # A last line without a trailing newline is still a row
+            if pos > row_start:
+                out.write(np.asarray([row_start], dtype=np.uint64).tobytes())
+            out.write(np.asarray([pos], dtype=np.uint64).tobytes())
+        os.replace(tmp_offsets, offsets_path)
+
+        fd, tmp_meta = tempfile.mkstemp(dir=index_dir, prefix='.meta-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({"signature": signature, "header": header.decode('utf-8')}, f)
+        os.replace(tmp_meta, meta_path)
+
+        offsets = np.memmap(offsets_path, dtype=np.uint64, mode='r')
+        return cls(path, offsets, header, signature)
+
+    def read_rows(self, offset=0, limit=50, columns=None):
+        """Returns rows [offset, offset + limit) as a DataFrame, optionally projected to columns."""
+        offset = max(0, min(offset, self.total_rows))
+        stop = min(offset + limit, self.total_rows)
+        if stop <= offset:
+            return pd.DataFrame(columns=columns or self.columns)
+
+        start_byte, end_byte = int(self.offsets[offset]), int(self.offsets[stop])
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            chunk = mm[start_byte:end_byte]
+        return pd.read_csv(io.BytesIO(self.header + chunk), usecols=columns)
@@ -0,0 +1,55 @@
+"""
+Example health records shown to users who have not logged any data yet.
+
+The rows come from the head of final_dataset.csv. Both response formats are
+built once (create_app primes them at startup) and kept as serialized JSON,
+so serving them costs no disk work. Only the first rows are read, with the csv
+module, so the app does not need pandas to boot.
+"""
+import os
+import csv
+import threading
+from itertools import islice
+from .fast_json import dumps
+
+SAMPLE_ROWS = 15
+FLOAT_FIELDS = ['lh', 'estrogen', 'pdg', 'overall_score', 'deep_sleep_in_minutes',
+                'avg_resting_heart_rate', 'stress_score', 'daily_steps']
+INT_FIELDS = ['cramps', 'fatigue', 'moodswing', 'stress', 'bloating', 'sleepissue']
+FIELD_ORDER = ['lh', 'estrogen', 'pdg'] + INT_FIELDS + FLOAT_FIELDS[3:]
+
+_payloads = {}
+_lock = threading.Lock()
+
+def _number(value, field):
+    # Missing values become 0 so every sample value is a number
+    number = float(value) if value not in (None, '') else 0.0
+    return int(number) if field in INT_FIELDS else number
+
+def _build(csv_path):
+    with open(csv_path, newline='') as f:
+        head = list(islice(csv.DictReader(f), SAMPLE_ROWS))
+    columns = {
+        "id": [f"sample-{i}" for i in range(len(head))],
+        "date": [row['date'] for row in head] if head and 'date' in head[0] else [f"2023-01-{i+1:02d}" for i in range(len(head))],
+    }
+    for field in FIELD_ORDER:
+        columns[field] = [_number(row.get(field), field) for row in head]
+
+    rows = [dict(zip(columns, values), is_example=True) for values in zip(*columns.values())]
+    return {
+        "list": dumps(rows),
+        "columnar": dumps({"count": len(rows), "is_example": True, "columns": columns}),
+    }
+
+def sample_payload(csv_path, fmt='list'):
+    """Pre-serialized sample records in fmt ('list' or 'columnar'); None if the CSV is unavailable."""
+    with _lock:
+        if csv_path not in _payloads:
+            try:
+                _payloads[csv_path] = _build(csv_path) if os.path.exists(csv_path) else None
+            except Exception as e:
+                print(f"Error loading sample data: {e}")
+                _payloads[csv_path] = None
+        payloads = _payloads[csv_path]
+    return payloads[fmt] if payloads else None
@@ -1,54 +1,200 @@
+"""
+Seeding of demo and load-test data from data/processed/final_dataset.csv.
+
+seed_data(user_id) gives one user 30 days of history (the admin "seed" button).
+seed_users(n) creates n synthetic users, each with a multi-cycle history built
+from one study participant's day sequence, replayed from a random start and
+jittered per user. Rows go through Core executemany inserts (COPY on
+PostgreSQL/psycopg2), so a database can be filled to load-test scale quickly:
+
+    python -m app.utils.seeder --users 5000 --days 180
+"""
+import io
+import os
+import time
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
+from flask import current_app
+from werkzeug.security import generate_password_hash
 from ..models import User, HealthRecord, Prediction, db
-from datetime import datetime, timedelta
-import os
+from ..services.record_service import RecordService, NUMERIC_FIELDS, INTEGER_FIELDS
+from ..services.rollup_service import RollupService
 
-def seed_data(user_id):
-    csv_path = os.path.join(os.path.dirname(__file__), '../../../data/processed/final_dataset.csv')
+CSV_PATH = os.path.join(os.path.dirname(__file__), '../../../data/processed/final_dataset.csv')
+
+LOADTEST_PREFIX = 'loadtest_'
+LOADTEST_PASSWORD = 'loadtest'
+# Participants with fewer days than this are too short to replay as cycles
+MIN_PARTICIPANT_DAYS = 20
+# Relative noise applied per user to the continuous metrics
+JITTER = 0.05
+# Users generated and written per transaction
+SEED_BATCH_USERS = 500
+
+def _load_dataset(csv_path=CSV_PATH):
     if not os.path.exists(csv_path):
         print(f"CSV not found at {csv_path}")
+        return None
+    return pd.read_csv(csv_path)
+
+def seed_data(user_id):
+    df = _load_dataset()
+    if df is None:
         return
 
-    df = pd.read_csv(csv_path)
     # Take first 30 days of data for the user
-    user_data = df.head(30)
-    
+    user_data = df.head(30).reset_index(drop=True)
     start_date = datetime.utcnow().date() - timedelta(days=30)
-    
-    records = []
-    for i, row in user_data.iterrows():
-        date = start_date + timedelta(days=i)
-        record = HealthRecord(
-            user_id=user_id,
-            date=date,
-            lh=row.get('lh'),
-            estrogen=row.get('estrogen'),
-            pdg=row.get('pdg'),
-            cramps=int(row.get('cramps', 0)),
-            fatigue=int(row.get('fatigue', 0)),
-            moodswing=int(row.get('moodswing', 0)),
-            stress=int(row.get('stress', 0)),
-            bloating=int(row.get('bloating', 0)),
-            sleepissue=int(row.get('sleepissue', 0)),
-            overall_score=row.get('overall_score'),
-            deep_sleep_in_minutes=row.get('deep_sleep_in_minutes'),
-            avg_resting_heart_rate=row.get('avg_resting_heart_rate'),
-            stress_score=row.get('stress_score'),
-            daily_steps=row.get('daily_steps')
-        )
-        records.append(record)
-        
-        # Also add prediction if phase info is available
-        phase = row.get('phase_simple')
-        if phase:
-            pred = Prediction(
-                user_id=user_id,
-                date=date,
-                predicted_phase=phase,
-                confidence=0.95
-            )
-            db.session.add(pred)
-
-    db.session.add_all(records)
+    dates = [start_date + timedelta(days=i) for i in range(len(user_data))]
+
+    values = user_data[NUMERIC_FIELDS].astype(float)
+    values[INTEGER_FIELDS] = user_data[INTEGER_FIELDS].fillna(0).astype(int)
+    rows = [dict(row, date=d) for d, row in zip(dates, values.to_dict('records'))]
+    RecordService.upsert_records(user_id, rows)
+
+    # Also add predictions where phase info is available
+    predictions = [
+        {"date": d, "record_id": None, "predicted_phase": phase, "confidence": 0.95}
+        for d, phase in zip(dates, user_data['phase_simple']) if isinstance(phase, str)
+    ]
+    RecordService.upsert_predictions(user_id, predictions)
+
     db.session.commit()
-    print(f"Imported {len(records)} records for user {user_id}")
+    RollupService.update_after_write(user_id, dates)
+    print(f"Imported {len(rows)} records for user {user_id}")
+
+def generate_histories(df, n_users, days, end_date, seed=0):
+    """
+    Builds n_users synthetic histories of `days` consecutive days ending at end_date.
+    Each user replays one participant's days (wrapping around to form further cycles)
+    from a random offset, with per-user scaling of the continuous metrics.
+    Returns a DataFrame with a `user` column (0..n_users-1), date, metrics and phase_simple.
+    """
+    rng = np.random.default_rng(seed)
+    df = df.sort_values(['id', 'day_in_study'])
+    sizes = df.groupby('id').size()
+    participants = sizes[sizes >= MIN_PARTICIPANT_DAYS].index.to_numpy()
+    if len(participants) == 0:
+        raise ValueError(f"No participant has {MIN_PARTICIPANT_DAYS} or more days")
+
+    starts = np.concatenate(([0], np.cumsum(sizes.to_numpy())[:-1]))
+    start_of = dict(zip(sizes.index, starts))
+
+    chosen = rng.choice(participants, size=n_users)
+    lengths = sizes.loc[chosen].to_numpy()
+    offsets = rng.integers(0, lengths)
+    day = np.arange(days)
+    # Row positions into df for every (user, day), shape (n_users, days)
+    positions = np.array([start_of[p] for p in chosen])[:, None] + (offsets[:, None] + day) % lengths[:, None]
+
+    source = df.iloc[positions.ravel()].reset_index(drop=True)
+    out = pd.DataFrame({
+        'user': np.repeat(np.arange(n_users), days),
+        'date': np.tile(pd.date_range(end=end_date, periods=days).date, n_users),
+    })
+    scale = np.repeat(1 + rng.normal(0, JITTER, size=(n_users, len(NUMERIC_FIELDS))), days, axis=0)
+    out[NUMERIC_FIELDS] = source[NUMERIC_FIELDS].to_numpy(dtype=float) * scale
+    out[INTEGER_FIELDS] = source[INTEGER_FIELDS].fillna(0).to_numpy().astype(int)
+    out['phase_simple'] = source['phase_simple'].to_numpy()
+    return out
+
+def _bulk_insert(model, rows):
+    """Multi-row insert of plain dicts: COPY on PostgreSQL/psycopg2, Core executemany otherwise."""
+    if not rows:
+        return
+    connection = db.session.connection()
+    raw = connection.connection.driver_connection
+    if connection.dialect.name == 'postgresql' and hasattr(raw, 'cursor') and connection.dialect.driver == 'psycopg2':
+        columns = list(rows[0])
+        buf = io.StringIO()
+        pd.DataFrame(rows, columns=columns).to_csv(buf, index=False, header=False)
+        buf.seek(0)
+        with raw.cursor() as cur:
+            cur.copy_expert(f"COPY {model.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+        return
+    db.session.execute(model.__table__.insert(), rows)
+
+def seed_users(n_users, days=90, seed=0, prefix=LOADTEST_PREFIX, password=LOADTEST_PASSWORD,
+               with_predictions=True, batch_users=SEED_BATCH_USERS, csv_path=CSV_PATH, log=print):
+    """
+    Creates n_users synthetic users (<prefix>000001, ...) with `days` days of history each.
+    All users share one password hash (hashing per user would dominate the run time).
+    Numbering continues after existing users with the same prefix. Commits once per batch.
+    Returns a summary dict.
+    """
+    df = _load_dataset(csv_path)
+    if df is None:
+        raise FileNotFoundError(csv_path)
+
+    started = time.perf_counter()
+    password_hash = generate_password_hash(password, current_app.config['PASSWORD_HASH_METHOD'])
+    first = User.query.filter(User.username.startswith(prefix)).count() + 1
+    end_date = datetime.utcnow().date()
+    now = datetime.utcnow()
+    summary = {"users": 0, "records": 0, "predictions": 0}
+
+    for batch_start in range(0, n_users, batch_users):
+        n = min(batch_users, n_users - batch_start)
+        numbers = range(first + batch_start, first + batch_start + n)
+        users = [{
+            "username": f"{prefix}{i:06d}",
+            "email": f"{prefix}{i:06d}@example.com",
+            "password_hash": password_hash,
+            "created_at": now,
+        } for i in numbers]
+        user_ids = list(db.session.execute(
+            db.insert(User).returning(User.id, sort_by_parameter_order=True), users
+        ).scalars())
+
+        history = generate_histories(df, n, days, end_date, seed=seed + batch_start)
+        history['user_id'] = np.asarray(user_ids)[history.pop('user').to_numpy()]
+        phases = history.pop('phase_simple')
+        history['created_at'] = now
+        history['updated_at'] = now
+
+        records = history.to_dict('records')
+        _bulk_insert(HealthRecord, records)
+        summary["records"] += len(records)
+
+        if with_predictions:
+            predictions = history[['user_id', 'date', 'created_at', 'updated_at']].assign(
+                predicted_phase=phases, confidence=0.95)[phases.notna()].to_dict('records')
+            _bulk_insert(Prediction, predictions)
+            summary["predictions"] += len(predictions)
+
+        db.session.commit()
+        summary["users"] += n
+        log(f"Seeded {summary['users']}/{n_users} users")
+
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill the database with synthetic users for load testing")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prefix", default=LOADTEST_PREFIX)
+    parser.add_argument("--password", default=LOADTEST_PASSWORD)
+    parser.add_argument("--no-predictions", action="store_true")
+    parser.add_argument("--batch-users", type=int, default=SEED_BATCH_USERS)
+    args = parser.parse_args()
+
+    from .. import create_app
+    from ..config import Config
+
+    class SeedConfig(Config):
+        ML_WARM_ON_STARTUP = False
+
+    app = create_app(SeedConfig)
+    with app.app_context():
+        summary = seed_users(args.users, days=args.days, seed=args.seed, prefix=args.prefix,
+                             password=args.password, with_predictions=not args.no_predictions,
+                             batch_users=args.batch_users)
+    print(f"{summary['users']} users, {summary['records']} records, "
+          f"{summary['predictions']} predictions in {summary['seconds']}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Closed-loop HTTP load generator for comparing serving modes (dev server vs gunicorn).
+
+Each of --concurrency threads keeps one keep-alive connection and sends requests
+back to back for --seconds. Prints requests/s and latency percentiles.
+
+    python benchmarks/bench_http.py http://127.0.0.1:5000/api/health/records --token <JWT>
+    python benchmarks/bench_http.py http://127.0.0.1:5000/api/predictions/predict --method POST \\
+        --body '{"date": "2024-01-10"}' --token <JWT>
+"""
+import sys
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit
+import numpy as np
+
+def worker(url, method, body, headers, deadline, latencies, errors):
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+            if response.getheader('Connection', '').lower() == 'close':
+                conn.close()
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            continue
+        latencies.append(time.perf_counter() - t0)
+    conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop HTTP throughput test")
+    parser.add_argument("url")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--body")
+    parser.add_argument("--token", help="JWT access token")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    headers = {"Content-Type": "application/json"}
+    if args.token:
+        headers["Authorization"] = f"Bearer {args.token}"
+    body = args.body.encode() if args.body else None
+
+    latencies, errors = [], []
+    deadline = time.perf_counter() + args.seconds
+    threads = [threading.Thread(target=worker, args=(args.url, args.method, body, headers, deadline, latencies, errors))
+               for _ in range(args.concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    if not latencies:
+        print(f"No successful requests ({len(errors)} errors)")
+        sys.exit(1)
+    ms = np.array(latencies) * 1000
+    print(f"{len(latencies)} requests in {elapsed:.1f}s: {len(latencies) / elapsed:.1f} req/s, "
+          f"p50 {np.percentile(ms, 50):.1f}ms, p95 {np.percentile(ms, 95):.1f}ms, p99 {np.percentile(ms, 99):.1f}ms, "
+          f"{len(errors)} errors")
+
+if __name__ == '__main__':
+    main()
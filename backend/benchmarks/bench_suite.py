@@ -0,0 +1,232 @@
+"""
+Latency/throughput benchmarks for the API and ML hot paths, with a baseline check.
+
+Builds the app with create_app against a fresh SQLite database (in memory by
+default, or a temporary file), seeds it with synthetic users, then times each
+case through the Flask test client (or directly for MLService):
+
+    predict            POST /api/predictions/predict
+    records_list       GET  /api/health/records
+    records_columnar   GET  /api/health/records?format=columnar
+    record_upsert      POST /api/health/record
+    summary            GET  /api/datasets/summary
+    ml_predict         MLService.predict (one window)
+    ml_predict_batch   MLService.predict_many (32 windows)
+
+Results go to a JSON file. With --baseline, each case's p50 and p95 are compared
+against the stored run and the script exits with status 1 if any of them is slower
+than the allowed ratio. Baselines are machine-specific; refresh one with
+--update-baseline on the machine that runs the comparison.
+
+Run from the backend directory:
+    python benchmarks/bench_suite.py --baseline benchmarks/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import platform
+import atexit
+import argparse
+import tempfile
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_THRESHOLD = 0.25
+# Single-window and 32-window inputs for the raw MLService cases
+ML_BATCH = 32
+
+def build_app(db_kind, users, days, seed):
+    from app import create_app
+    from app.config import Config
+    from app.utils.seeder import seed_users
+
+    if db_kind == 'memory':
+        uri = 'sqlite://'
+    else:
+        fd, path = tempfile.mkstemp(suffix='.db', prefix='neohealth-bench-')
+        os.close(fd)
+        atexit.register(os.remove, path)
+        uri = f'sqlite:///{path}'
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = uri
+        ML_WARM_ON_STARTUP = True
+        SLOW_QUERY_SECONDS = None
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        seed_users(users, days=days, seed=seed, log=lambda msg: None)
+    return app
+
+def measure(fn, iterations, warmup):
+    """Runs fn warmup + iterations times. Returns latency percentiles (ms) and ops/s."""
+    for _ in range(warmup):
+        fn()
+    times = np.empty(iterations)
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        times[i] = time.perf_counter() - t0
+    elapsed = time.perf_counter() - started
+    ms = times * 1000
+    return {
+        "iterations": iterations,
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "max_ms": round(float(ms.max()), 4),
+        "ops_per_sec": round(iterations / elapsed, 2)
+    }
+
+def _expect(response, status=200):
+    if response.status_code != status:
+        raise RuntimeError(f"{response.request.path}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+    return response
+
+def cases(app, days):
+    """(name, callable) pairs. HTTP cases act as the first seeded user."""
+    from app.services.ml_service import MLService
+    from app.services.record_service import RecordService, record_to_dict
+    from app.models import User
+
+    client = app.test_client()
+    token = _expect(client.post('/api/auth/login', json={
+        "username": "loadtest_000001", "password": "loadtest"})).get_json()['access_token']
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with app.app_context():
+        user_id = User.query.filter_by(username='loadtest_000001').one().id
+        dates = sorted(RecordService.fetch_range(user_id, *_date_span(days)).keys())
+        windows = []
+        for d in dates[-ML_BATCH:]:
+            current, previous = RecordService.fetch_window(user_id, d)
+            windows.append((record_to_dict(current), *[record_to_dict(p) for p in previous]))
+
+    counter = {"i": 0}
+    def next_date():
+        counter["i"] += 1
+        return dates[counter["i"] % len(dates)].strftime('%Y-%m-%d')
+
+    def ml(fn):
+        def run():
+            with app.app_context():
+                fn()
+        return run
+
+    return [
+        ("predict", lambda: _expect(client.post('/api/predictions/predict', json={"date": next_date()}, headers=headers))),
+        ("records_list", lambda: _expect(client.get('/api/health/records', headers=headers))),
+        ("records_columnar", lambda: _expect(client.get('/api/health/records?format=columnar', headers=headers))),
+        ("record_upsert", lambda: _expect(client.post('/api/health/record', json={
+            "date": next_date(), "lh": 0.1, "stress": 2, "daily_steps": 5000}, headers=headers), 201)),
+        ("summary", lambda: _expect(client.get('/api/datasets/summary'))),
+        ("ml_predict", ml(lambda: MLService.predict(windows[-1][0], list(windows[-1][1:])))),
+        ("ml_predict_batch", ml(lambda: MLService.predict_many(windows))),
+    ]
+
+def _date_span(days):
+    from datetime import datetime, timedelta
+    today = datetime.utcnow().date()
+    return today - timedelta(days=days), today
+
+def compare(results, baseline, threshold, overrides):
+    """Returns a list of regression messages (empty when every case is within its threshold)."""
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if not reference:
+            continue
+        allowed = 1 + overrides.get(name, threshold)
+        for stat in ("p50_ms", "p95_ms"):
+            ratio = current[stat] / reference[stat] if reference[stat] else 1.0
+            current[f"{stat}_vs_baseline"] = round(ratio, 3)
+            if ratio > allowed:
+                regressions.append(f"{name} {stat}: {current[stat]:.3f}ms vs {reference[stat]:.3f}ms "
+                                   f"({ratio:.2f}x, allowed {allowed:.2f}x)")
+    return regressions
+
+def _parse_overrides(items):
+    overrides = {}
+    for item in items or []:
+        name, _, value = item.partition('=')
+        overrides[name] = float(value)
+    return overrides
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API and ML hot paths")
+    parser.add_argument("--db", choices=["memory", "file"], default="memory")
+    parser.add_argument("--users", type=int, default=100, help="Synthetic users to seed")
+    parser.add_argument("--days", type=int, default=180, help="Days of history per user")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--only", nargs="*", help="Run only these cases")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown as a fraction (0.25 = 25%% slower than baseline)")
+    parser.add_argument("--case-threshold", action="append", metavar="NAME=FRACTION",
+                        help="Per-case threshold override, e.g. summary=0.5")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results to --baseline")
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    app = build_app(args.db, args.users, args.days, args.seed)
+
+    results = {}
+    for name, fn in cases(app, args.days):
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(fn, args.iterations, args.warmup)
+        r = results[name]
+        print(f"{name:<18} p50 {r['p50_ms']:>9.3f}ms  p95 {r['p95_ms']:>9.3f}ms  {r['ops_per_sec']:>9.1f} ops/s")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "db": args.db,
+            "users": args.users,
+            "days": args.days,
+            "iterations": args.iterations,
+            "created_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        },
+        "results": results
+    }
+
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ("db", "users", "days", "cpus"):
+            if baseline.get("meta", {}).get(key) != report["meta"][key]:
+                print(f"Warning: baseline was recorded with {key}={baseline['meta'].get(key)}, "
+                      f"this run uses {key}={report['meta'][key]}")
+        regressions = compare(results, baseline, args.threshold, _parse_overrides(args.case_threshold))
+        report["regressions"] = regressions
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.update_baseline:
+        path = args.baseline or BASELINE_PATH
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline updated: {path}")
+
+    if regressions:
+        print("Regressions:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
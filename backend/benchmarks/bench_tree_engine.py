@@ -0,0 +1,58 @@
+"""
+Compares the compiled NumPy tree evaluator against the reference
+scaler.transform + XGBClassifier.predict_proba path.
+
+Run from the backend directory:
+    python benchmarks/bench_tree_engine.py
+"""
+import os
+import sys
+import time
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from app.services.ml_service import FEATURES
+from app.services.tree_engine import CompiledEnsemble
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'ml_models')
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'processed', 'final_dataset.csv')
+BATCH_SIZES = [1, 8, 32, 128, 512, 1024]
+
+def timeit(fn, min_time=0.5):
+    # Repeats fn until min_time has elapsed and returns the median seconds per call
+    fn()
+    times = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_time or len(times) < 5:
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+def main():
+    warnings.filterwarnings('ignore')
+    model = joblib.load(os.path.join(MODEL_DIR, 'model.joblib'))
+    scaler = joblib.load(os.path.join(MODEL_DIR, 'scaler.joblib'))
+
+    t0 = time.perf_counter()
+    engine = CompiledEnsemble.from_model(model, scaler)
+    print(f"Compiled {len(engine.roots) - engine.n_classes} trees / {len(engine.feature)} nodes in {time.perf_counter() - t0:.2f}s")
+
+    X_all = pd.read_csv(DATA_PATH)[FEATURES].fillna(0).to_numpy(dtype=np.float64)
+
+    reference = lambda X: model.predict_proba(scaler.transform(X))
+    identical = np.array_equal(reference(X_all), engine.predict_proba(X_all))
+    print(f"Probabilities identical on {len(X_all)} rows: {identical}")
+
+    print(f"{'batch':>6} {'xgboost us/row':>15} {'compiled us/row':>16} {'xgboost rows/s':>15} {'compiled rows/s':>16} {'speedup':>8}")
+    for n in BATCH_SIZES:
+        X = X_all[np.arange(n) % len(X_all)]
+        ref = timeit(lambda: reference(X))
+        comp = timeit(lambda: engine.predict_proba(X))
+        print(f"{n:>6} {ref / n * 1e6:>15.1f} {comp / n * 1e6:>16.1f} {n / ref:>15.0f} {n / comp:>16.0f} {ref / comp:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Cold-boot time and import report for create_app, with an optional budget check.
+
+Each run boots the app in a fresh interpreter (python -X importtime) against an
+in-memory SQLite database with model warm-up disabled, so it measures imports
+and app setup only. Prints the slowest imports (cumulative) of one run, the
+heavy libraries that were loaded, and the median boot time over --runs.
+
+With --budget-ms the script exits with status 1 when the median boot is over
+budget or when any heavy library was imported during boot. Run from the
+backend directory:
+    python benchmarks/check_startup.py --role api --budget-ms 1500
+
+tests/test_startup.py runs the same check under pytest (budget: STARTUP_BUDGET_MS).
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# Libraries the app should only load on first use
+HEAVY_MODULES = ('pandas', 'numpy', 'scipy', 'sklearn', 'xgboost', 'joblib')
+
+BOOT_SCRIPT = (
+    "import time; started = time.perf_counter()\n"
+    "from app import create_app; create_app()\n"
+    "print(f'BOOT {time.perf_counter() - started:.6f}')\n"
+)
+
+def boot(role):
+    """Boots the app once. Returns (seconds, [(module, self_us, cumulative_us)])."""
+    env = dict(os.environ, SERVICE_ROLE=role, ML_WARM_ON_STARTUP='0', DATABASE_URL='sqlite://')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+                          cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"create_app failed:\n{proc.stderr[-2000:]}")
+
+    seconds = float(next(line.split()[1] for line in proc.stdout.splitlines() if line.startswith('BOOT ')))
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return seconds, imports
+
+def measure(role, runs):
+    """Boots the app runs times. Returns (median ms, boot times in s, imports of the last run, heavy libraries loaded)."""
+    times = []
+    for _ in range(runs):
+        seconds, imports = boot(role)
+        times.append(seconds)
+    loaded = sorted({name.split('.')[0] for name, _, _ in imports} & set(HEAVY_MODULES))
+    return statistics.median(times) * 1000, times, imports, loaded
+
+def budget_failures(median_ms, loaded, budget_ms):
+    failures = []
+    if median_ms > budget_ms:
+        failures.append(f"boot took {median_ms:.0f}ms, budget is {budget_ms:.0f}ms")
+    if loaded:
+        failures.append(f"heavy libraries imported at boot: {', '.join(loaded)}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure create_app cold-boot time and imports")
+    parser.add_argument("--role", default="all", help="SERVICE_ROLE to boot (all, api, auth, inference)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    parser.add_argument("--budget-ms", type=float, help="Fail when the median boot time exceeds this")
+    args = parser.parse_args()
+
+    median_ms, times, imports, loaded = measure(args.role, args.runs)
+
+    print(f"Slowest imports (cumulative, role={args.role}):")
+    for name, _, cumulative in sorted(imports, key=lambda i: i[2], reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:>8.1f}ms  {name}")
+
+    print(f"Heavy libraries loaded at boot: {', '.join(loaded) or 'none'}")
+    print(f"Cold boot: median {median_ms:.0f}ms over {args.runs} runs "
+          f"(min {min(times) * 1000:.0f}ms, max {max(times) * 1000:.0f}ms)")
+
+    if args.budget_ms is None:
+        return
+    failures = budget_failures(median_ms, loaded, args.budget_ms)
+    if failures:
+        print("Startup budget exceeded:")
+        for line in failures:
+            print(f"  {line}")
+        sys.exit(1)
+    print("Within budget")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+"""
+Feature-build pipeline that produces data/processed/final_dataset.csv
+(the scripted form of notebook/data_cleaning_merging.ipynb).
+
+Stages and their inputs:
+
+    hormones, sleep, stress, heart, steps   one raw CSV each -> daily frame per (id, day_in_study)
+    merge                                   all daily frames -> merged, mean-filled, Likert-encoded
+    lags                                    merge -> _prev1/_prev2 features and phase_simple
+    scale                                   lags -> MinMax-scaled hormones, incomplete rows dropped
+
+Every stage output is cached under the cache directory, keyed by a fingerprint
+of its inputs (raw file size/mtime or upstream stage keys). A rebuild therefore
+only recomputes the stages downstream of a changed raw file. Raw sources that
+need recomputing are loaded in a process pool.
+
+Run from the backend directory:
+    python feature_pipeline.py [--workers N] [--force]
+"""
+import os
+import glob
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+from app.utils.chunked_aggregator import aggregate_daily
+
+RAW_DIR = "../data/raw"
+PROCESSED_DIR = "../data/processed"
+CACHE_DIR = "../data/.cache"
+
+# Bump when a stage's logic changes so its cached outputs are invalidated
+PIPELINE_VERSION = 1
+
+KEYS = ["id", "day_in_study"]
+
+SOURCES = {
+    "hormones": "hormones_and_selfreport.csv",
+    "sleep": "sleep_score.csv",
+    "stress": "stress_score.csv",
+    "heart": "resting_heart_rate.csv",
+    "steps": "steps.csv",
+}
+
+LIKERT_MAPPING = {
+    "Not at all": 0,
+    "Low": 1,
+    "Mild": 1,
+    "Moderate": 2,
+    "High": 3,
+    "Very high": 4,
+    "Very High": 4
+}
+SYMPTOM_COLS = ["cramps","fatigue","moodswing","stress","bloating","sleepissue"]
+HISTORY_COLS = ["lh","estrogen","pdg","stress","overall_score","daily_steps"]
+HORMONE_COLS = ["lh","estrogen","pdg"]
+PHASE_SIMPLE = {
+    "Menstrual": "Low Hormone",
+    "Follicular": "Rising Hormone",
+    "Fertility": "Peak Hormone",
+    "Luteal": "High Progesterone"
+}
+
+# ---------------------------------------------------------------------------
+# Stage functions (module level so they can run in worker processes)
+# ---------------------------------------------------------------------------
+
+def load_hormones(path):
+    # Hormones & symptoms (base dataset)
+    cols = KEYS + ["phase"] + HORMONE_COLS + SYMPTOM_COLS
+    return pd.read_csv(path, usecols=cols)[cols]
+
+def load_sleep(path):
+    # Sleep dataset (already daily)
+    cols = KEYS + ["overall_score", "deep_sleep_in_minutes", "resting_heart_rate"]
+    return pd.read_csv(path, usecols=cols)[cols]
+
+def load_stress(path):
+    # Stress dataset (may have multiple rows per day)
+    stress = pd.read_csv(path, usecols=KEYS + ["stress_score"])
+    return stress.groupby(KEYS)["stress_score"].mean().reset_index()
+
+def load_heart(path):
+    heart = pd.read_csv(path, usecols=KEYS + ["value"])
+    heart_daily = heart.groupby(KEYS)["value"].mean().reset_index()
+    return heart_daily.rename(columns={"value": "avg_resting_heart_rate"})
+
+def load_steps(path):
+    # Minute-level and very large: stream it instead of loading it whole
+    _, steps_daily = aggregate_daily(path, "steps", how="sum", keys=KEYS, workers=1)
+    return steps_daily.rename(columns={"steps": "daily_steps"})
+
+LOADERS = {
+    "hormones": load_hormones,
+    "sleep": load_sleep,
+    "stress": load_stress,
+    "heart": load_heart,
+    "steps": load_steps,
+}
+
+def merge_sources(daily):
+    df = daily["hormones"].merge(daily["sleep"], on=KEYS, how="left")
+    df = df.merge(daily["stress"], on=KEYS, how="left")
+    df = df.merge(daily["heart"], on=KEYS, how="left")
+    df = df.merge(daily["steps"], on=KEYS, how="left")
+
+    numeric_cols = df.select_dtypes(include=np.number).columns
+    df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].mean())
+
+    # Convert Likert-scale symptom columns to numeric
+    for col in SYMPTOM_COLS:
+        df[col] = df[col].map(LIKERT_MAPPING)
+    return df
+
+def add_lags(df):
+    # Sort data for time-series features
+    df = df.sort_values(KEYS)
+    for col in HISTORY_COLS:
+        df[f"{col}_prev1"] = df.groupby("id")[col].shift(1)
+        df[f"{col}_prev2"] = df.groupby("id")[col].shift(2)
+    df["phase_simple"] = df["phase"].replace(PHASE_SIMPLE)
+    return df
+
+def scale_features(df):
+    df = df.copy()
+    df[HORMONE_COLS] = MinMaxScaler().fit_transform(df[HORMONE_COLS])
+    return df.dropna()
+
+# ---------------------------------------------------------------------------
+# Caching
+# ---------------------------------------------------------------------------
+
+def file_fingerprint(path):
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+def stage_key(stage, *inputs):
+    payload = json.dumps([PIPELINE_VERSION, stage, list(inputs)])
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+class StageCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, stage, key):
+        return os.path.join(self.cache_dir, f"{stage}-{key}.pkl")
+
+    def get(self, stage, key):
+        path = self.path(stage, key)
+        return pd.read_pickle(path) if os.path.exists(path) else None
+
+    def has(self, stage, key):
+        return os.path.exists(self.path(stage, key))
+
+    def put(self, stage, key, df):
+        path = self.path(stage, key)
+        tmp = f"{path}.tmp"
+        df.to_pickle(tmp)
+        os.replace(tmp, path)
+        # Only the latest output of each stage is kept
+        for old in glob.glob(os.path.join(self.cache_dir, f"{stage}-*.pkl")):
+            if old != path:
+                os.remove(old)
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def build(raw_dir=RAW_DIR, output_path=None, cache_dir=CACHE_DIR, workers=None, force=False, log=print):
+    """
+    Builds the final dataset, recomputing only stages whose inputs changed.
+    Returns (DataFrame, report) where report lists each stage as 'cached' or its run time.
+    """
+    output_path = output_path or os.path.join(PROCESSED_DIR, "final_dataset.csv")
+    cache = StageCache(cache_dir)
+    report = {}
+
+    paths = {name: os.path.join(raw_dir, filename) for name, filename in SOURCES.items()}
+    missing = [p for p in paths.values() if not os.path.exists(p)]
+    if missing:
+        raise FileNotFoundError(f"Missing raw files: {', '.join(missing)}")
+
+    # 1. Per-source daily frames; stale ones are rebuilt in parallel
+    source_keys = {name: stage_key(name, file_fingerprint(path)) for name, path in paths.items()}
+    stale = [name for name in SOURCES if force or not cache.has(name, source_keys[name])]
+    if stale:
+        started = time.perf_counter()
+        n_workers = min(workers or os.cpu_count() or 1, len(stale))
+        if n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                frames = dict(zip(stale, pool.map(_run_loader, stale, [paths[n] for n in stale])))
+        else:
+            frames = {name: _run_loader(name, paths[name]) for name in stale}
+        for name, df in frames.items():
+            cache.put(name, source_keys[name], df)
+            report[name] = round(time.perf_counter() - started, 3)
+    for name in SOURCES:
+        report.setdefault(name, "cached")
+
+    # 2-4. Downstream stages, each keyed on its upstream keys
+    merge_key = stage_key("merge", *[source_keys[n] for n in SOURCES])
+    lags_key = stage_key("lags", merge_key)
+    scale_key = stage_key("scale", lags_key)
+
+    final = None if force else cache.get("scale", scale_key)
+    if final is None:
+        lagged = None if force else cache.get("lags", lags_key)
+        if lagged is None:
+            merged = None if force else cache.get("merge", merge_key)
+            if merged is None:
+                merged = _timed(report, "merge", merge_sources, {n: cache.get(n, source_keys[n]) for n in SOURCES})
+                cache.put("merge", merge_key, merged)
+            lagged = _timed(report, "lags", add_lags, merged)
+            cache.put("lags", lags_key, lagged)
+        final = _timed(report, "scale", scale_features, lagged)
+        cache.put("scale", scale_key, final)
+    for stage in ("merge", "lags", "scale"):
+        report.setdefault(stage, "cached")
+
+    # Rewrite the CSV only when its content would change
+    marker = os.path.join(cache_dir, "outputs.json")
+    written = json.load(open(marker)) if os.path.exists(marker) else {}
+    target = os.path.abspath(output_path)
+    if written.get(target) != scale_key or not os.path.exists(output_path):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        final.to_csv(output_path, index=False)
+        written[target] = scale_key
+        with open(marker, "w") as f:
+            json.dump(written, f, indent=2)
+        log(f"Final dataset saved to: {output_path}")
+
+    return final, report
+
+def _run_loader(name, path):
+    return LOADERS[name](path)
+
+def _timed(report, stage, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    report[stage] = round(time.perf_counter() - started, 3)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Build final_dataset.csv from the raw study data")
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--out", default=os.path.join(PROCESSED_DIR, "final_dataset.csv"))
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="Processes for loading raw sources")
+    parser.add_argument("--force", action="store_true", help="Ignore cached stage outputs")
+    args = parser.parse_args()
+
+    df, report = build(args.raw_dir, args.out, args.cache_dir, workers=args.workers, force=args.force)
+    print("Shape:", df.shape)
+    for stage, result in report.items():
+        print(f"  {stage:<9} {result if result == 'cached' else f'{result}s'}")
+
+if __name__ == "__main__":
+    main()
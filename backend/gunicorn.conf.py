@@ -0,0 +1,33 @@
+"""
+gunicorn settings for wsgi:app. Every value can be overridden from the environment.
+
+Workers are pre-forked from a master that has already loaded the app and the
+model bundle. Each worker recycles itself after max_requests (+ jitter, so they
+do not all restart at once), finishing in-flight requests within graceful_timeout.
+SIGHUP reloads all workers the same way.
+"""
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')  # e.g. '-' for stdout
+errorlog = '-'
+
+def post_fork(server, worker):
+    # Connections opened in the master (create_all, warm-up) must not be shared
+    # across processes: give each worker its own pool without closing the parent's
+    from app import db
+    from wsgi import app
+    with app.app_context():
+        db.engine.dispose(close=False)
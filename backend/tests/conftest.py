@@ -0,0 +1,63 @@
+import pytest
+from datetime import date, timedelta
+from flask_jwt_extended import create_access_token
+from app import create_app
+from app.config import Config
+from app.models import User, db
+from app.services.ml_service import MLService
+from app.services.record_service import RecordService
+
+def make_config(db_path, **overrides):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+        ML_WARM_ON_STARTUP = False
+        PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+        JWT_SECRET_KEY = 'test-jwt-secret-key-long-enough-for-hs256'
+    for key, value in overrides.items():
+        setattr(TestConfig, key, value)
+    return TestConfig
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a fresh SQLite database, with its app context pushed for the whole test."""
+    app = create_app(make_config(tmp_path / 'test.db'))
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+    # The loaded bundle is process-wide; the next test starts from the registry again
+    MLService._bundle = None
+    MLService._manifest_mtime = None
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def user_id(app):
+    user = User(username='alice', email='alice@example.com')
+    user.set_password('secret')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+@pytest.fixture
+def auth_headers(user_id):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+
+def add_records(user_id, start, days, **values):
+    """Writes one record per day from start, with lh = day index + 1 unless given. Commits."""
+    rows = [dict({'date': start + timedelta(days=i), 'lh': float(i + 1), 'estrogen': 100.0 + i,
+                  'stress': i % 4, 'daily_steps': 5000.0}, **values) for i in range(days)]
+    RecordService.upsert_records(user_id, rows)
+    db.session.commit()
+    return [row['date'] for row in rows]
+
+START = date(2024, 1, 1)
+
+@pytest.fixture(scope='session')
+def bundle():
+    """The committed model bundle, read into memory (never written to)."""
+    from app.services.model_registry import ModelRegistry, LEGACY_VERSION
+    return ModelRegistry(Config.ML_MODEL_PATH).load(LEGACY_VERSION, mmap_mode=None)
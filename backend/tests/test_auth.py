@@ -0,0 +1,53 @@
+from app.models import User, db
+from app.services.auth_service import PasswordHasher
+
+def register(client, username='carol', email='carol@example.com', password='pw'):
+    return client.post('/api/auth/register', json={'username': username, 'email': email, 'password': password})
+
+def login(client, username='carol', password='pw'):
+    return client.post('/api/auth/login', json={'username': username, 'password': password})
+
+def test_register_and_login(client):
+    assert register(client).status_code == 201
+    response = login(client)
+    assert response.status_code == 200
+    token = response.get_json()['access_token']
+    me = client.get('/api/auth/me', headers={'Authorization': f'Bearer {token}'})
+    assert me.get_json()['username'] == 'carol'
+    assert login(client, password='wrong').status_code == 401
+    assert login(client, username='nobody').status_code == 401
+
+def test_duplicates_are_rejected(client):
+    register(client)
+    assert register(client, email='other@example.com').get_json()['msg'] == 'Username already exists'
+    assert register(client, username='other').get_json()['msg'] == 'Email already exists'
+    assert register(client, password='').status_code == 400
+
+def test_login_upgrades_outdated_hashes(app, client):
+    register(client)
+    old_hash = User.query.filter_by(username='carol').one().password_hash
+    assert old_hash.startswith('pbkdf2:sha256:1000$')
+
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+    assert login(client).status_code == 200
+    db.session.expire_all()
+    new_hash = User.query.filter_by(username='carol').one().password_hash
+    assert new_hash.startswith('pbkdf2:sha256:2000$')
+
+    # Already current: nothing is rewritten
+    assert login(client).status_code == 200
+    db.session.expire_all()
+    assert User.query.filter_by(username='carol').one().password_hash == new_hash
+
+def test_set_password_uses_the_configured_method(app):
+    user = User(username='dave', email='dave@example.com')
+    user.set_password('pw')
+    assert user.password_hash.startswith('pbkdf2:sha256:1000$')
+
+def test_overload_is_refused_with_retry_after(app, client):
+    register(client)
+    app.config['PASSWORD_HASH_MAX_PENDING'] = 0
+    for response in (register(client, 'erin', 'erin@example.com'), login(client)):
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '1'
+    assert PasswordHasher._pending == 0
@@ -0,0 +1,66 @@
+import multiprocessing
+import pytest
+from app.routes import datasets
+from app.utils.column_store import ColumnStore, QueryError
+
+CSV = 'id,phase,steps,score\n1,Luteal,100,1.5\n2,Menstrual,200,\n3,Luteal,300,2.5\n4,,400,3.5\n'
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'study.csv'
+    path.write_text(CSV)
+    return str(path)
+
+@pytest.fixture
+def query(client, auth_headers, csv_path, monkeypatch):
+    monkeypatch.setattr(datasets, '_dataset_path', lambda name: csv_path if name == 'study.csv' else None)
+    return lambda body: client.post('/api/datasets/query', json=dict({'dataset': 'study.csv'}, **body),
+                                    headers=auth_headers)
+
+def test_filter_and_project(csv_path):
+    result = ColumnStore.for_file(csv_path).query({
+        'columns': ['id', 'score'], 'filters': [{'column': 'steps', 'op': 'gte', 'value': 200}]})
+    assert result['rows_matched'] == 3
+    assert result['rows'] == [{'id': 2, 'score': None}, {'id': 3, 'score': 2.5}, {'id': 4, 'score': 3.5}]
+
+def test_group_by_skips_missing_values(csv_path):
+    result = ColumnStore.for_file(csv_path).query({
+        'group_by': ['phase'], 'aggregates': [{'fn': 'count'}, {'fn': 'mean', 'column': 'score'}]})
+    rows = {r['phase']: (r['count'], r['mean_score']) for r in result['rows']}
+    assert rows == {'Luteal': (2, 2.0), 'Menstrual': (1, None), None: (1, 3.5)}
+
+def test_store_is_rebuilt_when_the_source_changes(csv_path):
+    assert ColumnStore.for_file(csv_path).rows == 4
+    with open(csv_path, 'a') as f:
+        f.write('5,Follicular,500,4.5\n')
+    assert ColumnStore.for_file(csv_path).rows == 5
+
+@pytest.mark.parametrize('body', [
+    {'columns': [['id']]},
+    {'group_by': [{'a': 1}]},
+    {'filters': [{'column': ['x'], 'op': 'eq', 'value': 1}]},
+    {'aggregates': [{'fn': 'sum', 'column': 'steps', 'as': ['total']}]},
+    {'columns': ['nope']},
+    {'filters': [{'column': 'phase', 'op': 'gt', 'value': 'A'}]},
+    {'limit': 5000},
+])
+def test_invalid_queries_are_bad_requests(query, body):
+    response = query(body)
+    assert response.status_code == 400
+    assert response.get_json()['msg']
+
+def test_query_route(query):
+    response = query({'filters': [{'column': 'phase', 'op': 'eq', 'value': 'Luteal'}], 'columns': ['id']})
+    assert response.status_code == 200
+    assert response.get_json()['rows'] == [{'id': 1}, {'id': 3}]
+    assert query({'dataset': '../study.csv'}).status_code == 404
+
+def _build_rows(path):
+    return ColumnStore.for_file(path).rows
+
+def test_worker_processes_build_the_same_store_safely(tmp_path):
+    path = tmp_path / 'large.csv'
+    path.write_text('id,label\n' + ''.join(f'{i},l{i % 7}\n' for i in range(50000)))
+    context = multiprocessing.get_context('fork')
+    with context.Pool(4) as pool:
+        assert pool.map(_build_rows, [str(path)] * 4) == [50000] * 4
@@ -0,0 +1,46 @@
+from app.models import db
+from app.services.record_service import RecordService
+from conftest import START, add_records
+
+def get(client, headers, query='', etag=None):
+    if etag:
+        headers = dict(headers, **{'If-None-Match': etag})
+    return client.get(f'/api/dashboard{query}', headers=headers)
+
+def test_dashboard_payload(client, user_id, auth_headers):
+    add_records(user_id, START, 40)
+    record_id = RecordService.upsert_record(user_id, START.replace(day=31), {})
+    RecordService.upsert_predictions(user_id, [
+        {"date": START.replace(day=31), "record_id": record_id, "predicted_phase": 'Luteal', "confidence": 0.6}])
+    db.session.commit()
+
+    body = get(client, auth_headers).get_json()
+    assert body['user']['username'] == 'alice'
+    assert len(body['records']) == 30
+    # Latest 30 days, oldest first, each with its prediction
+    assert (body['records'][0]['date'], body['records'][-1]['date']) == ('2024-01-11', '2024-02-09')
+    assert body['records'][20]['predicted_phase'] == 'Luteal'
+    assert body['latest_prediction']['phase'] == 'Luteal'
+    summary = body['summary']
+    assert (summary['total_records'], summary['window_days'], summary['total_predictions']) == (40, 30, 1)
+    assert summary['window_means']['daily_steps'] == 5000.0
+
+    assert len(get(client, auth_headers, '?limit=5').get_json()['records']) == 5
+    assert get(client, auth_headers, '?limit=0').status_code == 400
+
+def test_dashboard_revalidates_until_a_write(client, user_id, auth_headers):
+    add_records(user_id, START, 3)
+    etag = get(client, auth_headers).headers['ETag']
+    assert get(client, auth_headers, etag=etag).status_code == 304
+    # The tag covers the requested window
+    assert get(client, auth_headers, '?limit=2', etag=etag).status_code == 200
+
+    client.post('/api/health/record', json={'date': '2024-01-02', 'lh': 50}, headers=auth_headers)
+    response = get(client, auth_headers, etag=etag)
+    assert response.status_code == 200
+    assert response.get_json()['records'][1]['lh'] == 50.0
+
+def test_dashboard_for_a_new_user_shows_examples(client, user_id, auth_headers):
+    body = get(client, auth_headers).get_json()
+    assert body['is_example'] is True
+    assert body['summary']['total_records'] == 0
@@ -0,0 +1,39 @@
+import csv
+import gzip
+import io
+import json
+from app.models import db
+from app.services.record_service import RecordService
+from conftest import START, add_records
+
+def test_csv_export_joins_predictions(client, user_id, auth_headers):
+    add_records(user_id, START, 3)
+    record_id = RecordService.upsert_record(user_id, START, {})
+    RecordService.upsert_predictions(user_id, [
+        {"date": START, "record_id": record_id, "predicted_phase": 'Luteal', "confidence": 0.75}])
+    db.session.commit()
+
+    response = client.get('/api/health/export', headers=dict(auth_headers, **{'Accept-Encoding': 'identity'}))
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [r['date'] for r in rows] == ['2024-01-01', '2024-01-02', '2024-01-03']
+    assert (rows[0]['predicted_phase'], rows[0]['confidence']) == ('Luteal', '0.75')
+    assert rows[1]['predicted_phase'] == ''
+
+def test_ndjson_export_with_date_range_and_gzip(client, user_id, auth_headers):
+    add_records(user_id, START, 5)
+    response = client.get('/api/health/export?format=ndjson&start_date=2024-01-02&end_date=2024-01-03',
+                          headers=dict(auth_headers, **{'Accept-Encoding': 'gzip'}))
+    assert response.headers['Content-Encoding'] == 'gzip'
+    lines = gzip.decompress(response.get_data()).decode().splitlines()
+    assert [json.loads(line)['date'] for line in lines] == ['2024-01-02', '2024-01-03']
+
+def test_export_ignores_paging_arguments(client, user_id, auth_headers):
+    add_records(user_id, START, 2)
+    response = client.get('/api/health/export?format=ndjson&limit=5000&cursor=x', headers=auth_headers)
+    assert response.status_code == 200
+
+def test_export_rejects_bad_arguments(client, auth_headers):
+    assert client.get('/api/health/export?format=xml', headers=auth_headers).status_code == 400
+    assert client.get('/api/health/export?start_date=2024-13-01', headers=auth_headers).status_code == 400
@@ -0,0 +1,27 @@
+from app.models import HealthRecord
+
+def post(client, headers, body, content_type):
+    return client.post('/api/health/records/bulk', data=body, headers=dict(headers, **{'Content-Type': content_type}))
+
+def test_repeated_dates_count_once(client, user_id, auth_headers):
+    body = '\n'.join([
+        '{"date": "2024-01-01", "lh": 1}',
+        '{"date": "2024-01-01", "lh": 2}',
+        '{"date": "2024-01-02", "lh": 3}',
+    ])
+    report = post(client, auth_headers, body, 'application/x-ndjson').get_json()
+    assert (report['received'], report['written'], report['rejected']) == (3, 2, 0)
+    assert {r.date.isoformat(): r.lh for r in HealthRecord.query.filter_by(user_id=user_id)} == {
+        '2024-01-01': 2.0, '2024-01-02': 3.0}
+
+def test_csv_with_bad_rows(client, user_id, auth_headers):
+    body = 'date,lh,cramps\n2024-01-01,1.5,2\nnot-a-date,1,1\n2024-01-03,,\n'
+    response = post(client, auth_headers, body, 'text/csv')
+    report = response.get_json()
+    assert response.status_code == 200
+    assert (report['written'], report['rejected']) == (2, 1)
+    assert report['errors'][0]['line'] == 3
+
+def test_nothing_written_is_unprocessable(client, auth_headers):
+    response = post(client, auth_headers, '{"lh": 1}\n', 'application/x-ndjson')
+    assert response.status_code == 422
@@ -0,0 +1,64 @@
+import uuid
+import pytest
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token
+from app.models import Prediction, PredictionJob, User, db
+from app.services import job_service
+from app.services.job_service import PredictionJobs, take_token
+from conftest import START, add_records
+
+def queue_job(user_id, target_date, **values):
+    job = PredictionJob(id=uuid.uuid4().hex, user_id=user_id, date=target_date, status='queued', **values)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def test_take_token_allows_a_burst_then_waits(app, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(job_service.time, 'time', lambda: now[0])
+
+    assert [take_token('jobs:1', 60, 3) for _ in range(3)] == [0, 0, 0]
+    assert take_token('jobs:1', 60, 3) == pytest.approx(1.0)
+    # Buckets are per key
+    assert take_token('jobs:2', 60, 3) == 0
+
+    now[0] += 1.0
+    assert take_token('jobs:1', 60, 3) == 0
+    assert take_token('jobs:1', 60, 3) > 0
+    assert take_token('jobs:1', 0, 3) == 60
+
+def test_run_batch_finishes_jobs_in_the_database(app, user_id):
+    add_records(user_id, START, 3)
+    ready = queue_job(user_id, START + timedelta(days=2))
+    missing = queue_job(user_id, START + timedelta(days=9))
+
+    PredictionJobs._run_batch([(ready.id, user_id, ready.date), (missing.id, user_id, missing.date)])
+    db.session.expire_all()
+
+    done = PredictionJobs.get(ready.id)
+    assert done.status == 'done' and done.finished_at is not None
+    stored = Prediction.query.filter_by(user_id=user_id, date=ready.date).one()
+    assert done.result['phase'] == stored.predicted_phase
+
+    failed = PredictionJobs.get(missing.id)
+    assert failed.status == 'failed'
+    assert 'No health record' in failed.error
+
+def test_jobs_pending_past_the_ttl_are_reported_lost(app, user_id):
+    fresh = queue_job(user_id, START)
+    lost = queue_job(user_id, START, created_at=datetime.utcnow() - timedelta(seconds=700))
+
+    assert PredictionJobs.to_dict(fresh, 600)['status'] == 'queued'
+    assert PredictionJobs.to_dict(lost, 600)['status'] == 'failed'
+    assert PredictionJobs.to_dict(lost, 600)['error']
+
+def test_job_status_route_is_per_user(client, user_id, auth_headers):
+    job = queue_job(user_id, START)
+    response = client.get(f'/api/predictions/jobs/{job.id}', headers=auth_headers)
+    assert (response.status_code, response.get_json()['status']) == (200, 'queued')
+
+    other = User(username='bob', email='bob@example.com', password_hash='x')
+    db.session.add(other)
+    db.session.commit()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(other.id))}'}
+    assert client.get(f'/api/predictions/jobs/{job.id}', headers=headers).status_code == 404
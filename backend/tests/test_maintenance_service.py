@@ -0,0 +1,73 @@
+import pytest
+from datetime import timedelta
+from app.models import Prediction, db
+from app.services.maintenance_service import PredictionMaintenance, LAG_DAYS
+from app.services.ml_service import MLService
+from app.services.record_service import RecordService, record_to_dict
+from conftest import START, add_records
+
+def day(i):
+    return START + timedelta(days=i)
+
+def store_placeholders(user_id, days):
+    records = RecordService.fetch_range(user_id, day(min(days)), day(max(days)))
+    RecordService.upsert_predictions(user_id, [
+        {"date": day(i), "record_id": records[day(i)].id, "predicted_phase": 'placeholder', "confidence": 0.0}
+        for i in days])
+    db.session.commit()
+
+def phases(user_id):
+    return {p.date: p.predicted_phase for p in Prediction.query.filter_by(user_id=user_id)}
+
+def test_affected_dates_cover_the_lag_window():
+    assert LAG_DAYS == 2
+    assert PredictionMaintenance.affected_dates([day(0)]) == {day(0), day(1), day(2)}
+    assert PredictionMaintenance.affected_dates([day(0), day(5)]) == {day(i) for i in (0, 1, 2, 5, 6, 7)}
+    assert PredictionMaintenance.affected_dates([]) == set()
+
+def test_existing_mode_rescores_only_stored_predictions(app, user_id):
+    add_records(user_id, START, 10)
+    store_placeholders(user_id, [3, 8])
+
+    assert PredictionMaintenance.refresh(user_id, [day(4)], 'existing') == []
+    assert PredictionMaintenance.refresh(user_id, [day(6)], 'existing') == [day(8)]
+    db.session.commit()
+
+    stored = phases(user_id)
+    assert set(stored) == {day(3), day(8)}
+    assert stored[day(3)] == 'placeholder'
+    assert stored[day(8)] != 'placeholder'
+
+def test_all_mode_predicts_every_affected_day_with_a_record(app, user_id):
+    add_records(user_id, START, 10)
+
+    # Day 11 and 12 have no record, so only the written day is scored
+    assert PredictionMaintenance.refresh(user_id, [day(9)], 'all') == [day(9)]
+    assert PredictionMaintenance.refresh(user_id, [day(2), day(3)], 'all') == [day(i) for i in range(2, 6)]
+    db.session.commit()
+    assert set(phases(user_id)) == {day(i) for i in (2, 3, 4, 5, 9)}
+
+def test_rescored_prediction_matches_a_fresh_prediction(app, user_id):
+    add_records(user_id, START, 10)
+    PredictionMaintenance.refresh(user_id, [day(5)], 'all')
+    db.session.commit()
+
+    current, previous = RecordService.fetch_window(user_id, day(7))
+    expected = MLService.predict(record_to_dict(current), [record_to_dict(r) for r in previous])
+    stored = Prediction.query.filter_by(user_id=user_id, date=day(7)).one()
+    assert stored.predicted_phase == expected['phase']
+    assert stored.confidence == pytest.approx(expected['confidence'])
+
+def test_off_and_unknown_modes(app, user_id):
+    add_records(user_id, START, 3)
+    assert PredictionMaintenance.refresh(user_id, [day(0)], 'off') == []
+    with pytest.raises(ValueError):
+        PredictionMaintenance.refresh(user_id, [day(0)], 'sometimes')
+
+def test_record_write_refreshes_dependent_predictions(client, user_id, auth_headers):
+    add_records(user_id, START, 5)
+    store_placeholders(user_id, [1, 2, 4])
+
+    response = client.post('/api/health/record', json={'date': day(1).isoformat(), 'lh': 30}, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.get_json()['refreshed_predictions'] == [day(1).isoformat(), day(2).isoformat()]
@@ -0,0 +1,41 @@
+import pytest
+from datetime import timedelta
+from app.models import Prediction
+from app.services.ml_service import MLService, FEATURES
+from conftest import START, add_records
+
+WINDOWS = [
+    ({'lh': 5.0, 'estrogen': 120.0, 'stress': 2}, {'lh': 4.0, 'stress': 1}, {'lh': 3.0}),
+    ({'lh': 40.0, 'pdg': 2.0}, {}, None),
+    ({}, {}, {}),
+]
+
+def test_build_features_places_lags(app):
+    X = MLService.build_features(WINDOWS)
+    assert X.shape == (3, len(FEATURES))
+    row = dict(zip(FEATURES, X[0]))
+    assert (row['lh'], row['lh_prev1'], row['lh_prev2'], row['stress_prev1']) == (5.0, 4.0, 3.0, 1.0)
+    assert not X[2].any()
+
+def test_predict_many_matches_single_predictions(app):
+    batch = MLService.predict_many(WINDOWS)
+    single = [MLService.predict(current, [prev1, prev2]) for current, prev1, prev2 in WINDOWS]
+    assert [r['phase'] for r in batch] == [r['phase'] for r in single]
+    assert [r['confidence'] for r in batch] == pytest.approx([r['confidence'] for r in single])
+    assert MLService.predict_many([]) == []
+
+def test_predict_batch_route(client, user_id, auth_headers):
+    add_records(user_id, START, 5)
+    response = client.post('/api/predictions/predict-batch', headers=auth_headers,
+                           json={'start_date': '2023-12-30', 'end_date': '2024-01-03'})
+    assert response.status_code == 200
+    body = response.get_json()
+    # Days without a record are skipped
+    assert [r['date'] for r in body] == ['2024-01-01', '2024-01-02', '2024-01-03']
+    stored = {p.date: p.predicted_phase for p in Prediction.query.filter_by(user_id=user_id)}
+    assert stored == {START + timedelta(days=i): body[i]['phase'] for i in range(3)}
+
+@pytest.mark.parametrize('body', [{}, {'start_date': '2024-01-05', 'end_date': '2024-01-01'},
+                                  {'start_date': '2024-01-01', 'end_date': '2025-06-01'}])
+def test_predict_batch_rejects_bad_ranges(client, auth_headers, body):
+    assert client.post('/api/predictions/predict-batch', json=body, headers=auth_headers).status_code == 400
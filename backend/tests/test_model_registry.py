@@ -0,0 +1,94 @@
+import pytest
+from app.services.ml_service import MLService
+from app.services.model_registry import ModelRegistry, LEGACY_VERSION
+
+@pytest.fixture
+def registry(tmp_path):
+    return ModelRegistry(str(tmp_path / 'models'))
+
+def publish(registry, bundle, **kwargs):
+    return registry.publish(bundle.model, bundle.scaler, bundle.le, **kwargs)
+
+def test_empty_registry_is_legacy(registry):
+    assert registry.active_version() == LEGACY_VERSION
+    assert registry.manifest_mtime() is None
+
+def test_publish_and_activate(registry, bundle):
+    assert publish(registry, bundle) == 'v1'
+    assert publish(registry, bundle, activate=False, metadata={"source": "test"}) == 'v2'
+
+    manifest = registry.read_manifest()
+    assert manifest['active'] == 'v1'
+    assert manifest['versions']['v2']['source'] == 'test'
+    assert manifest['versions']['v2']['engine'] is True
+
+    registry.activate('v2')
+    assert registry.active_version() == 'v2'
+    with pytest.raises(KeyError):
+        registry.activate('v9')
+    with pytest.raises(ValueError):
+        publish(registry, bundle, version='v1')
+
+def test_delete_keeps_active_version(registry, bundle):
+    publish(registry, bundle)
+    publish(registry, bundle, activate=False)
+    with pytest.raises(ValueError):
+        registry.delete('v1')
+    registry.delete('v2')
+    assert list(registry.read_manifest()['versions']) == ['v1']
+
+def test_load_published_bundle(registry, bundle):
+    publish(registry, bundle)
+    loaded = registry.load(engine=True)
+    assert loaded.version == 'v1'
+    assert list(loaded.le.classes_) == list(bundle.le.classes_)
+    assert loaded.engine is not None
+
+def test_swap_replaces_loaded_bundle(app, registry, bundle):
+    app.config['ML_MODEL_PATH'] = registry.root
+    publish(registry, bundle)
+    publish(registry, bundle, activate=False)
+
+    before = MLService.load_resources()
+    assert before.version == 'v1'
+    mtime = registry.manifest_mtime()
+
+    swapped = MLService.swap('v2')
+    assert MLService.loaded_version() == 'v2'
+    assert MLService.load_resources() is swapped
+    assert registry.active_version() == 'v2'
+    assert registry.manifest_mtime() != mtime
+    # In-flight callers still hold the complete previous bundle
+    assert before.version == 'v1' and before.model is not None
+
+    with pytest.raises(KeyError):
+        MLService.swap('v9')
+    assert MLService.loaded_version() == 'v2'
+
+def test_activation_elsewhere_is_picked_up(app, registry, bundle):
+    app.config['ML_MODEL_PATH'] = registry.root
+    app.config['ML_REGISTRY_POLL_SECONDS'] = 0
+    publish(registry, bundle)
+    publish(registry, bundle, activate=False)
+    assert MLService.load_resources().version == 'v1'
+
+    # Another process activates v2 through the manifest
+    ModelRegistry(registry.root).activate('v2')
+    assert MLService.load_resources().version == 'v2'
+
+def _publish_stubs(root, count):
+    from sklearn.preprocessing import LabelEncoder
+    le = LabelEncoder().fit(['a', 'b'])
+    registry = ModelRegistry(root)
+    return [registry.publish({'stub': True}, None, le) for _ in range(count)]
+
+def test_concurrent_publishers_lose_no_versions(registry):
+    import multiprocessing
+    context = multiprocessing.get_context('fork')
+    with context.Pool(4) as pool:
+        published = pool.starmap(_publish_stubs, [(registry.root, 3)] * 4)
+
+    names = [v for batch in published for v in batch]
+    manifest = registry.read_manifest()
+    assert sorted(names) == sorted(manifest['versions']) == sorted(f'v{i}' for i in range(1, 13))
+    assert manifest['active'] in names
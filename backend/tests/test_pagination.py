@@ -0,0 +1,88 @@
+import pytest
+from datetime import timedelta
+from app.models import HealthRecord
+from app.services.record_service import RecordService
+from app.utils.pagination import encode_cursor, decode_cursor, keyset_page, collection_etag
+from app.models import db
+from conftest import START, add_records
+
+def test_cursor_round_trip(app, user_id):
+    add_records(user_id, START, 1)
+    record = HealthRecord.query.one()
+    assert decode_cursor(encode_cursor(record)) == (record.date, record.id)
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', 'MjAyNC0wMS0wMQ', '!!!'])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+@pytest.mark.parametrize('descending', [False, True])
+def test_keyset_pages_cover_every_row_once(app, user_id, descending):
+    dates = add_records(user_id, START, 10)
+    query = HealthRecord.query.filter(HealthRecord.user_id == user_id)
+
+    seen, cursor = [], None
+    while True:
+        rows, cursor = keyset_page(query, HealthRecord, 3, cursor and decode_cursor(cursor), descending)
+        seen.extend(r.date for r in rows)
+        if cursor is None:
+            break
+    assert seen == sorted(dates, reverse=descending)
+
+def test_keyset_page_on_core_select(app, user_id):
+    add_records(user_id, START, 5)
+    stmt = db.select(HealthRecord.date, HealthRecord.id).where(HealthRecord.user_id == user_id)
+    rows, cursor = keyset_page(stmt, HealthRecord, 2)
+    assert [r.date for r in rows] == [START, START + timedelta(days=1)]
+    assert decode_cursor(cursor) == (rows[-1].date, rows[-1].id)
+
+def test_collection_etag_moves_on_write(app, user_id):
+    add_records(user_id, START, 3)
+    before = collection_etag(HealthRecord, user_id)
+    assert collection_etag(HealthRecord, user_id) == before
+
+    RecordService.upsert_record(user_id, START, {'lh': 42.0})
+    db.session.commit()
+    assert collection_etag(HealthRecord, user_id) != before
+    # Variants (query strings) of the same collection get distinct tags
+    assert collection_etag(HealthRecord, user_id, variant='limit=2') != collection_etag(HealthRecord, user_id)
+
+def test_records_route_pages_and_revalidates(client, user_id, auth_headers):
+    add_records(user_id, START, 5)
+
+    dates, url = [], '/api/health/records?limit=2'
+    while url:
+        response = client.get(url, headers=auth_headers)
+        assert response.status_code == 200
+        dates.extend(r['date'] for r in response.get_json())
+        cursor = response.headers.get('X-Next-Cursor')
+        url = f'/api/health/records?limit=2&cursor={cursor}' if cursor else None
+    assert dates == [(START + timedelta(days=i)).isoformat() for i in range(5)]
+
+    first = client.get('/api/health/records', headers=auth_headers)
+    etag = first.headers['ETag']
+    cached = client.get('/api/health/records', headers=dict(auth_headers, **{'If-None-Match': etag}))
+    assert cached.status_code == 304
+
+    client.post('/api/health/record', json={'date': '2024-01-02', 'lh': 99}, headers=auth_headers)
+    stale = client.get('/api/health/records', headers=dict(auth_headers, **{'If-None-Match': etag}))
+    assert stale.status_code == 200
+    assert stale.headers['ETag'] != etag
+
+def test_records_route_rejects_bad_cursor(client, auth_headers):
+    response = client.get('/api/health/records?cursor=garbage', headers=auth_headers)
+    assert response.status_code == 400
+
+def test_history_route_pages_newest_first(client, user_id, auth_headers):
+    add_records(user_id, START, 4)
+    records = RecordService.fetch_range(user_id, START, START + timedelta(days=3))
+    RecordService.upsert_predictions(user_id, [
+        {"date": d, "record_id": r.id, "predicted_phase": 'Luteal', "confidence": 0.5} for d, r in records.items()])
+    db.session.commit()
+
+    first = client.get('/api/predictions/history?limit=3', headers=auth_headers)
+    second = client.get(f"/api/predictions/history?limit=3&cursor={first.headers['X-Next-Cursor']}",
+                        headers=auth_headers)
+    dates = [p['date'] for p in first.get_json() + second.get_json()]
+    assert dates == [(START + timedelta(days=i)).isoformat() for i in (3, 2, 1, 0)]
+    assert 'X-Next-Cursor' not in second.headers
@@ -0,0 +1,89 @@
+import pytest
+from datetime import timedelta
+from app import create_app
+from app.models import HealthRecord, Prediction, db
+from app.services import record_service
+from app.services.record_service import RecordService
+from conftest import START, add_records, make_config
+
+@pytest.fixture(params=['native', 'fallback'])
+def upsert_path(request, monkeypatch):
+    """Runs each test against the dialect's ON CONFLICT statement and the select-then-write fallback."""
+    if request.param == 'fallback':
+        monkeypatch.setattr(record_service, '_UPSERT_INSERTS', {})
+    return request.param
+
+def test_upsert_record_updates_in_place(app, user_id, upsert_path):
+    first = RecordService.upsert_record(user_id, START, {'lh': 1.0, 'estrogen': 50.0})
+    db.session.commit()
+    second = RecordService.upsert_record(user_id, START, {'lh': 2.0})
+    db.session.commit()
+
+    assert first == second
+    records = HealthRecord.query.filter_by(user_id=user_id).all()
+    assert len(records) == 1
+    # Only the given fields are overwritten
+    assert records[0].lh == 2.0
+    assert records[0].estrogen == 50.0
+
+def test_upsert_record_stamps_updated_at(app, user_id):
+    RecordService.upsert_record(user_id, START, {'lh': 1.0})
+    db.session.commit()
+    before = db.session.query(HealthRecord.updated_at).filter_by(user_id=user_id).scalar()
+    RecordService.upsert_record(user_id, START, {'lh': 2.0})
+    db.session.commit()
+    after = db.session.query(HealthRecord.updated_at).filter_by(user_id=user_id).scalar()
+    assert after > before
+
+def test_upsert_records_keeps_absent_fields_and_latest_row(app, user_id, upsert_path):
+    add_records(user_id, START, 3)
+    RecordService.upsert_records(user_id, [
+        {'date': START, 'estrogen': 1.0},
+        {'date': START + timedelta(days=1), 'lh': 7.0},
+        {'date': START + timedelta(days=1), 'lh': 8.0, 'cramps': 2},
+        {'date': START + timedelta(days=3), 'lh': 9.0},
+    ], chunk_rows=1)
+    db.session.commit()
+
+    by_date = {r.date: r for r in HealthRecord.query.filter_by(user_id=user_id)}
+    assert len(by_date) == 4
+    assert (by_date[START].lh, by_date[START].estrogen) == (1.0, 1.0)
+    # Later rows for the same date win, merged field by field
+    day2 = by_date[START + timedelta(days=1)]
+    assert (day2.lh, day2.cramps, day2.estrogen) == (8.0, 2, 101.0)
+    assert by_date[START + timedelta(days=3)].lh == 9.0
+
+def test_upsert_predictions_overwrites_conflicts(app, user_id, upsert_path):
+    record_id = RecordService.upsert_record(user_id, START, {'lh': 1.0})
+    row = {'date': START, 'record_id': record_id, 'predicted_phase': 'Luteal', 'confidence': 0.5}
+    RecordService.upsert_predictions(user_id, [row])
+    db.session.commit()
+    RecordService.upsert_predictions(user_id, [dict(row, predicted_phase='Menstrual', confidence=0.9)])
+    db.session.commit()
+
+    predictions = Prediction.query.filter_by(user_id=user_id).all()
+    assert [(p.predicted_phase, p.confidence) for p in predictions] == [('Menstrual', 0.9)]
+
+def test_startup_dedupes_before_building_unique_indexes(app, user_id, tmp_path):
+    # A database from before the unique indexes, holding repeated (user_id, date) rows
+    with db.engine.begin() as conn:
+        conn.execute(db.text('DROP INDEX ix_health_records_user_date'))
+        conn.execute(db.text('DROP INDEX ix_predictions_user_date'))
+        for lh in (1.0, 2.0):
+            conn.execute(db.insert(HealthRecord).values(user_id=user_id, date=START, lh=lh))
+        old_id, new_id = conn.execute(db.select(HealthRecord.id).order_by(HealthRecord.id)).scalars()
+        for phase in ('Luteal', 'Menstrual'):
+            conn.execute(db.insert(Prediction).values(user_id=user_id, date=START, record_id=old_id,
+                                                      predicted_phase=phase, confidence=0.5))
+    db.session.remove()
+    db.engine.dispose()
+
+    create_app(make_config(tmp_path / 'test.db'))
+
+    records = HealthRecord.query.filter_by(user_id=user_id).all()
+    assert [(r.id, r.lh) for r in records] == [(new_id, 2.0)]
+    predictions = Prediction.query.filter_by(user_id=user_id).all()
+    assert [(p.predicted_phase, p.record_id) for p in predictions] == [('Menstrual', new_id)]
+    RecordService.upsert_record(user_id, START, {'lh': 3.0})
+    db.session.commit()
+    assert HealthRecord.query.filter_by(user_id=user_id).one().lh == 3.0
@@ -0,0 +1,113 @@
+import pytest
+from datetime import timedelta
+from app.models import UserRollup, db
+from app.services.record_service import RecordService
+from app.services import rollup_service
+from app.services.rollup_service import RollupService, RollupConflict
+from conftest import START, add_records
+
+def snapshot(user_id):
+    db.session.expire_all()
+    rollup = db.session.get(UserRollup, user_id)
+    return rollup.version, (rollup.as_of, rollup.window, rollup.period_starts, rollup.stats)
+
+def rebuilt(user_id):
+    RollupService.rebuild(user_id)
+    db.session.commit()
+    return snapshot(user_id)[1]
+
+@pytest.fixture
+def lose_race(monkeypatch):
+    """
+    Once called, the next rollup write loses its race: another connection bumps the
+    version after the rollup was read and before the compare-and-set.
+    """
+    compute_stats = rollup_service.compute_stats
+
+    def bump_then_compute(*args):
+        monkeypatch.setattr(rollup_service, 'compute_stats', compute_stats)
+        with db.engine.begin() as conn:
+            conn.execute(db.update(UserRollup).values(version=UserRollup.version + 1))
+        return compute_stats(*args)
+
+    return lambda: monkeypatch.setattr(rollup_service, 'compute_stats', bump_then_compute)
+
+def test_get_builds_the_rollup_once(app, user_id):
+    add_records(user_id, START, 10)
+    rollup = RollupService.get(user_id)
+    assert (rollup.version, rollup.as_of) == (0, START + timedelta(days=9))
+    assert RollupService.get(user_id) is rollup
+
+def test_apply_writes_matches_a_rebuild(app, user_id):
+    add_records(user_id, START, 20, last_period_date=START)
+    RollupService.get(user_id)
+
+    # A correction inside the window, a new latest day after a gap and a new period start
+    written = [START + timedelta(days=4), START + timedelta(days=25)]
+    RecordService.upsert_record(user_id, written[0], {'lh': 55.0, 'cramps': 3})
+    RecordService.upsert_record(user_id, written[1], {'lh': 7.0, 'last_period_date': written[1]})
+    db.session.commit()
+    RollupService.apply_writes(user_id, written)
+    db.session.commit()
+
+    version, state = snapshot(user_id)
+    assert version == 1
+    assert state[0] == written[1]
+    assert state == rebuilt(user_id)
+
+def test_window_moves_past_its_length(app, user_id):
+    add_records(user_id, START, 5)
+    RollupService.get(user_id)
+    far = START + timedelta(days=200)
+    add_records(user_id, far, 1)
+    RollupService.apply_writes(user_id, [far])
+    db.session.commit()
+    assert snapshot(user_id)[1] == rebuilt(user_id)
+
+def test_apply_writes_detects_a_concurrent_update(app, user_id, lose_race):
+    add_records(user_id, START, 10)
+    RollupService.get(user_id)
+    lose_race()
+
+    with pytest.raises(RollupConflict):
+        RollupService.apply_writes(user_id, [START])
+    db.session.rollback()
+    # Only the concurrent writer's bump landed
+    assert snapshot(user_id)[0] == 1
+
+def test_update_after_write_rebuilds_on_conflict(app, user_id, lose_race, monkeypatch):
+    add_records(user_id, START, 10)
+    RollupService.get(user_id)
+    written = START + timedelta(days=10)
+    RecordService.upsert_record(user_id, written, {'lh': 12.0})
+    db.session.commit()
+
+    lose_race()
+    rebuilds = []
+    rebuild = RollupService.rebuild
+    monkeypatch.setattr(RollupService, 'rebuild', staticmethod(lambda uid: rebuilds.append(uid) or rebuild(uid)))
+    RollupService.update_after_write(user_id, [written])
+
+    assert rebuilds == [user_id]
+    version, state = snapshot(user_id)
+    assert version == 2
+    assert state[0] == written
+    assert state == rebuilt(user_id)
+
+def test_apply_writes_without_a_rollup_is_a_no_op(app, user_id):
+    add_records(user_id, START, 3)
+    RollupService.apply_writes(user_id, [START])
+    assert db.session.get(UserRollup, user_id) is None
+
+def test_analytics_etag_moves_with_writes(client, user_id, auth_headers):
+    add_records(user_id, START, 5)
+    first = client.get('/api/health/analytics', headers=auth_headers)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert client.get('/api/health/analytics',
+                      headers=dict(auth_headers, **{'If-None-Match': etag})).status_code == 304
+
+    client.post('/api/health/record', json={'date': '2024-01-06', 'lh': 9}, headers=auth_headers)
+    second = client.get('/api/health/analytics', headers=dict(auth_headers, **{'If-None-Match': etag}))
+    assert second.status_code == 200
+    assert second.headers['ETag'] != etag
@@ -0,0 +1,44 @@
+import threading
+from app.utils import row_index
+from app.utils.row_index import RowIndex
+
+def write_csv(path, rows):
+    path.write_text('id,value\n' + ''.join(f'{i},{i * 10}\n' for i in range(rows)))
+    return str(path)
+
+def test_pages_are_read_from_offsets(tmp_path):
+    index = RowIndex.for_file(write_csv(tmp_path / 'a.csv', 25))
+    assert index.total_rows == 25
+    page = index.read_rows(20, 10, ['value'])
+    assert list(page['value']) == [200, 210, 220, 230, 240]
+    assert index.read_rows(30, 5).empty
+
+def test_index_is_rebuilt_when_the_file_changes(tmp_path):
+    path = write_csv(tmp_path / 'a.csv', 5)
+    assert RowIndex.for_file(path).total_rows == 5
+    with open(path, 'a') as f:
+        f.write('5,50')
+    assert RowIndex.for_file(path).total_rows == 6
+
+def test_a_build_blocks_only_its_own_file(tmp_path, monkeypatch):
+    slow, fast = write_csv(tmp_path / 'slow.csv', 5), write_csv(tmp_path / 'fast.csv', 5)
+    started, release = threading.Event(), threading.Event()
+    build = RowIndex._build.__func__
+
+    def held_build(cls, path, signature):
+        if path.endswith('slow.csv'):
+            started.set()
+            release.wait(10)
+        return build(cls, path, signature)
+
+    monkeypatch.setattr(RowIndex, '_build', classmethod(held_build))
+    worker = threading.Thread(target=RowIndex.for_file, args=(slow,))
+    worker.start()
+    try:
+        assert started.wait(10)
+        assert RowIndex.for_file(fast).total_rows == 5
+        assert fast in row_index._cache and slow not in row_index._cache
+    finally:
+        release.set()
+        worker.join()
+    assert RowIndex.for_file(slow).total_rows == 5
@@ -0,0 +1,38 @@
+import os
+import importlib.util
+import pytest
+from flask_jwt_extended import create_access_token
+from app import create_app
+from app.models import User, db
+from conftest import make_config
+
+# Median cold boot allowed per role; override with STARTUP_BUDGET_MS on slow machines
+BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', 1500))
+
+def load_check_startup():
+    path = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'check_startup.py')
+    spec = importlib.util.spec_from_file_location('check_startup', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.mark.parametrize('role', ['api', 'all'])
+def test_boot_within_budget_without_heavy_imports(role):
+    check_startup = load_check_startup()
+    median_ms, _, _, loaded = check_startup.measure(role, runs=3)
+    assert check_startup.budget_failures(median_ms, loaded, BUDGET_MS) == []
+
+def test_roles_without_predictions_never_load_the_model(tmp_path):
+    app = create_app(make_config(tmp_path / 'api.db', SERVICE_ROLE='api'))
+    assert app.config['PREDICTION_MAINTENANCE'] == 'off'
+    assert 'predictions' not in app.blueprints
+
+    with app.app_context():
+        admin = User(username='admin', email='admin@example.com', password_hash='x')
+        db.session.add(admin)
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(admin.id))}'}
+        response = app.test_client().post('/api/admin/models/v1/activate', headers=headers)
+        db.session.remove()
+        db.engine.dispose()
+    assert response.status_code == 409
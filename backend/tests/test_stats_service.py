@@ -0,0 +1,91 @@
+import pytest
+from datetime import datetime, timedelta
+from app.models import HealthRecord, StatBucket, db
+from app.services import stats_service
+from app.services.record_service import RecordService
+from app.services.stats_service import StatsService
+from conftest import START, add_records
+
+@pytest.fixture
+def stats_app(app):
+    app.config['STATS_WATERMARK_LAG_SECONDS'] = 0
+    app.config['STATS_PHASE_RECOUNT_SECONDS'] = 0
+    return app
+
+def predict(user_id, phases):
+    """Stores a prediction per day from START with the given phases. Commits."""
+    records = RecordService.fetch_range(user_id, START, START + timedelta(days=len(phases) - 1))
+    RecordService.upsert_predictions(user_id, [
+        {"date": d, "record_id": records[d].id, "predicted_phase": phase, "confidence": 0.5}
+        for d, phase in zip(sorted(records), phases)])
+    db.session.commit()
+
+def counters():
+    return StatsService.counters()
+
+def test_refresh_counts_each_row_once(stats_app, user_id):
+    add_records(user_id, START, 5)
+    StatsService.refresh()
+    assert (counters()['users'], counters()['records']) == (1, 5)
+
+    StatsService.refresh()
+    assert counters()['records'] == 5
+
+    add_records(user_id, START + timedelta(days=5), 3)
+    # Updates of counted rows are not new rows
+    RecordService.upsert_record(user_id, START, {'lh': 9.0})
+    db.session.commit()
+    StatsService.refresh()
+    assert counters()['records'] == 8
+    buckets = StatBucket.query.filter_by(granularity='day', metric='records').all()
+    assert sum(b.count for b in buckets) == 8
+
+def test_rows_inside_the_lag_wait_for_the_next_refresh(stats_app, user_id):
+    stats_app.config['STATS_WATERMARK_LAG_SECONDS'] = 3600
+    add_records(user_id, START, 4)
+    StatsService.refresh()
+    assert counters().get('records', 0) == 0
+
+    stats_app.config['STATS_WATERMARK_LAG_SECONDS'] = 0
+    StatsService.refresh()
+    assert counters()['records'] == 4
+
+def test_refresh_in_small_steps(stats_app, user_id, monkeypatch):
+    monkeypatch.setattr(stats_service, 'REFRESH_BATCH_ROWS', 3)
+    add_records(user_id, START, 10)
+    # Rows sharing a timestamp are counted in the same step
+    db.session.execute(db.update(HealthRecord).where(HealthRecord.date <= START + timedelta(days=4))
+                       .values(created_at=datetime.utcnow() - timedelta(minutes=5)))
+    db.session.commit()
+    StatsService.refresh()
+    assert counters()['records'] == 10
+
+def test_phase_mix_follows_rescored_predictions(stats_app, user_id):
+    add_records(user_id, START, 4)
+    predict(user_id, ['Luteal', 'Luteal', 'Menstrual', 'Follicular'])
+    StatsService.refresh()
+    phases = {k: v for k, v in counters().items() if k.startswith(stats_service.PHASE_PREFIX)}
+    assert phases == {'predicted_phase:Luteal': 2, 'predicted_phase:Menstrual': 1, 'predicted_phase:Follicular': 1}
+
+    # Re-scored in place: the total stays, the mix moves and vanished phases are dropped
+    predict(user_id, ['Menstrual', 'Menstrual', 'Menstrual', 'Menstrual'])
+    StatsService.refresh()
+    phases = {k: v for k, v in counters().items() if k.startswith(stats_service.PHASE_PREFIX)}
+    assert phases == {'predicted_phase:Menstrual': 4}
+    assert counters()['predictions'] == 4
+
+def test_a_time_range_counted_elsewhere_is_skipped(stats_app, user_id, monkeypatch):
+    add_records(user_id, START, 3)
+    # Another process advances the watermark between this refresh's read and its compare-and-set
+    advance = stats_service._advance
+
+    def lose_race(name, old, new, exists):
+        monkeypatch.setattr(stats_service, '_advance', advance)
+        assert advance(name, old, new, exists)
+        return advance(name, old, new, exists)
+
+    monkeypatch.setattr(stats_service, '_advance', lose_race)
+    StatsService.refresh()
+    # 'users' lost its race and was not counted here; the other metrics were
+    assert counters().get('users', 0) == 0
+    assert counters()['records'] == 3
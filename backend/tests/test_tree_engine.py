@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.config import Config
+from app.services.ml_service import FEATURES
+from app.services.tree_engine import CompiledEnsemble
+
+@pytest.fixture(scope='module')
+def rows():
+    X = pd.read_csv(Config.SAMPLE_DATA_PATH, usecols=FEATURES, nrows=500)[FEATURES].to_numpy(dtype=np.float64)
+    # All-zero rows (empty windows) and missing values take the default branches
+    missing = X[:20].copy()
+    missing[np.random.default_rng(0).random(missing.shape) < 0.3] = np.nan
+    return np.vstack([X, np.zeros((5, len(FEATURES))), missing])
+
+def reference(bundle, X):
+    return bundle.model.predict_proba(bundle.scaler.transform(X))
+
+def test_compiled_matches_xgboost(bundle, rows):
+    compiled = CompiledEnsemble.from_model(bundle.model, bundle.scaler)
+    expected = reference(bundle, rows)
+    actual = compiled.predict_proba(rows)
+    # Thresholds are folded exactly, so the probabilities are bit-identical
+    np.testing.assert_array_equal(actual, expected)
+
+def test_single_row_batches(bundle, rows):
+    compiled = CompiledEnsemble.from_model(bundle.model, bundle.scaler)
+    for row in rows[:5]:
+        np.testing.assert_array_equal(compiled.predict_proba(row[None, :]), reference(bundle, row[None, :]))
+
+def test_saved_engine_round_trip(bundle, rows, tmp_path):
+    compiled = CompiledEnsemble.from_model(bundle.model, bundle.scaler)
+    compiled.save(str(tmp_path / 'engine'))
+    loaded = CompiledEnsemble.load(str(tmp_path / 'engine'), mmap_mode='r')
+    np.testing.assert_array_equal(loaded.predict_proba(rows), compiled.predict_proba(rows))
+
+def test_compiling_emits_no_warnings(bundle):
+    import warnings
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', RuntimeWarning)
+        CompiledEnsemble.from_model(bundle.model, bundle.scaler)
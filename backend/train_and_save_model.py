@@ -1,66 +1,343 @@
 import pandas as pd
 import numpy as np
 import os
+import json
+import time
+import hashlib
+import argparse
+import itertools
 import joblib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from sklearn.model_selection import StratifiedKFold, GroupShuffleSplit
+from sklearn.metrics import accuracy_score, log_loss
 from sklearn.preprocessing import LabelEncoder, StandardScaler, MinMaxScaler
 from xgboost import XGBClassifier
+from app.services.model_registry import ModelRegistry
 
 # Constants
 DATA_PATH = "../data/processed/final_dataset.csv"
 MODEL_DIR = "ml_models"
+CACHE_DIR = "../data/.cache"
+REPORT_DIR = os.path.join(MODEL_DIR, "reports")
 
-def train():
-    if not os.path.exists(MODEL_DIR):
-        os.makedirs(MODEL_DIR)
+# Select Features (as per notebook)
+FEATURES = [
+    "lh","estrogen","pdg",
+    "cramps","fatigue","moodswing",
+    "stress","bloating","sleepissue",
+    "overall_score","deep_sleep_in_minutes",
+    "avg_resting_heart_rate","stress_score","daily_steps",
+    "lh_prev1","lh_prev2","estrogen_prev1","pdg_prev1","stress_prev1"
+]
+
+# BestParams roughly from notebook
+BASE_PARAMS = {
+    "n_estimators": 300,
+    "max_depth": 6,
+    "learning_rate": 0.1,
+    "subsample": 0.8,
+}
+
+# Grid sampled by --mode search
+SEARCH_SPACE = {
+    "max_depth": [3, 4, 6, 8],
+    "learning_rate": [0.03, 0.05, 0.1, 0.2],
+    "subsample": [0.7, 0.8, 1.0],
+    "colsample_bytree": [0.6, 0.8, 1.0],
+    "min_child_weight": [1, 3, 5],
+}
+# Search-space form of the notebook parameters, always evaluated as a reference point
+BASE_PARAMS_SEARCH = {"max_depth": 6, "learning_rate": 0.1, "subsample": 0.8, "colsample_bytree": 1.0, "min_child_weight": 1}
+SEARCH_MAX_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 30
+
+# Share of labelled users held out by --mode warm-start to compare the new model with the active one
+WARM_START_HOLDOUT = 0.2
+
+def make_model(n_classes, **params):
+    return XGBClassifier(
+        objective="multi:softmax",
+        num_class=n_classes,
+        eval_metric="mlogloss",
+        random_state=42,
+        **params
+    )
+
+def prepare_features(force=False):
+    """
+    Loads X, y and the label encoder from the processed dataset. The prepared matrix is
+    cached under CACHE_DIR keyed on the dataset's size and mtime.
+    """
+    stat = os.stat(DATA_PATH)
+    key = hashlib.sha256(json.dumps([DATA_PATH, stat.st_size, stat.st_mtime_ns, FEATURES]).encode()).hexdigest()[:16]
+    cache_path = os.path.join(CACHE_DIR, f"features-{key}.npz")
+
+    if not force and os.path.exists(cache_path):
+        cached = np.load(cache_path, allow_pickle=False)
+        le = LabelEncoder()
+        le.classes_ = cached["classes"]
+        return cached["X"], cached["y"], le
 
     # Load data
     df = pd.read_csv(DATA_PATH)
-    
+
     # Encode Target
     le = LabelEncoder()
-    df["phase_encoded"] = le.fit_transform(df["phase_simple"])
-    
-    # Save LabelEncoder
-    joblib.dump(le, os.path.join(MODEL_DIR, "label_encoder.joblib"))
-    
-    # Select Features (as per notebook)
-    features = [
-        "lh","estrogen","pdg",
-        "cramps","fatigue","moodswing",
-        "stress","bloating","sleepissue",
-        "overall_score","deep_sleep_in_minutes",
-        "avg_resting_heart_rate","stress_score","daily_steps",
-        "lh_prev1","lh_prev2","estrogen_prev1","pdg_prev1","stress_prev1"
-    ]
-    
-    X = df[features].astype(float)
-    y = df["phase_encoded"].astype(int)
-    
+    y = le.fit_transform(df["phase_simple"]).astype(int)
+    X = df[FEATURES].astype(float).to_numpy()
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    np.savez(cache_path, X=X, y=y, classes=le.classes_.astype(str))
+    return X, y, le
+
+def train():
+    started = time.perf_counter()
+    X, y, le = prepare_features()
+    prepared = time.perf_counter()
+
     # Scalers
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
-    
-    # Save Scaler
-    joblib.dump(scaler, os.path.join(MODEL_DIR, "scaler.joblib"))
-    
-    # Train Model (BestParams roughly from notebook)
-    model = XGBClassifier(
-        n_estimators=300,
-        max_depth=6,
-        learning_rate=0.1,
-        subsample=0.8,
-        objective="multi:softmax",
-        num_class=len(le.classes_),
-        eval_metric="mlogloss",
-        random_state=42
-    )
-    
+
+    # Train Model
+    model = make_model(len(le.classes_), **BASE_PARAMS)
     model.fit(X_scaled, y)
-    
-    # Save Model
-    joblib.dump(model, os.path.join(MODEL_DIR, "model.joblib"))
-    print("Model, Scaler, and LabelEncoder saved successfully in", MODEL_DIR)
+    trained = time.perf_counter()
+
+    report = {
+        "mode": "fit",
+        "rows": len(X),
+        "params": BASE_PARAMS,
+        "train_accuracy": float(accuracy_score(y, model.predict(X_scaled))),
+        "timings": {"prepare_s": round(prepared - started, 3), "fit_s": round(trained - prepared, 3)}
+    }
+    publish(model, scaler, le, report)
+
+def _cv_fold(candidate, params, fold, X, y, train_idx, val_idx, n_classes):
+    # Runs in a worker process: one (candidate, fold) fit with early stopping on the fold's validation split
+    started = time.perf_counter()
+    scaler = StandardScaler().fit(X[train_idx])
+    model = make_model(n_classes, n_estimators=SEARCH_MAX_ROUNDS, early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+                       n_jobs=1, **params)
+    X_val = scaler.transform(X[val_idx])
+    model.fit(scaler.transform(X[train_idx]), y[train_idx], eval_set=[(X_val, y[val_idx])], verbose=False)
+    probs = model.predict_proba(X_val)
+    return {
+        "candidate": candidate,
+        "fold": fold,
+        "best_iteration": int(model.best_iteration),
+        "logloss": float(log_loss(y[val_idx], probs, labels=np.arange(n_classes))),
+        "accuracy": float(accuracy_score(y[val_idx], probs.argmax(axis=1))),
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+def search(n_candidates=20, folds=5, workers=None, seed=42):
+    """Cross-validated random search over SEARCH_SPACE, one process per (candidate, fold) fit."""
+    started = time.perf_counter()
+    X, y, le = prepare_features()
+    prepared = time.perf_counter()
+
+    grid = [dict(zip(SEARCH_SPACE, values)) for values in itertools.product(*SEARCH_SPACE.values())]
+    rng = np.random.default_rng(seed)
+    candidates = [grid[i] for i in rng.choice(len(grid), size=min(n_candidates, len(grid)), replace=False)]
+    if BASE_PARAMS_SEARCH not in candidates:
+        candidates[0] = BASE_PARAMS_SEARCH
+
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(X, y))
+    tasks = [(c, params, f, X, y, tr, va, len(le.classes_))
+             for c, params in enumerate(candidates) for f, (tr, va) in enumerate(splits)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_cv_fold, *zip(*tasks)))
+    searched = time.perf_counter()
+
+    summary = []
+    for c, params in enumerate(candidates):
+        fold_results = [r for r in results if r["candidate"] == c]
+        summary.append({
+            "params": params,
+            "logloss": float(np.mean([r["logloss"] for r in fold_results])),
+            "accuracy": float(np.mean([r["accuracy"] for r in fold_results])),
+            "best_iteration": int(np.mean([r["best_iteration"] for r in fold_results])),
+            "fit_seconds": float(np.sum([r["seconds"] for r in fold_results]))
+        })
+    summary.sort(key=lambda s: s["logloss"])
+    best = summary[0]
+
+    # Refit the winner on all rows with the averaged early-stopping round count
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    model = make_model(len(le.classes_), n_estimators=best["best_iteration"] + 1, **best["params"])
+    model.fit(X_scaled, y)
+    refit = time.perf_counter()
+
+    report = {
+        "mode": "search",
+        "rows": len(X),
+        "folds": folds,
+        "candidates": len(candidates),
+        "workers": workers or os.cpu_count(),
+        "best": best,
+        "leaderboard": summary,
+        "timings": {
+            "prepare_s": round(prepared - started, 3),
+            "search_s": round(searched - prepared, 3),
+            "refit_s": round(refit - searched, 3)
+        }
+    }
+    publish(model, scaler, le, report)
+
+def load_labels(path):
+    """
+    Ground-truth phases for warm-start from a CSV with user_id, date (YYYY-MM-DD) and phase
+    columns, e.g. test-confirmed cycle phases. Returns {(user_id, date): phase}.
+    """
+    df = pd.read_csv(path, dtype={"phase": str})
+    missing = {"user_id", "date", "phase"} - set(df.columns)
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(sorted(missing))}")
+    df = df.dropna(subset=["user_id", "date", "phase"])
+    dates = pd.to_datetime(df["date"], format="%Y-%m-%d").dt.date
+    return dict(zip(zip(df["user_id"].astype(int), dates), df["phase"]))
+
+def load_db_rows(labels, since=None):
+    """
+    Feature rows from HealthRecord for the labelled (user_id, date) pairs: features come from
+    the same 3-day window the API predicts on. Returns (X, labels, user_ids).
+    """
+    from app import create_app
+    from app.config import Config
+    from app.models import HealthRecord
+    from app.services.ml_service import MLService
+    from app.services.record_service import record_to_dict
+
+    class TrainConfig(Config):
+        ML_WARM_ON_STARTUP = False
+
+    app = create_app(TrainConfig)
+    with app.app_context():
+        query = HealthRecord.query.filter(HealthRecord.user_id.in_({user_id for user_id, _ in labels}))
+        if since:
+            # Lag days before `since` are still needed for the first windows
+            query = query.filter(HealthRecord.date >= since - timedelta(days=2))
+        by_key = {(r.user_id, r.date): r for r in query.order_by(HealthRecord.user_id, HealthRecord.date).all()}
+
+    windows, phases, users = [], [], []
+    for (user_id, day), phase in sorted(labels.items()):
+        record = by_key.get((user_id, day))
+        if record is None or (since and day < since):
+            continue
+        windows.append((
+            record_to_dict(record),
+            record_to_dict(by_key.get((user_id, day - timedelta(days=1)))),
+            record_to_dict(by_key.get((user_id, day - timedelta(days=2))))
+        ))
+        phases.append(phase)
+        users.append(user_id)
+    return MLService.build_features(windows), phases, np.array(users)
+
+def warm_start(labels_path, rounds=50, since=None, min_rows=20):
+    """
+    Continues boosting the active registry model on database records with ground-truth labels.
+    The new version is only activated when its log loss on held-out users is no worse than
+    the active version's on the same rows.
+    """
+    started = time.perf_counter()
+    registry = ModelRegistry(MODEL_DIR)
+    bundle = registry.load(mmap_mode=None)
+    X, labels, users = load_db_rows(load_labels(labels_path), since)
+    loaded = time.perf_counter()
+
+    # The scaler and label encoder stay fixed: existing trees split on the scaled feature space
+    known = set(bundle.le.classes_)
+    keep = [i for i, label in enumerate(labels) if label in known]
+    if len(keep) < min_rows or len(set(users[keep])) < 2:
+        print(f"Only {len(keep)} labelled rows from {len(set(users[keep]))} users match the database "
+              f"(need {min_rows} rows from at least 2 users); nothing to do.")
+        return
+    X_scaled = bundle.scaler.transform(X[keep])
+    y = bundle.le.transform([labels[i] for i in keep])
+
+    # Users are held out whole, so neighbouring days of one user never sit on both sides
+    split = GroupShuffleSplit(n_splits=1, test_size=WARM_START_HOLDOUT, random_state=42)
+    train_idx, holdout_idx = next(split.split(X_scaled, y, groups=users[keep]))
+
+    params = {k: v for k, v in bundle.model.get_params().items() if k in SEARCH_SPACE or k in BASE_PARAMS}
+    params["n_estimators"] = rounds
+    model = make_model(len(bundle.le.classes_), **params)
+    model.fit(X_scaled[train_idx], y[train_idx], xgb_model=bundle.model.get_booster())
+    trained = time.perf_counter()
+
+    classes = np.arange(len(bundle.le.classes_))
+    holdout = {}
+    for name, candidate in (("active", bundle.model), ("new", model)):
+        probs = candidate.predict_proba(X_scaled[holdout_idx])
+        holdout[name] = {
+            "logloss": float(log_loss(y[holdout_idx], probs, labels=classes)),
+            "accuracy": float(accuracy_score(y[holdout_idx], probs.argmax(axis=1)))
+        }
+
+    report = {
+        "mode": "warm-start",
+        "parent": bundle.version,
+        "labels": os.path.abspath(labels_path),
+        "rows": len(keep),
+        "holdout_rows": len(holdout_idx),
+        "since": since.isoformat() if since else None,
+        "added_rounds": rounds,
+        "train_accuracy": float(accuracy_score(y[train_idx], model.predict(X_scaled[train_idx]))),
+        "logloss": holdout["new"]["logloss"],
+        "accuracy": holdout["new"]["accuracy"],
+        "holdout": holdout,
+        "timings": {"load_s": round(loaded - started, 3), "fit_s": round(trained - loaded, 3)}
+    }
+    publish(model, bundle.scaler, bundle.le, report,
+            activate=holdout["new"]["logloss"] <= holdout["active"]["logloss"])
+
+def publish(model, scaler, le, report, activate=True):
+    # Publish Model, Scaler and LabelEncoder as a new registry version, activating it if asked
+    started = time.perf_counter()
+    version = ModelRegistry(MODEL_DIR).publish(model, scaler, le, activate=activate, metadata={
+        "mode": report["mode"],
+        "rows": report["rows"],
+        "metrics": {k: v for k, v in (report.get("best") or report).items() if k in ("logloss", "accuracy", "train_accuracy")}
+    })
+    report["version"] = version
+    report["activated"] = activate
+    report["timings"]["publish_s"] = round(time.perf_counter() - started, 3)
+
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    report_path = os.path.join(REPORT_DIR, f"{version}-{report['mode']}.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    if activate:
+        print(f"Model bundle {version} published and activated in", MODEL_DIR)
+    else:
+        print(f"Model bundle {version} published to {MODEL_DIR} but not activated: its held-out log loss "
+              f"is worse than the active version's (activate it from the admin API to override)")
+    print("Report written to", report_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the phase model and publish it to the model registry")
+    parser.add_argument("--mode", choices=["fit", "search", "warm-start"], default="fit")
+    parser.add_argument("--candidates", type=int, default=20, help="search: parameter sets to evaluate")
+    parser.add_argument("--folds", type=int, default=5, help="search: cross-validation folds")
+    parser.add_argument("--workers", type=int, default=None, help="search: worker processes")
+    parser.add_argument("--rounds", type=int, default=50, help="warm-start: boosting rounds to add")
+    parser.add_argument("--since", help="warm-start: only use records on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--labels", help="warm-start (required): CSV of ground-truth phases with user_id, date, phase")
+    args = parser.parse_args()
+    if args.mode == "warm-start" and not args.labels:
+        parser.error("--mode warm-start needs --labels: a CSV of ground-truth phases (user_id, date, phase)")
+
+    if args.mode == "search":
+        search(args.candidates, args.folds, args.workers)
+    elif args.mode == "warm-start":
+        since = datetime.strptime(args.since, "%Y-%m-%d").date() if args.since else None
+        warm_start(args.labels, args.rounds, since)
+    else:
+        train()
 
 if __name__ == "__main__":
     # Ensure we are in the backend directory context
-    train()
+    main()
@@ -0,0 +1,17 @@
+"""
+Production WSGI entry point:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn.conf.py sets preload_app, so this module runs once in the master:
+the app is built and the active model bundle loaded (ML_WARM_ON_STARTUP)
+before the workers are forked, and they share those pages copy-on-write.
+"""
+import gc
+from app import create_app
+
+app = create_app()
+
+# Keep the cyclic GC from touching the preloaded objects in the workers, which
+# would dirty (and so copy) their pages
+gc.freeze()
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import api, { healthService, predictionService, datasetService } from '../services/api';
+import api, { dashboardService, healthService, predictionService, datasetService } from '../services/api';
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, AreaChart, Area } from 'recharts';
 import { Brain, TrendingUp, Calendar, Heart, Zap, Moon } from 'lucide-react';
 
@@ -8,24 +8,39 @@ const Dashboard = () => {
     const [predictions, setPredictions] = useState([]);
     const [datasets, setDatasets] = useState([]);
     const [globalSummary, setGlobalSummary] = useState(null);
+    const [summary, setSummary] = useState(null);
+    const [history, setHistory] = useState('recent'); // 'recent', 'loading' or 'full'
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
         Promise.all([
-            healthService.getRecords(),
-            predictionService.getHistory(),
+            dashboardService.get(),
             datasetService.list(),
             api.get('/datasets/summary')
-        ]).then(([recRes, predRes, dataRes, globalRes]) => {
-            // Backend returns data in ASC order now
-            setRecords(recRes.data);
-            setPredictions(predRes.data);
+        ]).then(([dashRes, dataRes, globalRes]) => {
+            // Recent records oldest first, predictions newest first
+            setRecords(dashRes.data.records);
+            setPredictions(dashRes.data.recent_predictions);
+            setSummary(dashRes.data.summary);
             setDatasets(dataRes.data);
             setGlobalSummary(globalRes.data);
         }).finally(() => setLoading(false));
     }, []);
 
+    // The dashboard response holds the latest days only; the full history comes from the paginated endpoints
+    const loadFullHistory = () => {
+        setHistory('loading');
+        Promise.all([healthService.getAllRecords(), predictionService.getAllHistory()])
+            .then(([allRecords, allPredictions]) => {
+                setRecords(allRecords);
+                setPredictions(allPredictions);
+                setHistory('full');
+            })
+            .catch(() => setHistory('recent'));
+    };
+
     const isExampleData = records.length > 0 && records[0].is_example;
+    const hasOlderHistory = !isExampleData && summary && summary.total_records > summary.window_days;
     const latestPrediction = predictions[0] || (isExampleData ? { phase: 'Luteal (Sample)', confidence: 0.92 } : null);
 
     if (loading) return <div style={{ padding: '2rem' }}>Loading Insights...</div>;
@@ -109,9 +124,17 @@ const Dashboard = () => {
 
             <div style={{ display: 'grid', gridTemplateColumns: '2fr 1fr', gap: '2rem' }}>
                 <div className="card">
-                    <h3 style={{ marginBottom: '1.5rem', display: 'flex', alignItems: 'center', gap: '0.5rem' }}>
-                        <TrendingUp size={20} /> Hormone Trends
-                    </h3>
+                    <div style={{ marginBottom: '1.5rem', display: 'flex', justifyContent: 'space-between', alignItems: 'center' }}>
+                        <h3 style={{ margin: 0, display: 'flex', alignItems: 'center', gap: '0.5rem' }}>
+                            <TrendingUp size={20} /> Hormone Trends
+                        </h3>
+                        {hasOlderHistory && history !== 'full' && (
+                            <button onClick={loadFullHistory} disabled={history === 'loading'}
+                                style={{ background: 'none', border: 'none', color: 'var(--primary)', cursor: 'pointer', fontSize: '0.9rem' }}>
+                                {history === 'loading' ? 'Loading...' : `Last ${summary.window_days} of ${summary.total_records} days · Show full history`}
+                            </button>
+                        )}
+                    </div>
                     <div style={{ height: '300px' }}>
                         <ResponsiveContainer width="100%" height="100%">
                             <AreaChart data={records}>
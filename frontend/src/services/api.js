@@ -20,14 +20,32 @@ export const authService = {
   me: () => api.get('/auth/me'),
 };
 
+// Reads every page of a keyset-paginated collection, following X-Next-Cursor
+const fetchAllPages = async (url, pageSize = 1000) => {
+  const items = [];
+  let cursor = null;
+  do {
+    const res = await api.get(url, { params: cursor ? { limit: pageSize, cursor } : { limit: pageSize } });
+    items.push(...res.data);
+    cursor = res.headers['x-next-cursor'];
+  } while (cursor);
+  return items;
+};
+
 export const healthService = {
   addRecord: (data) => api.post('/health/record', data),
   getRecords: () => api.get('/health/records'),
+  getAllRecords: () => fetchAllPages('/health/records'),
 };
 
 export const predictionService = {
   predict: (data) => api.post('/predictions/predict', data),
   getHistory: () => api.get('/predictions/history'),
+  getAllHistory: () => fetchAllPages('/predictions/history'),
+};
+
+export const dashboardService = {
+  get: () => api.get('/dashboard'),
 };
 
 export const datasetService = {